@@ -4,13 +4,16 @@ from dotenv import load_dotenv
 from flask import Flask, jsonify
 from flask_cors import CORS
 
+from commands import register_commands
 from config import get_config
 from extensions import db, jwt, migrate
 from routes.auth import auth_bp
+from routes.fees import fees_bp
 from routes.payments import payments_bp
 from routes.reports import reports_bp
 from routes.students import students_bp
 from seed import seed_demo_data
+from services.report_cache import init_report_cache
 
 
 def create_app(config_class=None):
@@ -27,11 +30,13 @@ def create_app(config_class=None):
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    init_report_cache(app)
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(students_bp)
     app.register_blueprint(payments_bp)
     app.register_blueprint(reports_bp)
+    app.register_blueprint(fees_bp)
 
     @app.errorhandler(404)
     def not_found(_):
@@ -50,6 +55,8 @@ def create_app(config_class=None):
         seed_demo_data()
         print("Database seeded with demo data.")
 
+    register_commands(app)
+
     return app
 
 
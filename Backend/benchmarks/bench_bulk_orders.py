@@ -0,0 +1,88 @@
+"""Time a bulk fee run against one create-order call per student, offline.
+
+Orders go to the local fake gateway from tests/fake_razorpay.py, which adds
+``--latency-ms`` to every call to stand in for the round trip to Razorpay.
+
+Usage (from Backend/):  python benchmarks/bench_bulk_orders.py --students 5000 --latency-ms 50
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tests"))
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from extensions import db  # noqa: E402
+from fake_razorpay import FakeRazorpay  # noqa: E402
+from models import Student  # noqa: E402
+from services.bulk_orders import create_bulk_orders  # noqa: E402
+from services.payments_service import create_payment_order  # noqa: E402
+
+
+def _seed(count: int) -> None:
+    now = datetime.utcnow()
+    db.session.execute(
+        Student.__table__.insert(),
+        [
+            {
+                "name": f"Student {i}",
+                "regno": f"2BA21CS{i:06d}",
+                "course": "B.E",
+                "phone": "9000000000",
+                "email": f"student{i}@example.com",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(count)
+        ],
+    )
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sample", type=int, default=100, help="Sequential create-order calls to extrapolate from.")
+    args = parser.parse_args()
+
+    server = FakeRazorpay(latency=args.latency_ms / 1000).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+
+            class BenchConfig(TestConfig):
+                SQLALCHEMY_DATABASE_URI = f"sqlite:///{Path(tmp) / 'bench.db'}"
+                RAZORPAY_KEY_ID = "rzp_test_bench"
+                RAZORPAY_BASE_URL = server.url
+
+            app = create_app(BenchConfig)
+            with app.app_context():
+                db.create_all()
+                _seed(args.students)
+
+                started = time.perf_counter()
+                for student_id in range(1, args.sample + 1):
+                    create_payment_order(student_id, 2500, "INR", [], {})
+                per_order = (time.perf_counter() - started) / args.sample
+                print(f"sequential  {per_order * 1000:7.2f} ms/order -> ~{per_order * args.students:7.1f}s for {args.students}")
+
+                started = time.perf_counter()
+                report = create_bulk_orders(2500, course="B.E", concurrency=args.concurrency)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"bulk        {elapsed * 1000 / report['total']:7.2f} ms/order -> {elapsed:7.1f}s for {report['total']} "
+                    f"({report['failed']} failed, concurrency {args.concurrency})"
+                )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
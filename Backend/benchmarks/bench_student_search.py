@@ -0,0 +1,95 @@
+"""Measure /api/students/search latency over a large student table.
+
+Usage (from Backend/):  python benchmarks/bench_student_search.py --students 100000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Student  # noqa: E402
+
+FIRST_NAMES = ["Asha", "Rahul", "Priya", "Amit", "Sneha", "Vikram", "Neha", "Arjun", "Kavya", "Rohan"]
+LAST_NAMES = ["Sharma", "Patil", "Rao", "Kulkarni", "Singh", "Iyer", "Desai", "Joshi", "Naik", "Hegde"]
+
+
+def _seed(count: int) -> None:
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        first, last = FIRST_NAMES[i % 10], LAST_NAMES[(i // 10) % 10]
+        rows.append(
+            {
+                "name": f"{first} {last} {i}",
+                "regno": f"2BA{21 + i % 4}CS{i:06d}",
+                "course": "B.E",
+                "phone": "9000000000",
+                "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        if len(rows) == 10000:
+            db.session.execute(Student.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Student.__table__.insert(), rows)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        class BenchConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{Path(tmp) / 'bench.db'}"
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            _seed(args.students)
+            client = app.test_client()
+            rng = random.Random(7)
+            queries = []
+            for _ in range(args.queries):
+                i = rng.randrange(args.students)
+                queries.append(
+                    rng.choice(
+                        [
+                            f"2BA{21 + i % 4}CS{i:06d}"[:8],
+                            FIRST_NAMES[i % 10][:3],
+                            f"{FIRST_NAMES[i % 10]} {LAST_NAMES[(i // 10) % 10][:2]}",
+                            f"{FIRST_NAMES[i % 10].lower()}.{LAST_NAMES[(i // 10) % 10].lower()}{i}",
+                        ]
+                    )
+                )
+            timings = []
+            for q in queries:
+                started = time.perf_counter()
+                resp = client.get("/api/students/search", query_string={"q": q})
+                timings.append((time.perf_counter() - started) * 1000)
+                assert resp.status_code == 200
+            timings.sort()
+            print(f"{args.students} students, {len(queries)} queries")
+            print(
+                f"p50 {statistics.median(timings):.2f} ms  "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms  max {timings[-1]:.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
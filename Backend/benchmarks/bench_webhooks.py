@@ -0,0 +1,119 @@
+"""Load test the Razorpay webhook endpoint with thousands of signed events.
+
+Compares applying each event inside the request (``WEBHOOK_WORKERS=0``) with
+acknowledging from the inbox and draining on a background worker.
+
+Usage (from Backend/):  python benchmarks/bench_webhooks.py --events 5000
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import create_app  # noqa: E402
+from config import TestConfig  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Invoice, Payment, Student, WebhookEvent  # noqa: E402
+from services import workers  # noqa: E402
+
+
+def _seed(orders: int) -> None:
+    now = datetime.utcnow()
+    db.session.execute(
+        Student.__table__.insert(),
+        [
+            {
+                "name": "Bench Student",
+                "regno": "2BA21CS000001",
+                "course": "B.E",
+                "phone": "9000000000",
+                "email": "bench@example.com",
+                "created_at": now,
+                "updated_at": now,
+            }
+        ],
+    )
+    common = {"student_id": 1, "amount_paise": 250000, "currency": "INR", "created_at": now, "updated_at": now}
+    db.session.execute(
+        Invoice.__table__.insert(),
+        [{**common, "invoice_no": f"INV-BENCH-{i}", "items": [], "status": "pending"} for i in range(orders)],
+    )
+    db.session.execute(
+        Payment.__table__.insert(),
+        [
+            {**common, "invoice_id": i + 1, "invoice_no": f"INV-BENCH-{i}", "razorpay_order_id": f"order_{i}", "status": "created"}
+            for i in range(orders)
+        ],
+    )
+    db.session.commit()
+
+
+def _run(tmp: Path, mode: str, events: int, orders: int, secret: str) -> None:
+    class BenchConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp / f'{mode}.db'}"
+        RECEIPTS_DIR = str(tmp / f"receipts-{mode}")
+        RECEIPT_ENGINE = "reportlab"
+        WEBHOOK_WORKERS = 0 if mode == "inline" else 1
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        _seed(orders)
+    client = app.test_client()
+
+    timings = []
+    started = time.perf_counter()
+    for n in range(events):
+        # every fourth delivery replays the previous event id, as Razorpay does on a slow ack
+        i = n - 1 if n % 4 == 3 else n
+        raw = json.dumps(
+            {
+                "event": "payment.captured",
+                "payload": {"payment": {"entity": {"id": f"pay_{i % orders}", "order_id": f"order_{i % orders}"}}},
+            }
+        ).encode()
+        headers = {
+            "X-Razorpay-Signature": hmac.new(secret.encode(), raw, hashlib.sha256).hexdigest(),
+            "X-Razorpay-Event-Id": f"evt_{i}",
+        }
+        t0 = time.perf_counter()
+        resp = client.post("/api/payments/webhook", data=raw, headers=headers, content_type="application/json")
+        timings.append((time.perf_counter() - t0) * 1000)
+        assert resp.status_code == 200, resp.data
+    acked = time.perf_counter() - started
+    workers.shutdown(app, wait=True)
+    settled = time.perf_counter() - started
+
+    with app.app_context():
+        pending = WebhookEvent.query.filter(WebhookEvent.status != "processed").count()
+        captured = Payment.query.filter_by(status="captured").count()
+    timings.sort()
+    print(
+        f"{mode:<7} ack p50 {statistics.median(timings):6.2f} ms  p95 {timings[int(len(timings) * 0.95)]:6.2f} ms  "
+        f"{events / acked:7.1f} events/s acked, all applied after {settled:5.2f}s "
+        f"({captured} captured, {pending} unprocessed)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("inline", "inbox"):
+            _run(Path(tmp), mode, args.events, args.orders, TestConfig.RAZORPAY_WEBHOOK_SECRET)
+
+
+if __name__ == "__main__":
+    main()
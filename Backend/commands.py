@@ -0,0 +1,256 @@
+import csv
+import json
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from services.balances import iter_balance_drift, rebuild_balances
+from services.bulk_orders import BulkOrderError, create_bulk_orders
+from services.idempotency import purge_expired_keys
+from services.receipt_batch import collect_receipt_garbage, regenerate_receipts
+from services.receipt_jobs import resume_receipt_jobs
+from services.reconciliation import (
+    AMOUNT_UNITS,
+    MISMATCH_FIELDS,
+    MISMATCH_TYPES,
+    RECONCILE_FORMATS,
+    ReconciliationError,
+    detect_export_format,
+    reconcile,
+)
+from services.report_jobs import resume_report_jobs
+from services.rollups import rebuild_rollups
+from services.student_import import IMPORT_FORMATS, StudentImportError, detect_format, import_students
+from services.student_search import rebuild_search_index
+from services.webhook_inbox import drain_webhook_events, retry_failed_events
+
+rollups_cli = AppGroup("rollups", help="Maintain the daily collection rollups.")
+students_cli = AppGroup("students", help="Student maintenance commands.")
+receipts_cli = AppGroup("receipts", help="Receipt generation commands.")
+reports_cli = AppGroup("reports", help="Report export jobs.")
+balances_cli = AppGroup("balances", help="Audit the per-student invoiced/paid totals.")
+webhooks_cli = AppGroup("webhooks", help="Process the Razorpay webhook inbox.")
+payments_cli = AppGroup("payments", help="Fee and payment operations.")
+
+
+@rollups_cli.command("rebuild")
+def rebuild_rollups_command():
+    """Recompute collection rollups from captured payments."""
+    count = rebuild_rollups()
+    click.echo(f"Rebuilt {count} rollup rows.")
+
+
+@students_cli.command("reindex")
+def reindex_students_command():
+    """Rebuild the student search index from the students table."""
+    rebuild_search_index()
+    click.echo("Student search index rebuilt.")
+
+
+@students_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(IMPORT_FORMATS), help="Defaults to the file extension.")
+@click.option("--chunk-size", type=int, help="Rows per insert batch (STUDENT_IMPORT_CHUNK_SIZE).")
+def import_students_command(path, fmt, chunk_size):
+    """Bulk import students from a CSV or JSONL file."""
+    fmt = fmt or detect_format(path)
+    if not fmt:
+        raise click.UsageError("Cannot tell the file format from its name; pass --format.")
+    with open(path, "rb") as stream:
+        try:
+            report = import_students(stream, fmt, chunk_size or current_app.config.get("STUDENT_IMPORT_CHUNK_SIZE"))
+        except StudentImportError as exc:
+            raise click.ClickException(str(exc)) from exc
+    for error in report["errors"]:
+        click.echo(f"row {error['row']}: {'; '.join(error['errors'])}", err=True)
+    click.echo(f"Imported {report['inserted']} of {report['total']} rows ({report['failed']} failed).")
+
+
+@balances_cli.command("verify")
+def verify_balances_command():
+    """Report students whose stored totals disagree with their invoices and payments."""
+    drifted = 0
+    for student_id, stored_invoiced, stored_paid, invoiced, paid in iter_balance_drift():
+        drifted += 1
+        click.echo(
+            f"student {student_id}: invoiced {stored_invoiced} != {invoiced} or paid {stored_paid} != {paid}"
+        )
+    click.echo(f"{drifted} student balance(s) drifted.")
+    if drifted:
+        raise SystemExit(1)
+
+
+@balances_cli.command("rebuild")
+def rebuild_balances_command():
+    """Recompute drifted student totals from invoices and captured payments."""
+    count = rebuild_balances()
+    click.echo(f"Repaired {count} student balance(s).")
+
+
+@receipts_cli.command("resume")
+def resume_receipts_command():
+    """Dispatch receipt jobs left queued or abandoned by a previous process."""
+    count = resume_receipt_jobs()
+    click.echo(f"Dispatched {count} receipt job(s).")
+
+
+@receipts_cli.command("regenerate")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), help="Only payments created on or after DATE.")
+@click.option("--workers", type=int, default=0, show_default=True, help="Render processes (0 renders inline).")
+@click.option("--batch-size", type=int, default=200, show_default=True, help="Payments per render batch and commit.")
+def regenerate_receipts_command(since, workers, batch_size):
+    """Re-render the PDF receipt of every captured payment."""
+
+    def progress(done, failed, total, elapsed):
+        rate = done / elapsed if elapsed else 0.0
+        click.echo(f"{done + failed}/{total} receipts ({failed} failed, {rate:.1f}/s)")
+
+    rendered, failed = regenerate_receipts(since=since, workers=workers, batch_size=batch_size, progress=progress)
+    click.echo(f"Regenerated {rendered} receipt(s), {failed} failed.")
+    if failed:
+        raise SystemExit(1)
+
+
+@receipts_cli.command("gc")
+@click.option("--min-age", type=int, default=3600, show_default=True, help="Keep files modified within SECONDS.")
+@click.option("--dry-run", is_flag=True, help="Count unreferenced files without deleting them.")
+def gc_receipts_command(min_age, dry_run):
+    """Delete stored receipt files that no payment references (e.g. after a regenerate)."""
+    kept, removed = collect_receipt_garbage(min_age=min_age, dry_run=dry_run)
+    verb = "Would remove" if dry_run else "Removed"
+    click.echo(f"{verb} {removed} unreferenced receipt file(s), kept {kept}.")
+
+
+@reports_cli.command("resume")
+def resume_reports_command():
+    """Re-dispatch queued report jobs and running ones abandoned by a dead worker."""
+    click.echo(f"Dispatched {resume_report_jobs()} report job(s).")
+
+
+@webhooks_cli.command("drain")
+@click.option("--batch-size", type=int, help="Events per claim and commit (WEBHOOK_BATCH_SIZE).")
+@click.option("--retry-failed", is_flag=True, help="Re-queue events that exhausted their attempts first.")
+def drain_webhooks_command(batch_size, retry_failed):
+    """Apply every pending webhook event, e.g. ones stored while no worker was running."""
+    if retry_failed:
+        click.echo(f"Re-queued {retry_failed_events()} failed event(s).")
+    count = drain_webhook_events(batch_size=batch_size)
+    click.echo(f"Applied {count} webhook event(s).")
+
+
+def _parse_item(ctx, param, values):
+    items = []
+    for value in values:
+        label, sep, amount = value.rpartition(":")
+        if not sep or not label or not amount.isdigit():
+            raise click.BadParameter(f"expected LABEL:PAISE, got {value!r}")
+        items.append({"label": label, "amount": int(amount)})
+    return items
+
+
+@payments_cli.command("bulk-orders")
+@click.option("--course", help="Issue the fee to every student in this course.")
+@click.option("--student-ids", help="Comma-separated student ids (instead of --course).")
+@click.option("--amount", help="Fee per student in rupees, e.g. 2500.")
+@click.option("--semester", type=int, help="Charge each student's course fee structure instead of --amount.")
+@click.option("--fee-id", "fee_ids", type=int, multiple=True, help="Optional fee component to include; repeatable.")
+@click.option("--currency", default="INR", show_default=True)
+@click.option("--item", "items", multiple=True, callback=_parse_item, help="Invoice line as LABEL:PAISE; repeatable.")
+@click.option("--invoice-prefix", default="INV", show_default=True)
+@click.option("--concurrency", type=int, help="Parallel gateway calls (BULK_ORDER_CONCURRENCY).")
+def bulk_orders_command(course, student_ids, amount, semester, fee_ids, currency, items, invoice_prefix, concurrency):
+    """Create an invoice and gateway order for many students at once."""
+
+    def progress(done, failed, total, elapsed):
+        rate = done / elapsed if elapsed else 0.0
+        click.echo(f"{done + failed}/{total} students ({failed} failed, {rate:.1f}/s)")
+
+    try:
+        report = create_bulk_orders(
+            amount=amount,
+            currency=currency,
+            items=items,
+            course=course,
+            student_ids=student_ids.split(",") if student_ids else None,
+            invoice_prefix=invoice_prefix,
+            concurrency=concurrency,
+            progress=progress,
+            semester=semester,
+            fee_ids=fee_ids,
+        )
+    except BulkOrderError as exc:
+        raise click.ClickException(str(exc)) from exc
+    for result in report["results"]:
+        if result["status"] == "failed":
+            click.echo(f"student {result['studentId']}: {result['error']}", err=True)
+    click.echo(f"Created {report['created']} of {report['total']} orders ({report['failed']} failed).")
+    if report["failed"]:
+        raise SystemExit(1)
+
+
+@payments_cli.command("purge-idempotency-keys")
+def purge_idempotency_keys_command():
+    """Delete stored Idempotency-Key responses past IDEMPOTENCY_TTL_SECONDS."""
+    click.echo(f"Purged {purge_expired_keys()} expired idempotency key(s).")
+
+
+@payments_cli.command("reconcile")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(RECONCILE_FORMATS), help="Defaults to the file extension.")
+@click.option("--amount-unit", type=click.Choice(AMOUNT_UNITS), help="Defaults to rupees for CSV, paise for JSON.")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), help="Check for payments missing from DATE on.")
+@click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), help="... through DATE.")
+@click.option("--batch-size", type=int, help="Export rows per database lookup (RECONCILE_BATCH_SIZE).")
+@click.option("--output", type=click.File("w"), default="-", help="Where to write mismatches (default stdout).")
+@click.option("--output-format", type=click.Choice(["csv", "jsonl"]), default="csv", show_default=True)
+def reconcile_command(path, fmt, amount_unit, since, until, batch_size, output, output_format):
+    """Compare a Razorpay payment or settlement export with the payments table."""
+    fmt = fmt or detect_export_format(path)
+    if not fmt:
+        raise click.UsageError("Cannot tell the file format from its name; pass --format.")
+    writer = csv.DictWriter(output, MISMATCH_FIELDS, extrasaction="ignore") if output_format == "csv" else None
+    if writer:
+        writer.writeheader()
+    summary = {}
+    with open(path, "rb") as stream:
+        try:
+            for row in reconcile(
+                stream,
+                fmt,
+                amount_unit=amount_unit,
+                batch_size=batch_size or current_app.config.get("RECONCILE_BATCH_SIZE"),
+                since=since,
+                until=until + timedelta(days=1) if until else None,
+            ):
+                if row["type"] == "summary":
+                    summary = row
+                elif row["type"] == "invalid":
+                    click.echo(f"line {row['line']}: {row['error']}", err=True)
+                elif writer:
+                    writer.writerow(row)
+                else:
+                    output.write(json.dumps(row) + "\n")
+        except ReconciliationError as exc:
+            raise click.ClickException(str(exc)) from exc
+    mismatches = sum(summary[key] for key in MISMATCH_TYPES)
+    click.echo(
+        f"Reconciled {summary['rows']} rows: {summary['matched']} matched, {mismatches} mismatch(es) "
+        f"({summary['missing_in_db']} missing in db, {summary['missing_in_export']} missing in export, "
+        f"{summary['amount_mismatch']} amount, {summary['status_drift']} status, "
+        f"{summary['duplicate_in_export']} duplicate), {summary['skipped']} skipped, {summary['invalid']} invalid.",
+        err=True,
+    )
+    if mismatches:
+        raise SystemExit(1)
+
+
+def register_commands(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(students_cli)
+    app.cli.add_command(balances_cli)
+    app.cli.add_command(receipts_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(webhooks_cli)
+    app.cli.add_command(payments_cli)
@@ -12,7 +12,44 @@ class Config:
     RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
     RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
     RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+    RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL")  # defaults to https://api.razorpay.com
+    RAZORPAY_CONNECT_TIMEOUT = float(os.getenv("RAZORPAY_CONNECT_TIMEOUT", 3.05))
+    RAZORPAY_READ_TIMEOUT = float(os.getenv("RAZORPAY_READ_TIMEOUT", 15))
+    RAZORPAY_MAX_RETRIES = int(os.getenv("RAZORPAY_MAX_RETRIES", 2))
+    RAZORPAY_RETRY_BACKOFF = float(os.getenv("RAZORPAY_RETRY_BACKOFF", 0.25))
+    RAZORPAY_POOL_SIZE = int(os.getenv("RAZORPAY_POOL_SIZE", 16))
     RECEIPTS_DIR = os.path.abspath(os.getenv("RECEIPTS_DIR", "receipts"))
+    REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory")
+    REPORT_CACHE_URL = os.getenv("REPORT_CACHE_URL", "redis://localhost:6379/0")
+    REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 300))
+    REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", 128))
+    REPORT_EXPORT_BATCH_SIZE = int(os.getenv("REPORT_EXPORT_BATCH_SIZE", 1000))
+    REPORT_SERIES_MAX_POINTS = int(os.getenv("REPORT_SERIES_MAX_POINTS", 3660))  # ten years of daily buckets
+    REPORT_PDF_ENGINE = os.getenv("REPORT_PDF_ENGINE", "reportlab")  # or "weasyprint"
+    REPORTS_DIR = os.getenv("REPORTS_DIR")  # defaults to <instance>/reports
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+    REPORT_JOB_STALE_SECONDS = int(os.getenv("REPORT_JOB_STALE_SECONDS", 300))
+    REPORT_ARTIFACT_MAX_AGE = int(os.getenv("REPORT_ARTIFACT_MAX_AGE", 7 * 24 * 3600))
+    REPORT_ARTIFACT_MAX_BYTES = int(os.getenv("REPORT_ARTIFACT_MAX_BYTES", 200 * 1024 * 1024))
+    RECEIPT_ENGINE = os.getenv("RECEIPT_ENGINE", "weasyprint")  # or "reportlab" for bulk throughput
+    RECEIPT_SENDFILE = os.getenv("RECEIPT_SENDFILE", "")  # "x-accel-redirect" (nginx) or "x-sendfile" (Apache)
+    RECEIPT_ACCEL_PREFIX = os.getenv("RECEIPT_ACCEL_PREFIX", "/protected/receipts")
+    RECEIPT_WORKERS = int(os.getenv("RECEIPT_WORKERS", 2))
+    RECEIPT_JOB_STALE_SECONDS = int(os.getenv("RECEIPT_JOB_STALE_SECONDS", 300))
+    RECEIPT_RETRY_DELAY_SECONDS = int(os.getenv("RECEIPT_RETRY_DELAY_SECONDS", 30))
+    BULK_ORDER_CONCURRENCY = int(os.getenv("BULK_ORDER_CONCURRENCY", 16))  # keep <= RAZORPAY_POOL_SIZE
+    BULK_ORDER_BATCH_SIZE = int(os.getenv("BULK_ORDER_BATCH_SIZE", 500))
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))  # how long a duplicate waits for the first
+    IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))  # then an unfinished key is taken over
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 1))
+    WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 200))
+    WEBHOOK_STALE_SECONDS = int(os.getenv("WEBHOOK_STALE_SECONDS", 300))
+    STUDENT_IMPORT_CHUNK_SIZE = int(os.getenv("STUDENT_IMPORT_CHUNK_SIZE", 500))
+    RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", 5000))
+    FEE_STRUCTURE_CACHE_TTL = int(os.getenv("FEE_STRUCTURE_CACHE_TTL", 300))  # bounds staleness across workers
+    # let any caller price a create-order with "amount"/"items"; otherwise only admins can
+    ALLOW_CLIENT_AMOUNT_ORDERS = os.getenv("ALLOW_CLIENT_AMOUNT_ORDERS", "").lower() in ("1", "true", "yes")
     TESTING = False
 
 
@@ -24,6 +61,9 @@ class TestConfig(Config):
     JWT_SECRET_KEY = "test-jwt-secret"
     RAZORPAY_KEY_SECRET = "test_razorpay_secret"
     RAZORPAY_WEBHOOK_SECRET = "test_webhook_secret"
+    REPORT_WORKERS = 0
+    RECEIPT_WORKERS = 0
+    WEBHOOK_WORKERS = 0
 
 
 def get_config():
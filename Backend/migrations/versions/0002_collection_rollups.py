@@ -0,0 +1,34 @@
+"""add collection rollups
+
+Revision ID: 0002_collection_rollups
+Revises: 0001_create_tables
+Create Date: 2025-11-24 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0002_collection_rollups"
+down_revision = "0001_create_tables"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "collection_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("course", sa.String(length=120), nullable=False),
+        sa.Column("currency", sa.String(length=8), nullable=False),
+        sa.Column("amount_paise", sa.Integer(), nullable=False),
+        sa.Column("payment_count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("day", "course", "currency", name="uq_collection_rollups_day_course_currency"),
+    )
+
+
+def downgrade():
+    op.drop_table("collection_rollups")
@@ -0,0 +1,41 @@
+"""add report jobs
+
+Revision ID: 0003_report_jobs
+Revises: 0002_collection_rollups
+Create Date: 2025-11-25 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003_report_jobs"
+down_revision = "0002_collection_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "report_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("job_id", sa.String(length=32), nullable=False),
+        sa.Column("report_type", sa.String(length=16), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=True),
+        sa.Column("end_date", sa.Date(), nullable=True),
+        sa.Column("artifact_key", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("artifact_path", sa.String(length=255), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+    )
+    op.create_index(op.f("ix_report_jobs_job_id"), "report_jobs", ["job_id"], unique=True)
+    op.create_index(op.f("ix_report_jobs_artifact_key"), "report_jobs", ["artifact_key"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_report_jobs_artifact_key"), table_name="report_jobs")
+    op.drop_index(op.f("ix_report_jobs_job_id"), table_name="report_jobs")
+    op.drop_table("report_jobs")
@@ -0,0 +1,28 @@
+"""index student listing and per-student balance lookups
+
+Revision ID: 0004_student_listing_indexes
+Revises: 0003_report_jobs
+Create Date: 2025-11-26 00:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004_student_listing_indexes"
+down_revision = "0003_report_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_students_name_id", "students", ["name", "id"], unique=False)
+    op.create_index("ix_students_course_name_id", "students", ["course", "name", "id"], unique=False)
+    op.create_index(op.f("ix_invoices_student_id"), "invoices", ["student_id"], unique=False)
+    op.create_index("ix_payments_student_id_status", "payments", ["student_id", "status"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_payments_student_id_status", table_name="payments")
+    op.drop_index(op.f("ix_invoices_student_id"), table_name="invoices")
+    op.drop_index("ix_students_course_name_id", table_name="students")
+    op.drop_index("ix_students_name_id", table_name="students")
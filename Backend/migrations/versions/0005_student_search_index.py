@@ -0,0 +1,45 @@
+"""add FTS5 student search index
+
+Revision ID: 0005_student_search_index
+Revises: 0004_student_listing_indexes
+Create Date: 2025-11-27 00:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005_student_search_index"
+down_revision = "0004_student_listing_indexes"
+branch_labels = None
+depends_on = None
+
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5("
+    "regno, name, email, content='students', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN "
+    "INSERT INTO students_fts(rowid, regno, name, email) VALUES (new.id, new.regno, new.name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN "
+    "INSERT INTO students_fts(students_fts, rowid, regno, name, email) "
+    "VALUES ('delete', old.id, old.regno, old.name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF regno, name, email ON students BEGIN "
+    "INSERT INTO students_fts(students_fts, rowid, regno, name, email) "
+    "VALUES ('delete', old.id, old.regno, old.name, old.email); "
+    "INSERT INTO students_fts(rowid, regno, name, email) VALUES (new.id, new.regno, new.name, new.email); END",
+]
+
+
+def upgrade():
+    # Other databases fall back to LIKE-based search and need no schema change.
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in SEARCH_DDL:
+        op.execute(statement)
+    op.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("students_fts_au", "students_fts_ad", "students_fts_ai"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS students_fts")
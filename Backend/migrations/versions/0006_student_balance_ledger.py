@@ -0,0 +1,33 @@
+"""add running invoiced/paid totals to students
+
+Revision ID: 0006_student_balance_ledger
+Revises: 0005_student_search_index
+Create Date: 2025-11-28 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0006_student_balance_ledger"
+down_revision = "0005_student_search_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("students", sa.Column("invoiced_paise", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("students", sa.Column("paid_paise", sa.Integer(), server_default="0", nullable=False))
+
+    op.execute(
+        "UPDATE students SET "
+        "invoiced_paise = COALESCE((SELECT SUM(amount_paise) FROM invoices "
+        "WHERE invoices.student_id = students.id), 0), "
+        "paid_paise = COALESCE((SELECT SUM(amount_paise) FROM payments "
+        "WHERE payments.student_id = students.id AND payments.status = 'captured'), 0)"
+    )
+
+
+def downgrade():
+    op.drop_column("students", "paid_paise")
+    op.drop_column("students", "invoiced_paise")
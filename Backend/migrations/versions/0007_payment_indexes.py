@@ -0,0 +1,37 @@
+"""index payment lookups by order, invoice, student and date
+
+Revision ID: 0007_payment_indexes
+Revises: 0006_student_balance_ledger
+Create Date: 2025-11-29 00:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0007_payment_indexes"
+down_revision = "0006_student_balance_ledger"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_payments_invoice_id_razorpay_order_id", "payments", ["invoice_id", "razorpay_order_id"], unique=False
+    )
+    op.create_index("ix_payments_razorpay_order_id", "payments", ["razorpay_order_id"], unique=False)
+    # (student_id, status) is a prefix of the new index, which also orders by date
+    op.drop_index("ix_payments_student_id_status", table_name="payments")
+    op.create_index(
+        "ix_payments_student_id_status_created_at", "payments", ["student_id", "status", "created_at"], unique=False
+    )
+    op.create_index("ix_payments_status_created_at", "payments", ["status", "created_at"], unique=False)
+    op.create_index("ix_payments_created_at_id", "payments", ["created_at", "id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_payments_created_at_id", table_name="payments")
+    op.drop_index("ix_payments_status_created_at", table_name="payments")
+    op.drop_index("ix_payments_student_id_status_created_at", table_name="payments")
+    op.create_index("ix_payments_student_id_status", "payments", ["student_id", "status"], unique=False)
+    op.drop_index("ix_payments_razorpay_order_id", table_name="payments")
+    op.drop_index("ix_payments_invoice_id_razorpay_order_id", table_name="payments")
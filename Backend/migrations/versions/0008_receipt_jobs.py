@@ -0,0 +1,38 @@
+"""add receipt jobs and payment receipt status
+
+Revision ID: 0008_receipt_jobs
+Revises: 0007_payment_indexes
+Create Date: 2025-11-30 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0008_receipt_jobs"
+down_revision = "0007_payment_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("payments", sa.Column("receipt_status", sa.String(length=16), nullable=True))
+    op.execute("UPDATE payments SET receipt_status = 'ready' WHERE receipt_path IS NOT NULL")
+    op.create_table(
+        "receipt_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("payment_id", sa.Integer(), sa.ForeignKey("payments.id"), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.UniqueConstraint("payment_id"),
+    )
+    op.create_index("ix_receipt_jobs_status_updated_at", "receipt_jobs", ["status", "updated_at"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_receipt_jobs_status_updated_at", table_name="receipt_jobs")
+    op.drop_table("receipt_jobs")
+    op.drop_column("payments", "receipt_status")
@@ -0,0 +1,24 @@
+"""add receipt content hash to payments
+
+Revision ID: 0009_receipt_content_hash
+Revises: 0008_receipt_jobs
+Create Date: 2025-12-01 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0009_receipt_content_hash"
+down_revision = "0008_receipt_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing flat-directory receipts keep working; `flask receipts regenerate` moves them into the store.
+    op.add_column("payments", sa.Column("receipt_sha256", sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column("payments", "receipt_sha256")
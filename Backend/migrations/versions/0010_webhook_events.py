@@ -0,0 +1,39 @@
+"""add webhook_events inbox
+
+Revision ID: 0010_webhook_events
+Revises: 0009_receipt_content_hash
+Create Date: 2025-12-08 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0010_webhook_events"
+down_revision = "0009_receipt_content_hash"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("event_id", sa.String(length=80), nullable=False),
+        sa.Column("event_type", sa.String(length=64), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("claim_token", sa.String(length=32), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("event_id"),
+    )
+    op.create_index("ix_webhook_events_status_id", "webhook_events", ["status", "id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_webhook_events_status_id", table_name="webhook_events")
+    op.drop_table("webhook_events")
@@ -0,0 +1,22 @@
+"""index payments by razorpay_payment_id for reconciliation
+
+Revision ID: 0012_payment_razorpay_payment_id_index
+Revises: 0011_idempotency_keys
+Create Date: 2025-12-22 00:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0012_payment_razorpay_payment_id_index"
+down_revision = "0011_idempotency_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_payments_razorpay_payment_id", "payments", ["razorpay_payment_id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_payments_razorpay_payment_id", table_name="payments")
@@ -0,0 +1,33 @@
+"""scope fee_components to a course and semester
+
+Revision ID: 0013_fee_structures
+Revises: 0012_payment_razorpay_payment_id_index
+Create Date: 2025-12-29 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0013_fee_structures"
+down_revision = "0012_payment_razorpay_payment_id_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows cannot be scoped from anything in the database, so they keep course
+    # and semester NULL and become mandatory: every course and semester is charged every
+    # pre-existing component. Review them after upgrading and PATCH /api/fees/<id> with the
+    # right course, semester or "mandatory": false before invoicing from fee structures.
+    op.add_column("fee_components", sa.Column("course", sa.String(length=120), nullable=True))
+    op.add_column("fee_components", sa.Column("semester", sa.Integer(), nullable=True))
+    op.add_column("fee_components", sa.Column("mandatory", sa.Boolean(), server_default=sa.true(), nullable=False))
+    op.create_index("ix_fee_components_course_semester", "fee_components", ["course", "semester"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_fee_components_course_semester", table_name="fee_components")
+    op.drop_column("fee_components", "mandatory")
+    op.drop_column("fee_components", "semester")
+    op.drop_column("fee_components", "course")
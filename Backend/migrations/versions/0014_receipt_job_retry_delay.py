@@ -0,0 +1,23 @@
+"""delay receipt job retries
+
+Revision ID: 0014_receipt_job_retry_delay
+Revises: 0013_fee_structures
+Create Date: 2026-01-05 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0014_receipt_job_retry_delay"
+down_revision = "0013_fee_structures"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("receipt_jobs", sa.Column("not_before", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("receipt_jobs", "not_before")
@@ -0,0 +1,25 @@
+"""record when a payment was captured
+
+Revision ID: 0015_payment_captured_at
+Revises: 0014_receipt_job_retry_delay
+Create Date: 2026-01-08 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0015_payment_captured_at"
+down_revision = "0014_receipt_job_retry_delay"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("payments", sa.Column("captured_at", sa.DateTime(), nullable=True))
+    # updated_at is the closest record of the capture for existing rows
+    op.execute("UPDATE payments SET captured_at = updated_at WHERE status = 'captured'")
+
+
+def downgrade():
+    op.drop_column("payments", "captured_at")
@@ -1,7 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import func
 from sqlalchemy.dialects.sqlite import JSON
 from werkzeug.security import check_password_hash, generate_password_hash
 
@@ -37,29 +36,25 @@ class User(BaseModel):
 
 class Student(BaseModel):
     __tablename__ = "students"
+    __table_args__ = (
+        db.Index("ix_students_name_id", "name", "id"),
+        db.Index("ix_students_course_name_id", "course", "name", "id"),
+    )
 
     name = db.Column(db.String(120), nullable=False)
     regno = db.Column(db.String(64), unique=True, nullable=False)
     course = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(32), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    # running totals maintained by services.balances; see `flask balances verify`
+    invoiced_paise = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    paid_paise = db.Column(db.Integer, default=0, server_default="0", nullable=False)
 
     invoices = db.relationship("Invoice", backref="student", lazy="dynamic")
     payments = db.relationship("Payment", backref="student", lazy="dynamic")
 
     def outstanding_amount(self) -> int:
-        invoice_total = (
-            self.invoices.with_entities(func.coalesce(func.sum(Invoice.amount_paise), 0))
-            .scalar()
-            or 0
-        )
-        paid_total = (
-            self.payments.filter_by(status="captured")
-            .with_entities(func.coalesce(func.sum(Payment.amount_paise), 0))
-            .scalar()
-            or 0
-        )
-        return invoice_total - paid_total
+        return (self.invoiced_paise or 0) - (self.paid_paise or 0)
 
     def to_dict(self, include_payments: bool = False):
         data = {
@@ -78,20 +73,33 @@ class Student(BaseModel):
 
 class FeeComponent(BaseModel):
     __tablename__ = "fee_components"
+    __table_args__ = (db.Index("ix_fee_components_course_semester", "course", "semester"),)
 
     name = db.Column(db.String(120), nullable=False)
-    amount = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Integer, nullable=False)  # paise
     category = db.Column(db.String(120), nullable=False)
+    # None applies to every course / semester; see services.fee_structures
+    course = db.Column(db.String(120))
+    semester = db.Column(db.Integer)
+    mandatory = db.Column(db.Boolean, default=True, server_default=db.true(), nullable=False)
 
     def to_dict(self):
-        return {"id": self.id, "name": self.name, "amount": self.amount, "category": self.category}
+        return {
+            "id": self.id,
+            "name": self.name,
+            "amount": self.amount,
+            "category": self.category,
+            "course": self.course,
+            "semester": self.semester,
+            "mandatory": self.mandatory,
+        }
 
 
 class Invoice(BaseModel):
     __tablename__ = "invoices"
 
     invoice_no = db.Column(db.String(64), unique=True, nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False, index=True)
     amount_paise = db.Column(db.Integer, nullable=False)
     currency = db.Column(db.String(8), default="INR", nullable=False)
     items = db.Column(JSON, default=list)
@@ -113,6 +121,14 @@ class Invoice(BaseModel):
 
 class Payment(BaseModel):
     __tablename__ = "payments"
+    __table_args__ = (
+        db.Index("ix_payments_invoice_id_razorpay_order_id", "invoice_id", "razorpay_order_id"),
+        db.Index("ix_payments_razorpay_order_id", "razorpay_order_id"),
+        db.Index("ix_payments_razorpay_payment_id", "razorpay_payment_id"),
+        db.Index("ix_payments_student_id_status_created_at", "student_id", "status", "created_at"),
+        db.Index("ix_payments_status_created_at", "status", "created_at"),
+        db.Index("ix_payments_created_at_id", "created_at", "id"),
+    )
 
     student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
     invoice_id = db.Column(db.Integer, db.ForeignKey("invoices.id"), nullable=False)
@@ -123,6 +139,17 @@ class Payment(BaseModel):
     currency = db.Column(db.String(8), default="INR")
     status = db.Column(db.String(32), default="created", nullable=False)
     receipt_path = db.Column(db.String(255))
+    # None until captured, then "pending" -> "ready" | "failed"; see services.receipt_jobs
+    receipt_status = db.Column(db.String(16))
+    receipt_sha256 = db.Column(db.String(64))
+    captured_at = db.Column(db.DateTime)  # printed as the receipt's "Issued On", so re-renders match
+
+    @staticmethod
+    def receipt_url_for(invoice_id: int, receipt_sha256: Optional[str]) -> Optional[str]:
+        """Versioned receipt URL; the ``v`` digest lets clients cache the PDF forever."""
+        if not receipt_sha256:
+            return None
+        return f"/api/payments/{invoice_id}/receipt?v={receipt_sha256}"
 
     def to_dict(self):
         return {
@@ -135,7 +162,105 @@ class Payment(BaseModel):
             "status": self.status,
             "razorpayOrderId": self.razorpay_order_id,
             "razorpayPaymentId": self.razorpay_payment_id,
+            "receiptStatus": self.receipt_status,
+            "receiptUrl": self.receipt_url_for(self.invoice_id, self.receipt_sha256),
+            "createdAt": self.created_at.isoformat(),
+            "updatedAt": self.updated_at.isoformat(),
+        }
+
+
+class CollectionRollup(BaseModel):
+    __tablename__ = "collection_rollups"
+    __table_args__ = (
+        db.UniqueConstraint("day", "course", "currency", name="uq_collection_rollups_day_course_currency"),
+    )
+
+    day = db.Column(db.Date, nullable=False)
+    course = db.Column(db.String(120), nullable=False)
+    currency = db.Column(db.String(8), default="INR", nullable=False)
+    amount_paise = db.Column(db.Integer, default=0, nullable=False)
+    payment_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def to_dict(self):
+        return {
+            "day": self.day.isoformat(),
+            "course": self.course,
+            "currency": self.currency,
+            "amount": self.amount_paise,
+            "count": self.payment_count,
+        }
+
+
+class ReportJob(BaseModel):
+    __tablename__ = "report_jobs"
+
+    job_id = db.Column(db.String(32), unique=True, nullable=False, index=True)
+    report_type = db.Column(db.String(16), nullable=False)
+    start_date = db.Column(db.Date)
+    end_date = db.Column(db.Date)
+    artifact_key = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(16), default="queued", nullable=False)
+    progress = db.Column(db.Integer, default=0, nullable=False)
+    artifact_path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            "jobId": self.job_id,
+            "type": self.report_type,
+            "from": self.start_date.isoformat() if self.start_date else None,
+            "to": self.end_date.isoformat() if self.end_date else None,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "downloadUrl": f"/api/reports/jobs/{self.job_id}/download" if self.status == "done" else None,
             "createdAt": self.created_at.isoformat(),
             "updatedAt": self.updated_at.isoformat(),
         }
 
+
+class ReceiptJob(BaseModel):
+    __tablename__ = "receipt_jobs"
+    __table_args__ = (db.Index("ix_receipt_jobs_status_updated_at", "status", "updated_at"),)
+
+    payment_id = db.Column(db.Integer, db.ForeignKey("payments.id"), unique=True, nullable=False)
+    status = db.Column(db.String(16), default="queued", nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    not_before = db.Column(db.DateTime)  # earliest retry after a failed attempt
+
+    payment = db.relationship("Payment")
+
+
+class WebhookEvent(BaseModel):
+    """A verified Razorpay webhook delivery, stored raw before it is applied."""
+
+    __tablename__ = "webhook_events"
+    __table_args__ = (db.Index("ix_webhook_events_status_id", "status", "id"),)
+
+    event_id = db.Column(db.String(80), unique=True, nullable=False)
+    event_type = db.Column(db.String(64))
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), default="pending", nullable=False)
+    claim_token = db.Column(db.String(32))
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    processed_at = db.Column(db.DateTime)
+
+
+class IdempotencyKey(BaseModel):
+    """The stored outcome of a request sent with an ``Idempotency-Key`` header."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        db.UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+        db.Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    scope = db.Column(db.String(64), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(16), default="in_progress", nullable=False)
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(JSON)
+    expires_at = db.Column(db.DateTime, nullable=False)
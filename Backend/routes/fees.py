@@ -0,0 +1,71 @@
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required
+
+from extensions import db
+from models import FeeComponent
+from services.fee_structures import (
+    FeeStructureError,
+    get_fee_structure,
+    get_fee_structure_cache,
+    list_fee_components,
+    save_fee_component,
+)
+from utils import json_response
+
+fees_bp = Blueprint("fees", __name__, url_prefix="/api/fees")
+
+
+@fees_bp.route("", methods=["GET"])
+def list_components():
+    try:
+        return json_response(True, list_fee_components(request.args.get("course"), request.args.get("semester")))
+    except FeeStructureError as exc:
+        return json_response(False, error=str(exc), status=400)
+
+
+@fees_bp.route("/structure", methods=["GET"])
+def fee_structure():
+    try:
+        structure = get_fee_structure(request.args.get("course"), request.args.get("semester"))
+    except FeeStructureError as exc:
+        return json_response(False, error=str(exc), status=400)
+    return json_response(True, structure.to_dict())
+
+
+@fees_bp.route("/cache-stats", methods=["GET"])
+@jwt_required()
+def fee_structure_cache_stats():
+    return json_response(True, get_fee_structure_cache().stats())
+
+
+@fees_bp.route("", methods=["POST"])
+@jwt_required()
+def create_component():
+    try:
+        return json_response(True, save_fee_component(request.get_json() or {}), status=201)
+    except FeeStructureError as exc:
+        return json_response(False, error=str(exc), status=400)
+
+
+@fees_bp.route("/<int:component_id>", methods=["PATCH"])
+@jwt_required()
+def update_component(component_id):
+    component = db.session.get(FeeComponent, component_id)
+    if component is None:
+        return json_response(False, error="Fee component not found", status=404)
+    try:
+        return json_response(True, save_fee_component(request.get_json() or {}, component))
+    except FeeStructureError as exc:
+        db.session.rollback()
+        return json_response(False, error=str(exc), status=400)
+
+
+@fees_bp.route("/<int:component_id>", methods=["DELETE"])
+@jwt_required()
+def delete_component(component_id):
+    component = db.session.get(FeeComponent, component_id)
+    if component is None:
+        return json_response(False, error="Fee component not found", status=404)
+    db.session.delete(component)
+    db.session.commit()
+    return json_response(True, {"id": component_id})
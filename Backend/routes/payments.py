@@ -1,17 +1,26 @@
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from flask import Blueprint, current_app, request, send_file
-from flask_jwt_extended import jwt_required
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, stream_with_context
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
 
 from models import Payment
+from services.bulk_orders import BulkOrderError, create_bulk_orders
+from services.idempotency import IdempotencyConflict, claim_idempotency_key
 from services.payments_service import (
+    PaymentGatewayError,
     PaymentServiceError,
     create_payment_order,
-    handle_webhook,
     list_payments,
+    list_payments_page,
     verify_payment,
 )
+from services.razorpay_gateway import gateway_metrics
+from services.receipt_jobs import nudge_receipt
+from services.reconciliation import ReconciliationError, detect_export_format, reconcile
+from services.receipt_store import ReceiptStore
+from services.webhook_inbox import receive_webhook
 from utils import json_response
 
 payments_bp = Blueprint("payments", __name__, url_prefix="/api/payments")
@@ -25,13 +34,59 @@ def payments_index():
         "from": _parse_date(request.args.get("from")),
         "to": _parse_date(request.args.get("to")),
     }
-    data = list_payments({k: v for k, v in filters.items() if v})
-    return json_response(True, data)
+    filters = {k: v for k, v in filters.items() if v}
+    expand = {part.strip() for part in (request.args.get("expand") or "").split(",")}
+    expand_student = "student" in expand
+    limit = request.args.get("limit", type=int)
+    after = request.args.get("after")
+    if limit is None and after is None:
+        return json_response(True, list_payments(filters, expand_student))
+
+    try:
+        data, next_cursor = list_payments_page(filters, limit=limit, after=after, expand_student=expand_student)
+    except PaymentServiceError as exc:
+        return json_response(False, error=str(exc), status=400)
+    return json_response(True, data, meta={"nextCursor": next_cursor})
 
 
 @payments_bp.route("/create-order", methods=["POST"])
 def create_order():
     payload = request.get_json() or {}
+    if payload.get("semester") is None and not _may_price_order():
+        return json_response(False, error="Send semester and feeIds; only admins can set the amount", status=403)
+    key = request.headers.get("Idempotency-Key")
+    if key is None:
+        return _create_order(payload)
+    try:
+        claim = claim_idempotency_key("create-order", key, request.get_data())
+    except IdempotencyConflict as exc:
+        response, status = json_response(False, error=str(exc), status=exc.status)
+        if exc.retry_after:
+            response.headers["Retry-After"] = str(exc.retry_after)
+        return response, status
+    if claim.replay:
+        body, status = claim.replay
+        response = jsonify(body)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response, status
+    with claim:
+        return _create_order(payload, claim)
+
+
+def _may_price_order() -> bool:
+    """Whether the caller may send ``amount``/``items`` instead of a semester's fee structure."""
+    if current_app.config.get("ALLOW_CLIENT_AMOUNT_ORDERS"):
+        return True
+    verify_jwt_in_request(optional=True)
+    return (get_jwt_identity() or {}).get("role") == "admin"
+
+
+def _create_order(payload, claim=None):
+    key_id = current_app.config.get("RAZORPAY_KEY_ID")
+
+    def remember(result):
+        claim.stage(201, {"success": True, "data": {**result, "keyId": key_id}})
+
     try:
         response = create_payment_order(
             student_id=payload.get("studentId"),
@@ -39,13 +94,83 @@ def create_order():
             currency=payload.get("currency", "INR"),
             items=payload.get("items", []),
             meta=payload.get("meta", {}),
+            before_commit=remember if claim else None,
+            semester=payload.get("semester"),
+            fee_ids=payload.get("feeIds"),
         )
-        response["keyId"] = current_app.config.get("RAZORPAY_KEY_ID")
+        response["keyId"] = key_id
         return json_response(True, response, status=201)
+    except PaymentGatewayError as exc:
+        # not stored: the key is released so the client's retry reaches the gateway again
+        return json_response(False, error=str(exc), status=502)
     except PaymentServiceError as exc:
+        if claim:
+            claim.save(400, {"success": False, "error": str(exc)})
         return json_response(False, error=str(exc), status=400)
 
 
+@payments_bp.route("/bulk-orders", methods=["POST"])
+@jwt_required()
+def bulk_orders():
+    payload = request.get_json() or {}
+    try:
+        report = create_bulk_orders(
+            amount=payload.get("amount"),
+            currency=payload.get("currency", "INR"),
+            items=payload.get("items", []),
+            course=payload.get("course"),
+            student_ids=payload.get("studentIds"),
+            invoice_prefix=payload.get("invoicePrefix") or "INV",
+            concurrency=request.args.get("concurrency", type=int),
+            semester=payload.get("semester"),
+            fee_ids=payload.get("feeIds"),
+        )
+    except BulkOrderError as exc:
+        return json_response(False, error=str(exc), status=400)
+    return json_response(True, report, status=201 if report["created"] else 200)
+
+
+@payments_bp.route("/reconcile", methods=["POST"])
+@jwt_required()
+def reconcile_export():
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, filename, content_type = request.stream, None, request.mimetype
+    fmt = (request.args.get("format") or detect_export_format(filename, content_type) or "").lower()
+    until = _parse_date(request.args.get("to"))
+    rows = reconcile(
+        stream,
+        fmt,
+        amount_unit=request.args.get("amountUnit"),
+        batch_size=current_app.config.get("RECONCILE_BATCH_SIZE"),
+        since=_parse_date(request.args.get("from")),
+        until=until + timedelta(days=1) if until else None,
+    )
+    try:
+        # run up to the first result so a bad format or header is a 400, not a broken stream
+        first = next(rows)
+    except ReconciliationError as exc:
+        return json_response(False, error=str(exc), status=400)
+
+    def lines():
+        yield json.dumps(first) + "\n"
+        try:
+            for row in rows:
+                yield json.dumps(row) + "\n"
+        except ReconciliationError as exc:
+            yield json.dumps({"type": "error", "error": str(exc)}) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+
+@payments_bp.route("/gateway-metrics", methods=["GET"])
+@jwt_required()
+def gateway_metrics_view():
+    return json_response(True, gateway_metrics().snapshot())
+
+
 @payments_bp.route("/verify", methods=["POST"])
 def verify():
     payload = request.get_json() or {}
@@ -61,7 +186,7 @@ def webhook():
     raw_body = request.get_data()
     signature = request.headers.get("X-Razorpay-Signature")
     try:
-        data = handle_webhook(raw_body, signature)
+        data = receive_webhook(raw_body, signature, request.headers.get("X-Razorpay-Event-Id"))
         return json_response(True, data)
     except PaymentServiceError as exc:
         return json_response(False, error=str(exc), status=400)
@@ -70,12 +195,55 @@ def webhook():
 @payments_bp.route("/<int:invoice_id>/receipt", methods=["GET"])
 def get_receipt(invoice_id):
     payment = Payment.query.filter_by(invoice_id=invoice_id).first()
+    if payment and payment.receipt_status == "pending":
+        nudge_receipt(payment)
+        response, status = json_response(True, {"receiptStatus": "pending"}, status=202)
+        response.headers["Retry-After"] = "2"
+        return response, status
+    if payment and payment.receipt_status == "failed":
+        return json_response(False, error="Receipt generation failed", status=500)
     if not payment or not payment.receipt_path:
         return json_response(False, error="Receipt not found", status=404)
+    if payment.receipt_sha256:
+        return _send_stored_receipt(payment)
     file_path = Path(payment.receipt_path)
     if not file_path.exists():
         return json_response(False, error="Receipt missing", status=404)
-    return send_file(str(file_path), mimetype="application/pdf", download_name=file_path.name)
+    return send_file(str(file_path), mimetype="application/pdf", download_name=file_path.name, conditional=True)
+
+
+def _send_stored_receipt(payment):
+    """Serve a content-addressed receipt, offloading the bytes to the web server when configured."""
+    digest = payment.receipt_sha256
+    download_name = f"{payment.invoice_no}.pdf"
+    mode = (current_app.config.get("RECEIPT_SENDFILE") or "").lower()
+    if request.if_none_match.contains(digest):
+        response = Response(status=304)
+    elif mode in ("x-accel-redirect", "x-sendfile"):
+        response = Response(mimetype="application/pdf")
+        response.headers["Content-Disposition"] = f'inline; filename="{download_name}"'
+        if mode == "x-accel-redirect":
+            prefix = current_app.config.get("RECEIPT_ACCEL_PREFIX", "").rstrip("/")
+            relative = ReceiptStore(current_app.config["RECEIPTS_DIR"]).relative_path(digest)
+            response.headers["X-Accel-Redirect"] = f"{prefix}/{relative}"
+        else:
+            response.headers["X-Sendfile"] = payment.receipt_path
+    else:
+        file_path = Path(payment.receipt_path)
+        if not file_path.exists():
+            return json_response(False, error="Receipt missing", status=404)
+        # conditional=True answers Range / If-Range requests with 206 partial content
+        response = send_file(
+            str(file_path), mimetype="application/pdf", download_name=download_name, conditional=True, etag=digest
+        )
+    response.set_etag(digest)
+    # the file behind a digest never changes, so versioned URLs can be cached forever
+    if request.args.get("v") == digest:
+        response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "private, no-cache"
+    response.expires = None
+    return response
 
 
 def _parse_date(value):
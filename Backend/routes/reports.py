@@ -1,19 +1,14 @@
 from datetime import datetime
 
-from flask import Blueprint, request, send_file, current_app
+from flask import Blueprint, Response, request, send_file, current_app, stream_with_context
 from flask_jwt_extended import jwt_required
-from sqlalchemy import func
 
-from extensions import db
-from models import Payment, Student
+from services.report_cache import get_report_cache
+from services.report_export import iter_payments_csv, iter_summary_csv, summary_data
+from services.report_jobs import ReportJobError, enqueue_report_job, ensure_report_artifact, get_report_job
+from services.report_series import GRANULARITIES, ReportSeriesError, check_series_span, collection_series
 from utils import json_response
 from pathlib import Path
-from datetime import datetime as dt
-from weasyprint import HTML
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-import csv
-import io
 
 reports_bp = Blueprint("reports", __name__, url_prefix="/api/reports")
 
@@ -22,47 +17,30 @@ reports_bp = Blueprint("reports", __name__, url_prefix="/api/reports")
 def reports_index():
     start = _parse_date(request.args.get("from"))
     end = _parse_date(request.args.get("to"))
+    return json_response(True, summary_data(start, end))
 
-    payment_query = Payment.query.filter_by(status="captured")
-    if start:
-        payment_query = payment_query.filter(Payment.created_at >= start)
-    if end:
-        payment_query = payment_query.filter(Payment.created_at <= end)
-
-    total_collected = (
-        payment_query.with_entities(func.coalesce(func.sum(Payment.amount_paise), 0)).scalar() or 0
-    )
-
-    course_breakdown = (
-        db.session.query(Student.course, func.coalesce(func.sum(Payment.amount_paise), 0))
-        .join(Payment, Payment.student_id == Student.id)
-        .filter(Payment.status == "captured")
-    )
-    if start:
-        course_breakdown = course_breakdown.filter(Payment.created_at >= start)
-    if end:
-        course_breakdown = course_breakdown.filter(Payment.created_at <= end)
-
-    by_course = [
-        {"course": course or "Unknown", "amount": amount}
-        for course, amount in course_breakdown.group_by(Student.course).all()
-    ]
-
-    defaulters = []
-    students = Student.query.all()
-    for student in students:
-        outstanding = student.outstanding_amount()
-        if outstanding > 0:
-            defaulters.append({"studentId": student.id, "amount": outstanding})
-
-    data = {
-        "totalCollected": total_collected,
-        "byCourse": by_course,
-        "defaulters": defaulters,
-    }
+
+@reports_bp.route("/series", methods=["GET"])
+def reports_series():
+    granularity = request.args.get("granularity") or request.args.get("type") or "daily"
+    by_course = (request.args.get("byCourse") or "").lower() in ("1", "true", "yes")
+    try:
+        data = collection_series(
+            granularity,
+            _parse_date(request.args.get("from")),
+            _parse_date(request.args.get("to")),
+            by_course=by_course,
+        )
+    except ReportSeriesError as exc:
+        return json_response(False, error=str(exc), status=400)
     return json_response(True, data)
 
 
+@reports_bp.route("/cache", methods=["GET"])
+def report_cache_stats():
+    return json_response(True, get_report_cache().stats())
+
+
 @reports_bp.route("/export", methods=["GET"])
 def export_report():
     report_type = (request.args.get("type") or "daily").lower()
@@ -72,90 +50,67 @@ def export_report():
     start = _parse_date(request.args.get("from"))
     end = _parse_date(request.args.get("to"))
 
-    payment_query = Payment.query.filter_by(status="captured")
-    if start:
-        payment_query = payment_query.filter(Payment.created_at >= start)
-    if end:
-        payment_query = payment_query.filter(Payment.created_at <= end)
-
-    total_collected = (
-        payment_query.with_entities(func.coalesce(func.sum(Payment.amount_paise), 0)).scalar() or 0
-    )
-
-    course_breakdown = (
-        db.session.query(Student.course, func.coalesce(func.sum(Payment.amount_paise), 0))
-        .join(Payment, Payment.student_id == Student.id)
-        .filter(Payment.status == "captured")
-    )
-    if start:
-        course_breakdown = course_breakdown.filter(Payment.created_at >= start)
-    if end:
-        course_breakdown = course_breakdown.filter(Payment.created_at <= end)
-
-    by_course = [
-        {"course": course or "Unknown", "amount": amount}
-        for course, amount in course_breakdown.group_by(Student.course).all()
-    ]
-
-    defaulters = []
-    students = Student.query.all()
-    for student in students:
-        outstanding = student.outstanding_amount()
-        if outstanding > 0:
-            defaulters.append({"studentId": student.id, "amount": outstanding})
-
     if fmt == "csv":
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Section", "Key", "Value"])
-        writer.writerow(["Summary", "TotalCollected", total_collected / 100])
-        writer.writerow(["Course", "Name", "Amount"])
-        for item in by_course:
-            writer.writerow(["Course", item["course"], item["amount"] / 100])
-        writer.writerow(["Defaulter", "StudentId", "Amount"])
-        for d in defaulters:
-            writer.writerow(["Defaulter", d["studentId"], d["amount"] / 100])
-        mem = io.BytesIO(output.getvalue().encode("utf-8"))
-        filename = f"BEC_{report_type}_report.csv"
-        return send_file(mem, mimetype="text/csv", download_name=filename, as_attachment=True)
-
-    # pdf
-    title = f"Basaveshwar Engineering College (BEC) {report_type.capitalize()} Report"
-    html = f"""
-    <html><head><meta charset='utf-8'>
-    <style>body {{ font-family: Arial, sans-serif; padding: 24px; }} h1 {{ text-align:center; }}
-    table {{ width:100%; border-collapse: collapse; margin-top: 16px; }}
-    th, td {{ border:1px solid #ddd; padding:8px; text-align:left; }}
-    </style></head>
-    <body>
-    <h1>{title}</h1>
-    <h3>Total Collected: ₹{(total_collected/100):,.2f}</h3>
-    <h3>By Course</h3>
-    <table><tr><th>Course</th><th>Amount (INR)</th></tr>
-    {''.join([f"<tr><td>{item['course']}</td><td>{(item['amount']/100):,.2f}</td></tr>" for item in by_course])}
-    </table>
-    <h3>Defaulters</h3>
-    <table><tr><th>Student ID</th><th>Outstanding (INR)</th></tr>
-    {''.join([f"<tr><td>{d['studentId']}</td><td>{(d['amount']/100):,.2f}</td></tr>" for d in defaulters])}
-    </table>
-    </body></html>
-    """
-
-    reports_dir = Path(current_app.instance_path) / "reports"
-    reports_dir.mkdir(parents=True, exist_ok=True)
-    filename = f"BEC_{report_type}_report_{dt.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    file_path = reports_dir / filename
+        batch_size = current_app.config.get("REPORT_EXPORT_BATCH_SIZE", 1000)
+        if (request.args.get("detail") or "").lower() == "payments":
+            rows = iter_payments_csv(start, end, batch_size)
+            filename = f"BEC_{report_type}_payments.csv"
+        else:
+            if report_type not in GRANULARITIES:
+                return json_response(False, error=f"type must be one of: {', '.join(GRANULARITIES)}", status=400)
+            try:
+                check_series_span(report_type, start, end)
+            except ReportSeriesError as exc:
+                return json_response(False, error=str(exc), status=400)
+            rows = iter_summary_csv(start, end, batch_size, granularity=report_type)
+            filename = f"BEC_{report_type}_report.csv"
+        return Response(
+            stream_with_context(rows),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+
+    try:
+        file_path = ensure_report_artifact(report_type, start, end)
+    except ReportJobError as exc:
+        return json_response(False, error=str(exc), status=400)
+    filename = f"BEC_{report_type}_report.pdf"
+    return send_file(str(file_path), mimetype="application/pdf", download_name=filename, as_attachment=True)
+
+
+@reports_bp.route("/jobs", methods=["POST"])
+def create_report_job():
+    payload = request.get_json() or {}
     try:
-        HTML(string=html).write_pdf(str(file_path))
-    except Exception:
-        c = canvas.Canvas(str(file_path), pagesize=A4)
-        w, h = A4
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(72, h - 72, title)
-        c.setFont("Helvetica", 12)
-        c.drawString(72, h - 100, f"Total Collected: ₹{(total_collected/100):,.2f}")
-        c.showPage()
-        c.save()
+        job = enqueue_report_job(
+            payload.get("type"),
+            _parse_date(payload.get("from")),
+            _parse_date(payload.get("to")),
+        )
+    except ReportJobError as exc:
+        return json_response(False, error=str(exc), status=400)
+    return json_response(True, job.to_dict(), status=200 if job.status == "done" else 202)
+
+
+@reports_bp.route("/jobs/<job_id>", methods=["GET"])
+def report_job_status(job_id):
+    job = get_report_job(job_id)
+    if not job:
+        return json_response(False, error="Report job not found", status=404)
+    return json_response(True, job.to_dict())
+
+
+@reports_bp.route("/jobs/<job_id>/download", methods=["GET"])
+def download_report_job(job_id):
+    job = get_report_job(job_id)
+    if not job:
+        return json_response(False, error="Report job not found", status=404)
+    if job.status != "done":
+        return json_response(False, error=f"Report job is {job.status}", status=409)
+    file_path = Path(job.artifact_path)
+    if not file_path.exists():
+        return json_response(False, error="Report artifact expired", status=410)
+    filename = f"BEC_{job.report_type}_report.pdf"
     return send_file(str(file_path), mimetype="application/pdf", download_name=filename, as_attachment=True)
 
 
@@ -1,8 +1,18 @@
-from flask import Blueprint, request
+from flask import Blueprint, Response, current_app, request
 from flask_jwt_extended import jwt_required
 
 from extensions import db
 from models import Student
+from services.student_import import StudentImportError, detect_format, import_students
+from services.student_search import search_students
+from services.students_service import (
+    StudentServiceError,
+    get_student_detail,
+    list_students_page,
+    parse_student_ids,
+    student_detail_etag,
+    students_by_ids,
+)
 from utils import json_response
 
 students_bp = Blueprint("students", __name__, url_prefix="/api/students")
@@ -10,17 +20,64 @@ students_bp = Blueprint("students", __name__, url_prefix="/api/students")
 
 @students_bp.route("", methods=["GET"])
 def list_students():
-    students = Student.query.order_by(Student.name.asc()).all()
-    data = [student.to_dict() for student in students]
-    return json_response(True, data)
+    ids = request.args.get("ids")
+    if ids is not None:
+        try:
+            return json_response(True, students_by_ids(parse_student_ids(ids)))
+        except StudentServiceError as exc:
+            return json_response(False, error=str(exc), status=400)
+
+    limit = request.args.get("limit", type=int)
+    after = request.args.get("after")
+    course = request.args.get("course")
+    if limit is None and after is None:
+        query = Student.query.order_by(Student.name.asc())
+        if course:
+            query = query.filter_by(course=course)
+        return json_response(True, [student.to_dict() for student in query.all()])
+
+    try:
+        data, next_cursor = list_students_page(limit=limit, after=after, course=course)
+    except StudentServiceError as exc:
+        return json_response(False, error=str(exc), status=400)
+    return json_response(True, data, meta={"nextCursor": next_cursor})
+
+
+@students_bp.route("/search", methods=["GET"])
+def search():
+    query = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    return json_response(True, search_students(query, limit))
+
+
+@students_bp.route("/bulk", methods=["POST"])
+def bulk_import_students():
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+    else:
+        stream, filename, content_type = request.stream, None, request.mimetype
+    fmt = (request.args.get("format") or detect_format(filename, content_type) or "").lower()
+    chunk_size = request.args.get("chunkSize", type=int) or current_app.config.get("STUDENT_IMPORT_CHUNK_SIZE")
+    try:
+        report = import_students(stream, fmt, chunk_size)
+    except StudentImportError as exc:
+        return json_response(False, error=str(exc), status=400)
+    return json_response(True, report, status=201 if report["inserted"] else 200)
 
 
 @students_bp.route("/<int:student_id>", methods=["GET"])
 def get_student(student_id):
-    student = Student.query.get(student_id)
-    if not student:
+    etag = student_detail_etag(student_id)
+    if etag is None:
         return json_response(False, error="Student not found", status=404)
-    return json_response(True, student.to_dict(include_payments=True))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response, _ = json_response(True, get_student_detail(student_id))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @students_bp.route("", methods=["POST"])
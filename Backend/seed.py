@@ -1,5 +1,6 @@
 from extensions import db
 from models import Invoice, Payment, Student, User
+from services.balances import record_invoice
 
 
 def seed_demo_data():
@@ -28,6 +29,7 @@ def seed_demo_data():
             status="created",
         )
         db.session.add(invoice)
+        record_invoice(invoice)
 
         payment = Payment(
             student_id=student.id,
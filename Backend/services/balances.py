@@ -0,0 +1,119 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, update
+
+from extensions import db
+from models import Invoice, Payment, Student
+from services.report_cache import invalidate_reports
+
+
+def outstanding_column():
+    """``invoiced - paid`` read straight off the student row."""
+    return (Student.invoiced_paise - Student.paid_paise).label("outstanding")
+
+
+def _adjust(student_id: int, **deltas: int) -> None:
+    # Increment in SQL so concurrent writers never overwrite each other's totals.
+    values = {name: getattr(Student, name) + delta for name, delta in deltas.items()}
+    db.session.execute(update(Student).where(Student.id == student_id).values(**values))
+
+
+def record_invoice(invoice: Invoice, sign: int = 1) -> None:
+    """Add an invoice to its student's ``invoiced_paise`` in the caller's transaction."""
+    _adjust(invoice.student_id, invoiced_paise=sign * invoice.amount_paise)
+
+
+def record_payment(payment: Payment, sign: int = 1) -> None:
+    """Add a captured payment (or with ``sign=-1`` remove a reversed one) from ``paid_paise``."""
+    _adjust(payment.student_id, paid_paise=sign * payment.amount_paise)
+
+
+def student_balances(student_ids: Optional[Iterable[int]] = None) -> Dict[int, Tuple[int, int]]:
+    """Invoice and captured-payment totals (paise) per student."""
+    query = db.session.query(Student.id, Student.invoiced_paise, Student.paid_paise)
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        if not student_ids:
+            return {}
+        query = query.filter(Student.id.in_(student_ids))
+    return {student_id: (invoiced, paid) for student_id, invoiced, paid in query}
+
+
+def outstanding_by_student(student_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    return {
+        student_id: invoiced_total - paid_total
+        for student_id, (invoiced_total, paid_total) in student_balances(student_ids).items()
+    }
+
+
+def defaulters_query():
+    outstanding = outstanding_column()
+    query = db.session.query(Student.id, outstanding)
+    return query.filter(outstanding > 0).order_by(Student.id.asc())
+
+
+def iter_defaulters(batch_size: int = 1000) -> Iterator[Tuple[int, int]]:
+    """Stream ``(student_id, outstanding)`` rows without materializing the full list."""
+    yield from defaulters_query().yield_per(batch_size)
+
+
+def iter_defaulter_details(batch_size: int = 1000) -> Iterator[Tuple[int, str, str, str, int]]:
+    """Stream ``(student_id, regno, name, course, outstanding)`` for every defaulter."""
+    outstanding = outstanding_column()
+    query = db.session.query(Student.id, Student.regno, Student.name, Student.course, outstanding)
+    yield from query.filter(outstanding > 0).order_by(Student.id.asc()).yield_per(batch_size)
+
+
+def list_defaulters() -> List[dict]:
+    return [{"studentId": student_id, "amount": amount} for student_id, amount in defaulters_query()]
+
+
+def _computed_totals():
+    """Subqueries summing invoices and captured payments per student, used to audit the ledger."""
+    invoiced = (
+        db.session.query(Invoice.student_id.label("student_id"), func.sum(Invoice.amount_paise).label("total"))
+        .group_by(Invoice.student_id)
+        .subquery()
+    )
+    paid = (
+        db.session.query(Payment.student_id.label("student_id"), func.sum(Payment.amount_paise).label("total"))
+        .filter(Payment.status == "captured")
+        .group_by(Payment.student_id)
+        .subquery()
+    )
+    return invoiced, paid
+
+
+def iter_balance_drift(batch_size: int = 1000) -> Iterator[Tuple[int, int, int, int, int]]:
+    """Yield ``(student_id, stored_invoiced, stored_paid, invoiced, paid)`` where the ledger is wrong."""
+    invoiced_sq, paid_sq = _computed_totals()
+    invoiced = func.coalesce(invoiced_sq.c.total, 0)
+    paid = func.coalesce(paid_sq.c.total, 0)
+    query = (
+        db.session.query(Student.id, Student.invoiced_paise, Student.paid_paise, invoiced, paid)
+        .outerjoin(invoiced_sq, invoiced_sq.c.student_id == Student.id)
+        .outerjoin(paid_sq, paid_sq.c.student_id == Student.id)
+        .filter(db.or_(Student.invoiced_paise != invoiced, Student.paid_paise != paid))
+        .order_by(Student.id.asc())
+    )
+    yield from query.yield_per(batch_size)
+
+
+def rebuild_balances(batch_size: int = 1000) -> int:
+    """Rewrite drifted ``invoiced_paise``/``paid_paise`` from the invoices and payments. Returns rows fixed."""
+    drift = [
+        {"student_id": student_id, "invoiced": invoiced, "paid": paid}
+        for student_id, _, _, invoiced, paid in iter_balance_drift(batch_size)
+    ]
+    table = Student.__table__
+    stmt = (
+        table.update()
+        .where(table.c.id == bindparam("student_id"))
+        .values(invoiced_paise=bindparam("invoiced"), paid_paise=bindparam("paid"))
+    )
+    for start in range(0, len(drift), batch_size):
+        db.session.execute(stmt, drift[start : start + batch_size])
+    db.session.commit()
+    if drift:
+        invalidate_reports()
+    return len(drift)
@@ -0,0 +1,237 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import InvalidOperation
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Invoice, Payment, Student
+from services.fee_structures import FeeStructureError, get_fee_structure, parse_semester
+from services.payments_service import PaymentServiceError, amount_to_paise, gateway_order
+from services.razorpay_gateway import get_razorpay_client
+from services.report_cache import invalidate_reports
+
+DEFAULT_BATCH_SIZE = 500
+MAX_CONCURRENCY = 32
+
+# (done, failed, total, elapsed seconds)
+Progress = Callable[[int, int, int, float], None]
+
+
+class BulkOrderError(Exception):
+    pass
+
+
+def _student_ids(course: Optional[str], student_ids: Optional[Iterable[Any]]) -> Tuple[List[int], List[int]]:
+    """Resolve the run's targets; returns ``(existing ids, unknown ids)`` in request order."""
+    if course:
+        ids = db.session.query(Student.id).filter(Student.course == course).order_by(Student.id.asc())
+        return [student_id for (student_id,) in ids], []
+    try:
+        requested = list(dict.fromkeys(int(value) for value in student_ids))
+    except (TypeError, ValueError) as exc:
+        raise BulkOrderError("studentIds must be a list of integers") from exc
+    existing = set()
+    for start in range(0, len(requested), 500):
+        chunk = requested[start : start + 500]
+        existing.update(student_id for (student_id,) in db.session.query(Student.id).filter(Student.id.in_(chunk)))
+    return [i for i in requested if i in existing], [i for i in requested if i not in existing]
+
+
+def _courses(student_ids: List[int]) -> Dict[int, str]:
+    courses = {}
+    for start in range(0, len(student_ids), 500):
+        chunk = student_ids[start : start + 500]
+        courses.update(db.session.query(Student.id, Student.course).filter(Student.id.in_(chunk)))
+    return courses
+
+
+def _charges(courses: Iterable[str], semester: int, fee_ids, strict: bool) -> Dict[str, Any]:
+    """``(items, amount_paise)`` per course from its cached fee structure, or the error if it has none.
+
+    With ``strict`` (a single-course run) a missing structure fails the whole run instead.
+    """
+    charges = {}
+    for course in set(courses):
+        try:
+            charges[course] = get_fee_structure(course, semester).invoice(fee_ids)
+        except FeeStructureError as exc:
+            if strict:
+                raise BulkOrderError(str(exc)) from exc
+            charges[course] = str(exc)
+    return charges
+
+
+def _insert(rows: List[dict]) -> None:
+    """Insert invoices, payments and the students' invoiced totals for one batch in the caller's transaction."""
+    now = datetime.utcnow()
+    invoices = Invoice.__table__
+    returned = db.session.execute(
+        invoices.insert().returning(invoices.c.id, sort_by_parameter_order=True),
+        [
+            {
+                "invoice_no": row["invoiceNo"],
+                "student_id": row["studentId"],
+                "amount_paise": row["amount"],
+                "currency": row["currency"],
+                "items": row["items"],
+                "created_at": now,
+                "updated_at": now,
+            }
+            for row in rows
+        ],
+    )
+    for row, (invoice_id,) in zip(rows, returned):
+        row["invoiceId"] = invoice_id
+    db.session.execute(
+        Payment.__table__.insert(),
+        [
+            {
+                "student_id": row["studentId"],
+                "invoice_id": row["invoiceId"],
+                "invoice_no": row["invoiceNo"],
+                "amount_paise": row["amount"],
+                "currency": row["currency"],
+                "razorpay_order_id": row["orderId"],
+                "status": "created",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for row in rows
+        ],
+    )
+    students = Student.__table__
+    db.session.execute(
+        students.update()
+        .where(students.c.id == bindparam("student_id"))
+        .values(invoiced_paise=students.c.invoiced_paise + bindparam("amount")),
+        [{"student_id": row["studentId"], "amount": row["amount"]} for row in rows],
+    )
+
+
+def _save(rows: List[dict]) -> None:
+    """Commit a batch in one go; if that fails, retry row by row so one bad row only fails itself."""
+    if not rows:
+        return
+    try:
+        _insert(rows)
+        db.session.commit()
+        return
+    except IntegrityError:
+        db.session.rollback()
+    for row in rows:
+        try:
+            _insert([row])
+            db.session.commit()
+        except IntegrityError as exc:
+            db.session.rollback()
+            row.update(status="failed", error=f"Could not save invoice: {exc.orig}", invoiceId=None)
+
+
+def create_bulk_orders(
+    amount: Any,
+    currency: str = "INR",
+    items: Optional[list] = None,
+    course: Optional[str] = None,
+    student_ids: Optional[Iterable[Any]] = None,
+    invoice_prefix: str = "INV",
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    progress: Optional[Progress] = None,
+    semester: Any = None,
+    fee_ids: Optional[list] = None,
+) -> Dict[str, Any]:
+    """Issue a fee to a whole course or a list of students.
+
+    The fee is either the same ``amount`` and ``items`` for everyone or, with
+    ``semester``, each student's course fee structure, computed once per
+    course for the run. Students are handled ``batch_size`` at a time:
+    gateway orders are created on a pool of ``concurrency`` threads sharing
+    the pooled Razorpay client, then the batch's invoices, payments and
+    balance updates go in with one executemany each and a single commit.
+    Returns per-student results; a gateway or insert failure only fails that
+    student.
+    """
+    if bool(course) == bool(student_ids):
+        raise BulkOrderError("Provide either course or studentIds")
+    if semester is not None:
+        if amount is not None:
+            raise BulkOrderError("Provide either amount or semester")
+        try:
+            semester = parse_semester(semester)
+        except FeeStructureError as exc:
+            raise BulkOrderError(str(exc)) from exc
+    elif amount is None:
+        raise BulkOrderError("amount is required")
+    else:
+        try:
+            amount_paise = amount_to_paise(amount)
+        except (InvalidOperation, ValueError) as exc:
+            raise BulkOrderError("amount must be a number") from exc
+        if amount_paise <= 0:
+            raise BulkOrderError("amount must be positive")
+    config = current_app.config
+    concurrency = min(max(concurrency or config.get("BULK_ORDER_CONCURRENCY", 16), 1), MAX_CONCURRENCY)
+    batch_size = max(batch_size or config.get("BULK_ORDER_BATCH_SIZE", DEFAULT_BATCH_SIZE), 1)
+
+    targets, unknown = _student_ids(course, student_ids)
+    if semester is not None:
+        courses = dict.fromkeys(targets, course) if course else _courses(targets)
+        charges = _charges(courses.values(), semester, fee_ids, strict=bool(course))
+    else:
+        courses, charges = {}, {None: (items or [], amount_paise)}
+    results = [{"studentId": student_id, "status": "failed", "error": "Student not found"} for student_id in unknown]
+    total = len(targets) + len(unknown)
+    client = get_razorpay_client()
+    started = time.perf_counter()
+    created = 0
+
+    def place(row: dict) -> dict:
+        if row.get("error"):
+            return row
+        try:
+            row["orderId"] = gateway_order(client, row["amount"], currency, row["invoiceNo"])["id"]
+            row["status"] = "created"
+        except PaymentServiceError as exc:
+            row.update(status="failed", error=str(exc))
+        return row
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="edupay-bulk-orders") as pool:
+        for start in range(0, len(targets), batch_size):
+            batch = []
+            for student_id in targets[start : start + batch_size]:
+                charge = charges[courses.get(student_id)]
+                invoice_no = f"{invoice_prefix}-{uuid4().hex[:12].upper()}"
+                row = {"studentId": student_id, "invoiceNo": invoice_no, "currency": currency}
+                if isinstance(charge, str):
+                    row.update(status="failed", error=charge)
+                else:
+                    row.update(items=charge[0], amount=charge[1])
+                batch.append(row)
+            batch = list(pool.map(place, batch))
+            _save([row for row in batch if row["status"] == "created"])
+            for row in batch:
+                if row["status"] == "created":
+                    created += 1
+                results.append(
+                    {
+                        "studentId": row["studentId"],
+                        "status": row["status"],
+                        "invoiceId": row.get("invoiceId"),
+                        "invoiceNo": row["invoiceNo"] if row["status"] == "created" else None,
+                        "orderId": row.get("orderId"),
+                        "error": row.get("error"),
+                    }
+                )
+            if progress:
+                progress(created, len(results) - created, total, time.perf_counter() - started)
+
+    if created:
+        # Core inserts skip the ORM flush hooks that normally invalidate cached reports
+        invalidate_reports()
+    return {"total": total, "created": created, "failed": total - created, "results": results}
@@ -0,0 +1,221 @@
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import FeeComponent
+
+_INVALIDATE_FLAG = "invalidate_fee_structures"
+
+
+class FeeStructureError(Exception):
+    pass
+
+
+class FeeStructure:
+    """The fee components that apply to one course and semester, with precomputed totals.
+
+    Built once per cache fill and shared between requests, so it is never
+    mutated; ``invoice`` returns fresh item lists.
+    """
+
+    __slots__ = ("course", "semester", "components", "_by_id", "mandatory_total")
+
+    def __init__(self, course: str, semester: int, components: Iterable[dict]):
+        self.course = course
+        self.semester = semester
+        self.components = tuple(components)
+        self._by_id = {component["id"]: component for component in self.components}
+        self.mandatory_total = sum(c["amount"] for c in self.components if c["mandatory"])
+
+    def invoice(self, fee_ids: Optional[Iterable[Any]] = None) -> Tuple[List[dict], int]:
+        """Invoice items and their total in paise: every mandatory component plus the optional ``fee_ids``."""
+        try:
+            chosen = {int(fee_id) for fee_id in fee_ids or ()}
+        except (TypeError, ValueError) as exc:
+            raise FeeStructureError("feeIds must be a list of fee component ids") from exc
+        unknown = chosen - self._by_id.keys()
+        if unknown:
+            raise FeeStructureError(
+                f"Fee component(s) {', '.join(map(str, sorted(unknown)))} do not apply to "
+                f"{self.course} semester {self.semester}"
+            )
+        items = [
+            {"componentId": c["id"], "label": c["name"], "category": c["category"], "amount": c["amount"]}
+            for c in self.components
+            if c["mandatory"] or c["id"] in chosen
+        ]
+        total = sum(item["amount"] for item in items)
+        if total <= 0:
+            raise FeeStructureError(f"No fees are set up for {self.course} semester {self.semester}")
+        return items, total
+
+    def to_dict(self) -> dict:
+        return {
+            "course": self.course,
+            "semester": self.semester,
+            "components": [dict(component) for component in self.components],
+            "mandatoryTotal": self.mandatory_total,
+        }
+
+
+class FeeStructureCache:
+    """Process-local ``(course, semester) -> FeeStructure`` map.
+
+    Commits that touch ``fee_components`` clear it; ``ttl`` bounds how long
+    other processes can serve a structure changed elsewhere. A fill that races
+    an invalidation is not stored, so a stale load cannot outlive the clear.
+    """
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: Dict[Tuple[str, int], Tuple[float, FeeStructure]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, course: str, semester: int) -> FeeStructure:
+        key = (course, semester)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        structure = _load(course, semester)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, structure)
+        return structure
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+def _load(course: str, semester: int) -> FeeStructure:
+    rows = db.session.execute(
+        db.select(
+            FeeComponent.id,
+            FeeComponent.name,
+            FeeComponent.category,
+            FeeComponent.amount,
+            FeeComponent.mandatory,
+        )
+        .where(
+            db.or_(FeeComponent.course == course, FeeComponent.course.is_(None)),
+            db.or_(FeeComponent.semester == semester, FeeComponent.semester.is_(None)),
+        )
+        .order_by(FeeComponent.category.asc(), FeeComponent.name.asc(), FeeComponent.id.asc())
+    )
+    return FeeStructure(course, semester, (dict(row._mapping) for row in rows))
+
+
+def get_fee_structure_cache(app=None) -> FeeStructureCache:
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get("fee_structures")
+    if cache is None:
+        cache = FeeStructureCache(app.config.get("FEE_STRUCTURE_CACHE_TTL", 300))
+        cache = app.extensions.setdefault("fee_structures", cache)
+    return cache
+
+
+def parse_semester(value: Any) -> int:
+    try:
+        semester = int(value)
+    except (TypeError, ValueError) as exc:
+        raise FeeStructureError("semester must be a positive integer") from exc
+    if semester < 1:
+        raise FeeStructureError("semester must be a positive integer")
+    return semester
+
+
+def get_fee_structure(course: str, semester: Any) -> FeeStructure:
+    if not course:
+        raise FeeStructureError("course is required")
+    return get_fee_structure_cache().get(course, parse_semester(semester))
+
+
+def list_fee_components(course: Optional[str] = None, semester: Any = None) -> List[dict]:
+    query = FeeComponent.query
+    if course:
+        query = query.filter(FeeComponent.course == course)
+    if semester is not None:
+        query = query.filter(FeeComponent.semester == parse_semester(semester))
+    order = (FeeComponent.course.asc(), FeeComponent.semester.asc(), FeeComponent.category.asc(), FeeComponent.id.asc())
+    return [component.to_dict() for component in query.order_by(*order)]
+
+
+def save_fee_component(payload: dict, component: Optional[FeeComponent] = None) -> dict:
+    """Create a component, or update the fields present in ``payload``; commits."""
+    creating = component is None
+    if creating:
+        missing = [field for field in ("name", "amount", "category") if payload.get(field) in (None, "")]
+        if missing:
+            raise FeeStructureError(f"Missing fields: {', '.join(missing)}")
+        component = FeeComponent()
+    if "amount" in payload:
+        amount = payload["amount"]
+        if isinstance(amount, bool) or not isinstance(amount, int) or amount <= 0:
+            raise FeeStructureError("amount must be a positive integer number of paise")
+        component.amount = amount
+    for field in ("name", "category"):
+        if field in payload:
+            if not isinstance(payload[field], str) or not payload[field].strip():
+                raise FeeStructureError(f"{field} must be a non-empty string")
+            setattr(component, field, payload[field].strip())
+    if "course" in payload:
+        component.course = (payload["course"] or "").strip() or None
+    if "semester" in payload:
+        component.semester = None if payload["semester"] is None else parse_semester(payload["semester"])
+    if "mandatory" in payload:
+        component.mandatory = bool(payload["mandatory"])
+    if creating:
+        db.session.add(component)
+    db.session.commit()
+    return component.to_dict()
+
+
+def invalidate_fee_structures() -> None:
+    """Drop cached structures; needed after Core writes, which skip the session hooks below."""
+    if has_app_context() and "fee_structures" in current_app.extensions:
+        get_fee_structure_cache().invalidate()
+
+
+@event.listens_for(Session, "before_flush")
+def _track_fee_changes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, FeeComponent):
+            session.info[_INVALIDATE_FLAG] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_INVALIDATE_FLAG, False):
+        invalidate_fee_structures()
+
+
+@event.listens_for(Session, "after_rollback")
+def _invalidate_after_rollback(session):
+    # a lookup inside the transaction may have cached the flushed, now rolled-back rows
+    if session.info.pop(_INVALIDATE_FLAG, False):
+        invalidate_fee_structures()
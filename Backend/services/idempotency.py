@@ -0,0 +1,189 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+_POLL_SECONDS = 0.05
+
+_INSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+_lock = threading.Lock()
+# Finished-or-released signals for keys owned by this process, so local duplicates wake at once.
+_inflight: Dict[Tuple[str, str], threading.Event] = {}
+
+
+class IdempotencyConflict(Exception):
+    def __init__(self, message: str, status: int, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class IdempotencyClaim:
+    """Ownership of one key for the duration of a request, or the stored response to replay.
+
+    Use as a context manager around the work: call ``stage`` before the
+    work's own commit so the response lands in the same transaction, or
+    ``save`` to store and commit on its own. A key left without a response
+    (a crash or a retryable failure) is released on exit, so a retry runs again.
+    """
+
+    def __init__(self, scope: str, key: str, record_id: Optional[int] = None, replay: Optional[Tuple[dict, int]] = None):
+        self.scope = scope
+        self.key = key
+        self.record_id = record_id
+        self.replay = replay
+
+    def stage(self, status: int, body: dict) -> None:
+        record = db.session.get(IdempotencyKey, self.record_id)
+        record.status = "completed"
+        record.response_status = status
+        record.response_body = body
+        record.expires_at = _expires_at()
+
+    def save(self, status: int, body: dict) -> None:
+        self.stage(status, body)
+        db.session.commit()
+
+    def __enter__(self) -> "IdempotencyClaim":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            db.session.rollback()
+        try:
+            IdempotencyKey.query.filter_by(id=self.record_id, status="in_progress").delete(synchronize_session=False)
+            db.session.commit()
+        finally:
+            with _lock:
+                event = _inflight.pop((self.scope, self.key), None)
+            if event is not None:
+                event.set()
+
+
+def _expires_at() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=current_app.config.get("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+
+
+def _insert(scope: str, key: str, request_hash: str) -> Optional[int]:
+    """Try to take the key; returns the new row id, or None if another request holds it."""
+    now = datetime.utcnow()
+    values = {
+        "scope": scope,
+        "key": key,
+        "request_hash": request_hash,
+        "status": "in_progress",
+        "expires_at": _expires_at(),
+        "created_at": now,
+        "updated_at": now,
+    }
+    table = IdempotencyKey.__table__
+    insert = _INSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(**values).on_conflict_do_nothing(index_elements=[table.c.scope, table.c.key])
+        row = db.session.execute(stmt.returning(table.c.id)).first()
+        db.session.commit()
+        return row[0] if row else None
+    try:
+        row_id = db.session.execute(table.insert().values(**values)).inserted_primary_key[0]
+        db.session.commit()
+        return row_id
+    except IntegrityError:
+        db.session.rollback()
+        return None
+
+
+def _claimable(now: datetime):
+    """Keys past their TTL, or still in progress long after their owner should have finished."""
+    stale = now - timedelta(seconds=current_app.config.get("IDEMPOTENCY_LOCK_SECONDS", 60))
+    return db.or_(
+        IdempotencyKey.expires_at < now,
+        db.and_(IdempotencyKey.status == "in_progress", IdempotencyKey.updated_at < stale),
+    )
+
+
+def _take_over(record, request_hash: str) -> bool:
+    """Reset an expired or abandoned key to be ours; False if it is live or someone beat us to it."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config.get("IDEMPOTENCY_LOCK_SECONDS", 60))
+    if record.expires_at >= now and not (record.status == "in_progress" and record.updated_at < stale):
+        return False
+    taken = IdempotencyKey.query.filter(IdempotencyKey.id == record.id, _claimable(now)).update(
+        {
+            "status": "in_progress",
+            "request_hash": request_hash,
+            "response_status": None,
+            "response_body": None,
+            "expires_at": _expires_at(),
+            "updated_at": now,
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return taken == 1
+
+
+def claim_idempotency_key(scope: str, key: str, raw_body: bytes) -> IdempotencyClaim:
+    """Own ``key`` within ``scope``, or get back the response already stored for it.
+
+    A duplicate that arrives while the first request is still running waits up
+    to ``IDEMPOTENCY_WAIT_SECONDS`` for its result instead of running again.
+    Raises ``IdempotencyConflict`` for a key reused with a different body (422)
+    or one still in progress when the wait runs out (409).
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyConflict(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters", 400)
+    request_hash = hashlib.sha256(raw_body or b"").hexdigest()
+    deadline = time.monotonic() + current_app.config.get("IDEMPOTENCY_WAIT_SECONDS", 10)
+    while True:
+        with _lock:
+            event = _inflight.get((scope, key))
+        if event is None:
+            record_id = _insert(scope, key, request_hash)
+            if record_id is not None:
+                with _lock:
+                    _inflight[(scope, key)] = threading.Event()
+                return IdempotencyClaim(scope, key, record_id)
+
+        record = db.session.execute(
+            db.select(
+                IdempotencyKey.id,
+                IdempotencyKey.request_hash,
+                IdempotencyKey.status,
+                IdempotencyKey.response_status,
+                IdempotencyKey.response_body,
+                IdempotencyKey.expires_at,
+                IdempotencyKey.updated_at,
+            ).filter_by(scope=scope, key=key)
+        ).first()
+        db.session.commit()  # end the read so the next poll sees fresh rows
+        if record is not None:
+            if record.request_hash != request_hash and record.expires_at >= datetime.utcnow():
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request", 422)
+            if record.status == "completed" and record.expires_at >= datetime.utcnow():
+                return IdempotencyClaim(scope, key, record.id, replay=(record.response_body, record.response_status))
+            if _take_over(record, request_hash):
+                with _lock:
+                    _inflight[(scope, key)] = threading.Event()
+                return IdempotencyClaim(scope, key, record.id)
+        if time.monotonic() >= deadline:
+            raise IdempotencyConflict("A request with this Idempotency-Key is still in progress", 409, retry_after=1)
+        if event is not None:
+            event.wait(_POLL_SECONDS)
+        else:
+            time.sleep(_POLL_SECONDS)
+
+
+def purge_expired_keys() -> int:
+    """Delete keys past their TTL; returns the count."""
+    count = IdempotencyKey.query.filter(IdempotencyKey.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+    db.session.commit()
+    return count
@@ -1,46 +1,110 @@
 import hashlib
 import hmac
-import json
+from datetime import datetime
 from decimal import Decimal
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from uuid import uuid4
 
-import razorpay
+import requests
 from flask import current_app
+from razorpay.errors import BadRequestError, GatewayError, ServerError
+from sqlalchemy.orm.attributes import set_committed_value
 
 from extensions import db
 from models import Invoice, Payment, Student
-from services.receipt_generator import generate_receipt
+from services.balances import record_invoice, record_payment
+from services.fee_structures import FeeStructureError, get_fee_structure
+from services.razorpay_gateway import get_razorpay_client
+from services.receipt_jobs import dispatch_receipts, queue_receipt
+from services.rollups import record_capture, record_reversal
+from utils import decode_cursor, encode_cursor
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Columns read by the list endpoints; rows come back as plain tuples, not ORM objects.
+_LIST_COLUMNS = (
+    Payment.id,
+    Payment.invoice_id,
+    Payment.invoice_no,
+    Payment.student_id,
+    Payment.amount_paise,
+    Payment.currency,
+    Payment.status,
+    Payment.razorpay_order_id,
+    Payment.razorpay_payment_id,
+    Payment.receipt_status,
+    Payment.receipt_sha256,
+    Payment.created_at,
+    Payment.updated_at,
+)
+_BASE_COLUMNS = len(_LIST_COLUMNS)
+# Appended with ``expand=student`` so listings can show who paid without extra requests.
+_STUDENT_COLUMNS = (Student.name, Student.regno, Student.course)
 
 
 class PaymentServiceError(Exception):
     pass
 
 
-def _get_razorpay_client():
-    key_id = current_app.config.get("RAZORPAY_KEY_ID")
-    key_secret = current_app.config.get("RAZORPAY_KEY_SECRET")
-    if key_id and key_secret:
-        return razorpay.Client(auth=(key_id, key_secret))
-    return None
+class PaymentGatewayError(PaymentServiceError):
+    """Razorpay could not be reached or failed; the request may be retried."""
+
+
+def gateway_order(client, amount_paise: int, currency: str, invoice_no: str) -> dict:
+    """Create the Razorpay order for an invoice, or a mock order when ``client`` is None.
 
+    Needs no app context, so bulk runs can call it from worker threads.
+    """
+    if client is None:
+        return {"id": f"order_{uuid4().hex}", "amount": amount_paise, "currency": currency, "receipt": invoice_no}
+    try:
+        return client.order.create({"amount": amount_paise, "currency": currency, "receipt": invoice_no})
+    except BadRequestError as exc:
+        raise PaymentServiceError(str(exc) or "Order rejected by payment gateway") from exc
+    except (GatewayError, ServerError, requests.RequestException, ValueError) as exc:
+        raise PaymentGatewayError("Payment gateway unavailable, please retry") from exc
 
-def _amount_to_paise(amount: Any) -> int:
+
+def amount_to_paise(amount: Any) -> int:
     value = Decimal(str(amount))
     return int(value * 100)
 
 
-def create_payment_order(student_id: int, amount: Any, currency: str, items, meta):
+def create_payment_order(
+    student_id: int,
+    amount: Any,
+    currency: str,
+    items,
+    meta,
+    before_commit: Optional[Callable[[dict], None]] = None,
+    semester: Any = None,
+    fee_ids: Optional[List[Any]] = None,
+):
+    """Create an invoice, its gateway order and a pending payment.
+
+    With ``semester`` the invoice is built from the student's course fee
+    structure (mandatory components plus any optional ``fee_ids``) and
+    ``amount`` and ``items`` are ignored. ``before_commit`` is called with the
+    response while the rows are still uncommitted, so a caller can record it
+    in the same transaction.
+    """
     if student_id is None:
         raise PaymentServiceError("studentId is required")
-    if amount is None:
+    if amount is None and semester is None:
         raise PaymentServiceError("amount is required")
 
     student = Student.query.get(student_id)
     if not student:
         raise PaymentServiceError("Student not found")
 
-    amount_paise = _amount_to_paise(amount)
+    if semester is not None:
+        try:
+            items, amount_paise = get_fee_structure(student.course, semester).invoice(fee_ids)
+        except FeeStructureError as exc:
+            raise PaymentServiceError(str(exc)) from exc
+    else:
+        amount_paise = amount_to_paise(amount)
     invoice_no = (meta or {}).get("invoiceNo") or f"INV-{uuid4().hex[:8].upper()}"
 
     invoice = Invoice(
@@ -52,11 +116,13 @@ def create_payment_order(student_id: int, amount: Any, currency: str, items, met
     )
     db.session.add(invoice)
 
-    client = _get_razorpay_client()
-    if client:
-        order = client.order.create({"amount": amount_paise, "currency": currency, "receipt": invoice_no})
-    else:
-        order = {"id": f"order_{uuid4().hex}", "amount": amount_paise, "currency": currency, "receipt": invoice_no}
+    try:
+        order = gateway_order(get_razorpay_client(), amount_paise, currency, invoice_no)
+    except PaymentServiceError as exc:
+        db.session.rollback()
+        if isinstance(exc, PaymentGatewayError):
+            current_app.logger.warning("Razorpay order create failed: %s", exc.__cause__)
+        raise
 
     payment = Payment(
         student_id=student.id,
@@ -68,8 +134,13 @@ def create_payment_order(student_id: int, amount: Any, currency: str, items, met
         status="created",
     )
     db.session.add(payment)
+    record_invoice(invoice)
+    db.session.flush()
+    result = {"orderId": order["id"], "amount": order["amount"], "currency": order["currency"], "invoiceId": invoice.id}
+    if before_commit:
+        before_commit(result)
     db.session.commit()
-    return {"orderId": order["id"], "amount": order["amount"], "currency": order["currency"], "invoiceId": invoice.id}
+    return result
 
 
 def _is_signature_valid(order_id: str, payment_id: str, signature: str) -> bool:
@@ -82,6 +153,33 @@ def _is_signature_valid(order_id: str, payment_id: str, signature: str) -> bool:
     return True
 
 
+def _set_status(payment: Payment, status: str, *conditions, **values) -> bool:
+    """Move ``payment`` to ``status`` with a conditional UPDATE; True if this call changed the row.
+
+    The transition is decided in SQL, not on the loaded ``payment.status``, so
+    ``/verify`` and the webhook drain racing on one payment cannot both see the
+    old status and both apply the rollup and balance deltas.
+    """
+    values = {"status": status, "updated_at": datetime.utcnow(), **values}
+    changed = Payment.query.filter(Payment.id == payment.id, *conditions).update(values, synchronize_session=False)
+    if changed:
+        for name, value in values.items():
+            set_committed_value(payment, name, value)
+    return changed == 1
+
+
+def _mark_captured(payment: Payment, payment_id: Optional[str]):
+    """Apply a capture; returns the receipt job to dispatch after commit, if one was queued."""
+    if _set_status(payment, "captured", Payment.status != "captured", captured_at=datetime.utcnow()):
+        record_capture(payment)
+        record_payment(payment)
+    else:
+        set_committed_value(payment, "status", "captured")
+    payment.razorpay_payment_id = payment_id
+    payment.invoice.status = "paid"
+    return queue_receipt(payment)
+
+
 def verify_payment(payload: Dict[str, Any]):
     order_id = payload.get("razorpay_order_id")
     payment_id = payload.get("razorpay_payment_id")
@@ -98,20 +196,19 @@ def verify_payment(payload: Dict[str, Any]):
     if not _is_signature_valid(order_id, payment_id, signature):
         raise PaymentServiceError("Invalid signature")
 
-    payment.razorpay_payment_id = payment_id
-    payment.status = "captured"
-    payment.invoice.status = "paid"
-    receipt_path = generate_receipt(payment.invoice, payment, payment.student, current_app.config)
-    payment.receipt_path = receipt_path
+    job = _mark_captured(payment, payment_id)
     db.session.commit()
+    if job:
+        dispatch_receipts([job.id])
     return {
         "status": "success",
         "paymentId": payment.id,
         "receiptUrl": f"/api/payments/{payment.invoice_id}/receipt",
+        "receiptStatus": payment.receipt_status,
     }
 
 
-def _verify_webhook_signature(raw_body: bytes, header_signature: str) -> bool:
+def verify_webhook_signature(raw_body: bytes, header_signature: str) -> bool:
     secret = current_app.config.get("RAZORPAY_WEBHOOK_SECRET") or current_app.config.get(
         "RAZORPAY_KEY_SECRET"
     )
@@ -121,44 +218,107 @@ def _verify_webhook_signature(raw_body: bytes, header_signature: str) -> bool:
     return hmac.compare_digest(generated, header_signature or "")
 
 
-def handle_webhook(raw_body: bytes, header_signature: Optional[str]):
-    if not _verify_webhook_signature(raw_body, header_signature or ""):
-        raise PaymentServiceError("Invalid webhook signature")
+def apply_webhook_event(event: Dict[str, Any]):
+    """Apply one Razorpay payment event in the caller's transaction.
 
-    event = json.loads(raw_body.decode("utf-8"))
+    Replays are harmless: captures and reversals only touch rollups and
+    balances on an actual status transition. Returns the receipt job to
+    dispatch after commit, if one was queued.
+    """
     event_type = event.get("event")
-    payload = event.get("payload", {})
-    entity = payload.get("payment", {}).get("entity", {})
+    entity = (event.get("payload") or {}).get("payment", {}).get("entity", {})
     order_id = entity.get("order_id")
     payment_id = entity.get("id")
     status = entity.get("status")
 
-    payment = Payment.query.filter_by(razorpay_order_id=order_id).first()
+    payment = Payment.query.filter_by(razorpay_order_id=order_id).first() if order_id else None
     if not payment:
-        return {"ignored": True}
+        return None
 
     if event_type == "payment.captured" or status == "captured":
-        payment.status = "captured"
-        payment.razorpay_payment_id = payment_id
-        payment.invoice.status = "paid"
-        if not payment.receipt_path:
-            payment.receipt_path = generate_receipt(payment.invoice, payment, payment.student, current_app.config)
-    elif event_type == "payment.failed" or status == "failed":
-        payment.status = "failed"
-    db.session.commit()
-    return {"updated": True}
+        return _mark_captured(payment, payment_id)
+    if event_type == "payment.failed" or status == "failed":
+        if _set_status(payment, "failed", Payment.status == "captured"):
+            record_reversal(payment)
+            record_payment(payment, sign=-1)
+        else:
+            _set_status(payment, "failed", Payment.status != "captured")
+    return None
+
 
+def _list_row(row) -> dict:
+    """Same shape as ``Payment.to_dict`` built from a ``_LIST_COLUMNS`` tuple."""
+    data = {
+        "id": row[0],
+        "invoiceId": row[1],
+        "invoiceNo": row[2],
+        "studentId": row[3],
+        "amount": row[4],
+        "currency": row[5],
+        "status": row[6],
+        "razorpayOrderId": row[7],
+        "razorpayPaymentId": row[8],
+        "receiptStatus": row[9],
+        "receiptUrl": Payment.receipt_url_for(row[1], row[10]),
+        "createdAt": row[11].isoformat(),
+        "updatedAt": row[12].isoformat(),
+    }
+    if len(row) > _BASE_COLUMNS:
+        data["studentName"], data["regno"], data["course"] = row[_BASE_COLUMNS:]
+    return data
 
-def list_payments(filters: Dict[str, Any]):
-    query = Payment.query
+
+def _list_query(filters: Dict[str, Any], expand_student: bool = False):
+    query = db.session.query(*_LIST_COLUMNS)
+    if expand_student:
+        query = query.add_columns(*_STUDENT_COLUMNS).join(Student, Student.id == Payment.student_id)
     if filters.get("studentId"):
-        query = query.filter_by(student_id=filters["studentId"])
+        query = query.filter(Payment.student_id == filters["studentId"])
     if filters.get("status"):
-        query = query.filter_by(status=filters["status"])
+        query = query.filter(Payment.status == filters["status"])
     if filters.get("from"):
         query = query.filter(Payment.created_at >= filters["from"])
     if filters.get("to"):
         query = query.filter(Payment.created_at <= filters["to"])
-    query = query.order_by(Payment.created_at.desc())
-    return [payment.to_dict() for payment in query.all()]
-
+    return query.order_by(Payment.created_at.desc(), Payment.id.desc())
+
+
+def list_payments(filters: Dict[str, Any], expand_student: bool = False) -> List[dict]:
+    return [_list_row(row) for row in _list_query(filters, expand_student)]
+
+
+def list_payments_page(
+    filters: Dict[str, Any],
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    expand_student: bool = False,
+) -> Tuple[List[dict], Optional[str]]:
+    """Return ``(payments, next_cursor)``, newest first.
+
+    Keyset pagination on ``(created_at, id)``: the cursor carries the last pair
+    seen, so each page is an index range scan however deep the client pages.
+    """
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    query = _list_query(filters, expand_student)
+    if after:
+        try:
+            last_created, last_id = decode_cursor(after, 2)
+            last_created = datetime.fromisoformat(last_created)
+        except (TypeError, ValueError) as exc:
+            raise PaymentServiceError("Invalid cursor") from exc
+        if isinstance(last_id, bool) or not isinstance(last_id, int):
+            raise PaymentServiceError("Invalid cursor")
+        query = query.filter(
+            db.or_(
+                Payment.created_at < last_created,
+                db.and_(Payment.created_at == last_created, Payment.id < last_id),
+            )
+        )
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat(), last.id)
+    return [_list_row(row) for row in rows], next_cursor
@@ -0,0 +1,149 @@
+import functools
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional
+from urllib.parse import urlsplit
+
+import razorpay
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_ID_SEGMENT = re.compile(r"/[a-z]+_[A-Za-z0-9]+")
+_lock = threading.Lock()
+
+
+class GatewayMetrics:
+    """Call, error and retry counts plus a rolling latency window per gateway operation."""
+
+    def __init__(self, window: int = 1000):
+        self._window = window
+        self._lock = threading.Lock()
+        self._ops = {}
+
+    def record(self, operation: str, seconds: float, ok: bool, retries: int) -> None:
+        with self._lock:
+            op = self._ops.get(operation)
+            if op is None:
+                op = self._ops[operation] = {"calls": 0, "errors": 0, "retries": 0, "latencies": deque(maxlen=self._window)}
+            op["calls"] += 1
+            op["errors"] += 0 if ok else 1
+            op["retries"] += retries
+            op["latencies"].append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            ops = {name: dict(op, latencies=sorted(op["latencies"])) for name, op in self._ops.items()}
+        result = {}
+        for name, op in ops.items():
+            latencies = op["latencies"]
+            result[name] = {
+                "calls": op["calls"],
+                "errors": op["errors"],
+                "retries": op["retries"],
+                "p50Ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+                "p95Ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+                "maxMs": round(latencies[-1] * 1000, 2) if latencies else None,
+            }
+        return result
+
+
+class GatewaySession(requests.Session):
+    """A keep-alive ``requests`` session for the Razorpay SDK.
+
+    Every request gets ``timeout`` (the SDK sets none). Idempotent methods are
+    retried on connection errors, timeouts and 429/5xx with full-jitter
+    exponential backoff; a POST is only resent after a connect timeout, when
+    Razorpay cannot have seen it.
+    """
+
+    def __init__(self, timeout, max_retries: int, backoff: float, pool_size: int, metrics: GatewayMetrics):
+        super().__init__()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.metrics = metrics
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        method = method.upper()
+        operation = f"{method} {_ID_SEGMENT.sub('/{id}', urlsplit(url).path)}"
+        idempotent = method in IDEMPOTENT_METHODS
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = super().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt < self.max_retries and (idempotent or isinstance(exc, requests.ConnectTimeout)):
+                    attempt += 1
+                    self._pause(attempt)
+                    continue
+                self.metrics.record(operation, time.perf_counter() - started, False, attempt)
+                raise
+            if idempotent and response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                response.close()
+                attempt += 1
+                self._pause(attempt)
+                continue
+            self.metrics.record(operation, time.perf_counter() - started, response.status_code < 400, attempt)
+            return response
+
+    def _pause(self, attempt: int) -> None:
+        time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+
+
+class PooledClient(razorpay.Client):
+    """``razorpay.Client`` that looks up its own version for the User-Agent once, not on every request."""
+
+    @functools.lru_cache(maxsize=1)
+    def _get_version(self):
+        return super()._get_version()
+
+
+def gateway_metrics(app=None) -> GatewayMetrics:
+    app = app or current_app._get_current_object()
+    return app.extensions.setdefault("razorpay_metrics", GatewayMetrics())
+
+
+def get_razorpay_client(app=None) -> Optional[razorpay.Client]:
+    """The app's shared Razorpay client, or None in mock mode (no keys configured).
+
+    Built once per process and rebuilt only if the keys or gateway URL change,
+    so orders reuse pooled connections instead of a fresh handshake each time.
+    """
+    app = app or current_app._get_current_object()
+    config = app.config
+    key_id, key_secret = config.get("RAZORPAY_KEY_ID"), config.get("RAZORPAY_KEY_SECRET")
+    if not (key_id and key_secret):
+        return None
+    key = (key_id, key_secret, config.get("RAZORPAY_BASE_URL"))
+    cached = app.extensions.get("razorpay_client")
+    if cached and cached[0] == key:
+        return cached[1]
+    with _lock:
+        cached = app.extensions.get("razorpay_client")
+        if cached and cached[0] == key:
+            return cached[1]
+        session = GatewaySession(
+            timeout=(config.get("RAZORPAY_CONNECT_TIMEOUT", 3.05), config.get("RAZORPAY_READ_TIMEOUT", 15)),
+            max_retries=config.get("RAZORPAY_MAX_RETRIES", 2),
+            backoff=config.get("RAZORPAY_RETRY_BACKOFF", 0.25),
+            pool_size=config.get("RAZORPAY_POOL_SIZE", 16),
+            metrics=gateway_metrics(app),
+        )
+        options = {"base_url": key[2]} if key[2] else {}
+        client = PooledClient(session=session, auth=(key_id, key_secret), **options)
+        if cached:
+            cached[1].session.close()
+        app.extensions["razorpay_client"] = (key, client)
+        return client
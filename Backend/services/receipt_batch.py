@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import bindparam, select
+
+from extensions import db
+from models import Invoice, Payment, Student
+from services.receipt_generator import issued_on, receipt_context, write_receipt_batch
+from services.receipt_store import ReceiptStore
+
+# (done, failed, total, elapsed seconds)
+Progress = Callable[[int, int, int, float], None]
+
+
+def _captured_query(since: Optional[datetime]):
+    query = Payment.query.filter(Payment.status == "captured")
+    if since:
+        query = query.filter(Payment.created_at >= since)
+    return query
+
+
+def _iter_batches(since: Optional[datetime], batch_size: int) -> Iterator[List[Tuple[int, dict]]]:
+    """Yield ``(payment_id, receipt context)`` batches, paging on ``Payment.id`` so commits in between are safe."""
+    last_id = 0
+    while True:
+        rows = (
+            _captured_query(since)
+            .filter(Payment.id > last_id)
+            .join(Invoice, Invoice.id == Payment.invoice_id)
+            .join(Student, Student.id == Payment.student_id)
+            .with_entities(Payment, Invoice, Student)
+            .order_by(Payment.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0].id
+        yield [
+            (payment.id, receipt_context(invoice, payment, student, issued_on(payment)))
+            for payment, invoice, student in rows
+        ]
+
+
+def _save(results) -> int:
+    """Store the new paths for one batch in a single executemany + commit; returns the failure count."""
+    done = [
+        {"payment_id": payment_id, "path": path, "sha256": sha256}
+        for payment_id, path, sha256, error in results
+        if error is None
+    ]
+    for payment_id, _, _, error in results:
+        if error is not None:
+            current_app.logger.warning("Receipt for payment %s failed: %s", payment_id, error)
+    if done:
+        table = Payment.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("payment_id"))
+            .values(
+                receipt_path=bindparam("path"),
+                receipt_sha256=bindparam("sha256"),
+                receipt_status="ready",
+                updated_at=datetime.utcnow(),
+            ),
+            done,
+        )
+        db.session.commit()
+    return len(results) - len(done)
+
+
+def regenerate_receipts(
+    since: Optional[datetime] = None,
+    workers: int = 0,
+    batch_size: int = 200,
+    progress: Optional[Progress] = None,
+) -> Tuple[int, int]:
+    """Re-render receipts for every captured payment (optionally only those created since ``since``).
+
+    Batches are rendered on a process pool of ``workers`` processes (0 renders
+    in this process) with at most two batches in flight per worker, so memory
+    stays bounded. Returns ``(rendered, failed)``.
+    """
+    receipts_dir = current_app.config["RECEIPTS_DIR"]
+    engine = current_app.config.get("RECEIPT_ENGINE")
+    total = _captured_query(since).count()
+    started = time.perf_counter()
+    rendered = failed = 0
+
+    def record(results) -> None:
+        nonlocal rendered, failed
+        batch_failed = _save(results)
+        failed += batch_failed
+        rendered += len(results) - batch_failed
+        if progress:
+            progress(rendered, failed, total, time.perf_counter() - started)
+
+    if workers <= 0:
+        for batch in _iter_batches(since, batch_size):
+            record(write_receipt_batch(batch, receipts_dir, engine))
+        return rendered, failed
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for batch in _iter_batches(since, batch_size):
+            pending.add(pool.submit(write_receipt_batch, batch, receipts_dir, engine))
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+        for future in wait(pending).done:
+            record(future.result())
+    return rendered, failed
+
+
+def collect_receipt_garbage(min_age: int = 3600, dry_run: bool = False) -> Tuple[int, int]:
+    """Delete stored receipts that no payment references any more; returns ``(kept, removed)``.
+
+    Regenerating a receipt stores it under a new digest and leaves the old file
+    behind. The store and ``Payment.receipt_sha256`` are both walked in digest
+    order and merged, so memory stays flat however many receipts there are.
+    Files modified in the last ``min_age`` seconds are kept, because a render
+    may have stored one before committing the payment row that points at it.
+    Abandoned staging files past the same age are removed as well.
+    """
+    store = ReceiptStore(current_app.config["RECEIPTS_DIR"])
+    cutoff = time.time() - min_age
+    column = Payment.__table__.c.receipt_sha256
+    referenced = iter(
+        db.session.execute(
+            select(column).where(column.isnot(None)).distinct().order_by(column).execution_options(yield_per=5000)
+        ).scalars()
+    )
+    current = next(referenced, None)
+    kept = removed = 0
+    for digest, path in store.iter_files():
+        while current is not None and current < digest:
+            current = next(referenced, None)
+        if digest == current or path.stat().st_mtime > cutoff:
+            kept += 1
+            continue
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        removed += 1
+    for path in store.staged_files():
+        if path.stat().st_mtime <= cutoff:
+            if not dry_run:
+                path.unlink(missing_ok=True)
+            removed += 1
+    db.session.commit()  # end the read transaction
+    return kept, removed
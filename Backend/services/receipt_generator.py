@@ -1,86 +1,185 @@
+import logging
 from datetime import datetime
-from pathlib import Path
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
 
-from weasyprint import HTML
-from reportlab.pdfgen import canvas
+from jinja2 import Environment
 from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
 
+from services.receipt_store import ReceiptStore
 
-def ensure_receipts_dir(path: str) -> Path:
-    receipts_dir = Path(path)
-    receipts_dir.mkdir(parents=True, exist_ok=True)
-    return receipts_dir
-
-
-def generate_receipt(invoice, payment, student, config) -> str:
-    receipts_dir = ensure_receipts_dir(config["RECEIPTS_DIR"])
-    file_path = receipts_dir / f"{invoice.invoice_no}.pdf"
-    amount_rupees = payment.amount_paise / 100
-    issued_on = datetime.utcnow().strftime("%d %b %Y, %H:%M UTC")
-    html = f"""
-    <html>
-      <head>
-        <style>
-          body {{ font-family: Arial, sans-serif; padding: 32px; }}
-          h1 {{ text-align: center; }}
-          table {{ width: 100%; border-collapse: collapse; margin-top: 24px; }}
-          td, th {{ border: 1px solid #ddd; padding: 8px; }}
-          .meta {{ margin-top: 16px; }}
-        </style>
-      </head>
-      <body>
-        <h1>Basaveshwar Engineering College (BEC) - Receipt</h1>
-        <p><strong>Invoice:</strong> {invoice.invoice_no}</p>
-        <p><strong>Student:</strong> {student.name} ({student.regno})</p>
-        <p><strong>Course:</strong> {student.course}</p>
-        <div class="meta">
-          <p><strong>Payment ID:</strong> {payment.razorpay_payment_id or 'N/A'}</p>
-          <p><strong>Order ID:</strong> {payment.razorpay_order_id}</p>
-          <p><strong>Issued On:</strong> {issued_on}</p>
-        </div>
-        <table>
-          <tr>
-            <th>Description</th>
-            <th>Amount (INR)</th>
-          </tr>
-          <tr>
-            <td>Fee Payment</td>
-            <td>{amount_rupees:.2f}</td>
-          </tr>
-        </table>
-        <p style="margin-top:24px;">Thank you for your payment.</p>
-      </body>
-    </html>
-    """
+logger = logging.getLogger(__name__)
+
+RECEIPT_ENGINES = ("weasyprint", "reportlab")
+RECEIPT_TITLE = "Basaveshwar Engineering College (BEC) - Receipt"
+
+RECEIPT_CSS = """
+body { font-family: Arial, sans-serif; padding: 32px; }
+h1 { text-align: center; }
+table { width: 100%; border-collapse: collapse; margin-top: 24px; }
+td, th { border: 1px solid #ddd; padding: 8px; }
+.meta { margin-top: 16px; }
+.thanks { margin-top: 24px; }
+"""
+
+RECEIPT_HTML = """<html>
+  <head><meta charset="utf-8"></head>
+  <body>
+    <h1>{{ title }}</h1>
+    <p><strong>Invoice:</strong> {{ invoice_no }}</p>
+    <p><strong>Student:</strong> {{ student_name }} ({{ regno }})</p>
+    <p><strong>Course:</strong> {{ course }}</p>
+    <div class="meta">
+      <p><strong>Payment ID:</strong> {{ payment_id }}</p>
+      <p><strong>Order ID:</strong> {{ order_id }}</p>
+      <p><strong>Issued On:</strong> {{ issued_on }}</p>
+    </div>
+    <table>
+      <tr><th>Description</th><th>Amount (INR)</th></tr>
+      <tr><td>Fee Payment</td><td>{{ amount }}</td></tr>
+    </table>
+    <p class="thanks">Thank you for your payment.</p>
+  </body>
+</html>
+"""
+
+
+def receipt_context(invoice, payment, student, issued_on: Optional[datetime] = None) -> dict:
+    """Plain (picklable) values printed on a receipt."""
+    return {
+        "title": RECEIPT_TITLE,
+        "invoice_no": invoice.invoice_no,
+        "student_name": student.name,
+        "regno": student.regno,
+        "course": student.course,
+        "payment_id": payment.razorpay_payment_id or "N/A",
+        "order_id": payment.razorpay_order_id or "N/A",
+        "issued_on": (issued_on or datetime.utcnow()).strftime("%d %b %Y, %H:%M UTC"),
+        "amount": f"{payment.amount_paise / 100:.2f}",
+    }
+
+
+@lru_cache(maxsize=1)
+def _template():
+    return Environment(autoescape=True).from_string(RECEIPT_HTML)
+
+
+def render_receipt_html(context: dict) -> str:
+    return _template().render(**context)
+
+
+@lru_cache(maxsize=1)
+def _weasyprint_assets():
+    """``(HTML, stylesheet, font_config)`` parsed once per process, or None if WeasyPrint cannot load."""
     try:
-        HTML(string=html).write_pdf(str(file_path))
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        font_config = FontConfiguration()
+        return HTML, CSS(string=RECEIPT_CSS, font_config=font_config), font_config
     except Exception:
-        c = canvas.Canvas(str(file_path), pagesize=A4)
-        w, h = A4
-        c.setFont("Helvetica-Bold", 18)
-        c.drawString(72, h - 72, "Basaveshwar Engineering College (BEC) - Receipt")
-        c.setFont("Helvetica", 12)
-        y = h - 120
-        c.drawString(72, y, f"Invoice: {invoice.invoice_no}")
-        y -= 18
-        c.drawString(72, y, f"Student: {student.name} ({student.regno})")
-        y -= 18
-        c.drawString(72, y, f"Course: {student.course}")
-        y -= 18
-        c.drawString(72, y, f"Payment ID: {payment.razorpay_payment_id or 'N/A'}")
-        y -= 18
-        c.drawString(72, y, f"Order ID: {payment.razorpay_order_id}")
-        y -= 18
-        c.drawString(72, y, f"Issued On: {issued_on}")
-        y -= 36
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(72, y, "Description")
-        c.drawString(300, y, "Amount (INR)")
+        logger.warning("WeasyPrint unavailable, receipts will use ReportLab", exc_info=True)
+        return None
+
+
+def _render_weasyprint(context: dict, file_path: str) -> bool:
+    assets = _weasyprint_assets()
+    if assets is None:
+        return False
+    html_class, stylesheet, font_config = assets
+    try:
+        html_class(string=render_receipt_html(context)).write_pdf(
+            file_path, stylesheets=[stylesheet], font_config=font_config
+        )
+    except Exception:
+        logger.warning("WeasyPrint receipt render failed, using ReportLab", exc_info=True)
+        return False
+    return True
+
+
+def _render_reportlab(context: dict, file_path: str) -> None:
+    # invariant output (no timestamp or random document id) so identical receipts hash identically
+    c = canvas.Canvas(file_path, pagesize=A4, invariant=1)
+    _, h = A4
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(72, h - 72, context["title"])
+    c.setFont("Helvetica", 12)
+    y = h - 120
+    for line in (
+        f"Invoice: {context['invoice_no']}",
+        f"Student: {context['student_name']} ({context['regno']})",
+        f"Course: {context['course']}",
+        f"Payment ID: {context['payment_id']}",
+        f"Order ID: {context['order_id']}",
+        f"Issued On: {context['issued_on']}",
+    ):
+        c.drawString(72, y, line)
         y -= 18
-        c.setFont("Helvetica", 12)
-        c.drawString(72, y, "Fee Payment")
-        c.drawString(300, y, f"{amount_rupees:.2f}")
-        c.showPage()
-        c.save()
-    return str(file_path)
+    y -= 18
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(72, y, "Description")
+    c.drawString(300, y, "Amount (INR)")
+    y -= 18
+    c.setFont("Helvetica", 12)
+    c.drawString(72, y, "Fee Payment")
+    c.drawString(300, y, context["amount"])
+    c.showPage()
+    c.save()
+
+
+def render_receipt(context: dict, file_path: str, engine: str = "weasyprint") -> str:
+    """Render one receipt PDF; returns the engine that produced it.
+
+    ``weasyprint`` falls back to ``reportlab`` when it is unavailable or fails.
+    """
+    engine = (engine or "weasyprint").lower()
+    if engine not in RECEIPT_ENGINES:
+        raise ValueError(f"receipt engine must be one of: {', '.join(RECEIPT_ENGINES)}")
+    if engine == "weasyprint" and _render_weasyprint(context, file_path):
+        return "weasyprint"
+    _render_reportlab(context, file_path)
+    return "reportlab"
+
+
+def write_receipt(context: dict, receipts_dir: str, engine: str = "weasyprint") -> Tuple[str, str]:
+    """Render into the receipt store; returns ``(path, sha256)``.
+
+    The PDF is written to a staging file and renamed into place, so readers
+    never see a partial file.
+    """
+    store = ReceiptStore(receipts_dir)
+    tmp_path = store.staging_path()
+    try:
+        render_receipt(context, str(tmp_path), engine)
+        return store.put(tmp_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def write_receipt_batch(
+    items: Iterable[Tuple[int, dict]], receipts_dir: str, engine: str
+) -> List[Tuple[int, Optional[str], Optional[str], Optional[str]]]:
+    """Render ``(payment_id, context)`` pairs; returns ``(payment_id, path, sha256, error)`` for each.
+
+    Needs no app or database, so it can run in a worker process.
+    """
+    results = []
+    for payment_id, context in items:
+        try:
+            path, sha256 = write_receipt(context, receipts_dir, engine)
+            results.append((payment_id, path, sha256, None))
+        except Exception as exc:  # one bad receipt must not sink the batch
+            results.append((payment_id, None, None, str(exc)))
+    return results
+
+
+def issued_on(payment) -> datetime:
+    """When the payment was captured; a re-render must not move the date printed on the receipt."""
+    return payment.captured_at or payment.created_at
+
 
+def generate_receipt(invoice, payment, student, config) -> Tuple[str, str]:
+    context = receipt_context(invoice, payment, student, issued_on(payment))
+    return write_receipt(context, config["RECEIPTS_DIR"], config.get("RECEIPT_ENGINE"))
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from flask import current_app
+
+from extensions import db
+from models import Payment, ReceiptJob
+from services import workers
+from services.receipt_generator import generate_receipt
+
+MAX_ATTEMPTS = 3
+
+
+def queue_receipt(payment: Payment) -> Optional[ReceiptJob]:
+    """Mark ``payment`` as awaiting a receipt and record a durable job for it.
+
+    Runs in the caller's transaction; call ``dispatch_receipts`` after the
+    commit so a worker only ever sees committed jobs.
+    """
+    if payment.receipt_status in ("pending", "ready"):
+        return None
+    payment.receipt_status = "pending"
+    job = ReceiptJob.query.filter_by(payment_id=payment.id).first() if payment.id else None
+    if job is None:
+        job = ReceiptJob(payment=payment, status="queued", attempts=0)
+        db.session.add(job)
+    else:
+        job.status = "queued"
+        job.error = None
+        job.not_before = None
+    return job
+
+
+def dispatch_receipts(job_ids: List[int]) -> None:
+    app = current_app._get_current_object()
+    for job_id in job_ids:
+        workers.submit(app, "receipts", app.config.get("RECEIPT_WORKERS", 2), run_receipt_job, job_id)
+
+
+def _stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get("RECEIPT_JOB_STALE_SECONDS", 300))
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt: the base delay, doubled for every failure after the first."""
+    return timedelta(seconds=current_app.config.get("RECEIPT_RETRY_DELAY_SECONDS", 30) * 2 ** (attempts - 1))
+
+
+def _claimable():
+    """Queued jobs whose retry delay has passed, and running jobs abandoned by a dead worker."""
+    return db.or_(
+        db.and_(
+            ReceiptJob.status == "queued",
+            db.or_(ReceiptJob.not_before.is_(None), ReceiptJob.not_before <= datetime.utcnow()),
+        ),
+        db.and_(ReceiptJob.status == "running", ReceiptJob.updated_at < _stale_before()),
+    )
+
+
+def _claim(job_id: int) -> bool:
+    """Atomically move a job to "running"; a running job may be reclaimed once it looks abandoned."""
+    claimed = (
+        ReceiptJob.query.filter(ReceiptJob.id == job_id, _claimable()).update(
+            {
+                "status": "running",
+                "attempts": ReceiptJob.attempts + 1,
+                "not_before": None,
+                "updated_at": datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def run_receipt_job(job_id: int) -> None:
+    if not _claim(job_id):
+        return
+    job = db.session.get(ReceiptJob, job_id)
+    payment = job.payment
+    try:
+        path, sha256 = generate_receipt(payment.invoice, payment, payment.student, current_app.config)
+    except Exception as exc:
+        current_app.logger.exception("Receipt job %s failed", job_id)
+        db.session.rollback()
+        retry = job.attempts < MAX_ATTEMPTS
+        job.status = "queued" if retry else "failed"
+        job.error = str(exc)
+        if retry:
+            # not re-dispatched here: resume_receipt_jobs or a receipt poll picks it up once the delay passes
+            job.not_before = datetime.utcnow() + _retry_delay(job.attempts)
+        payment.receipt_status = "pending" if retry else "failed"
+        db.session.commit()
+        return
+    job.status = "done"
+    job.error = None
+    payment.receipt_path = path
+    payment.receipt_sha256 = sha256
+    payment.receipt_status = "ready"
+    db.session.commit()
+
+
+def resume_receipt_jobs(limit: Optional[int] = None) -> int:
+    """Re-dispatch queued jobs due to run and running jobs abandoned by a dead worker. Returns the count."""
+    query = db.session.query(ReceiptJob.id).filter(_claimable()).order_by(ReceiptJob.id.asc())
+    if limit:
+        query = query.limit(limit)
+    job_ids = [job_id for (job_id,) in query]
+    dispatch_receipts(job_ids)
+    return len(job_ids)
+
+
+def nudge_receipt(payment: Payment) -> None:
+    """Re-dispatch a pending receipt whose retry is due, or whose job was lost, e.g. queued just before a restart."""
+    job = ReceiptJob.query.filter(ReceiptJob.payment_id == payment.id, _claimable()).first()
+    if job and (job.not_before is not None or job.updated_at < _stale_before()):
+        dispatch_receipts([job.id])
@@ -0,0 +1,55 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterator, Tuple
+from uuid import uuid4
+
+
+class ReceiptStore:
+    """Content-addressed receipt files sharded as ``<root>/ab/cd/<sha256>.pdf``.
+
+    A file is named by the SHA-256 of its bytes, so once written it never
+    changes: identical renders share one file and the digest doubles as a
+    strong ETag. Two levels of 256 shards keep directories small at any volume.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def relative_path(self, digest: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.pdf"
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / self.relative_path(digest)
+
+    def staging_path(self) -> Path:
+        """A fresh temporary path on the same filesystem, so ``put`` can rename atomically."""
+        staging = self.root / ".staging"
+        staging.mkdir(parents=True, exist_ok=True)
+        return staging / f"{uuid4().hex}.pdf"
+
+    def put(self, tmp_path: Path) -> Tuple[str, str]:
+        """Move a fully written file into the store; returns ``(path, sha256)``."""
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(64 * 1024), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        path = self.path_for(sha256)
+        if path.exists():
+            os.unlink(tmp_path)
+            os.utime(path)  # a fresh mtime keeps ``flask receipts gc`` off a file that is in use again
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+        return str(path), sha256
+
+    def iter_files(self) -> Iterator[Tuple[str, Path]]:
+        """``(sha256, path)`` for every stored receipt, in digest order."""
+        for first in sorted(self.root.glob("[0-9a-f][0-9a-f]")):
+            for second in sorted(first.glob("[0-9a-f][0-9a-f]")):
+                for path in sorted(second.glob("*.pdf")):
+                    yield path.stem, path
+
+    def staged_files(self) -> Iterator[Path]:
+        return (self.root / ".staging").glob("*.pdf")
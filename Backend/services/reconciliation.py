@@ -0,0 +1,338 @@
+import csv
+import json
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from extensions import db
+from models import Payment
+from utils import iter_text_chunks, iter_text_lines
+
+RECONCILE_FORMATS = ("csv", "json", "jsonl")
+AMOUNT_UNITS = ("paise", "rupees")
+DEFAULT_BATCH_SIZE = 5000
+MISMATCH_TYPES = ("missing_in_db", "missing_in_export", "duplicate_in_export", "amount_mismatch", "status_drift")
+MISMATCH_FIELDS = (
+    "type",
+    "line",
+    "razorpayPaymentId",
+    "razorpayOrderId",
+    "paymentId",
+    "invoiceNo",
+    "ourAmount",
+    "gatewayAmount",
+    "ourStatus",
+    "gatewayStatus",
+)
+
+# Razorpay payment states in our vocabulary; settlement rows carry no status and count as captured.
+_GATEWAY_STATUS = {"captured": "captured", "failed": "failed", "refunded": "refunded", "authorized": "created", "created": "created"}
+_payments = Payment.__table__
+# Core selects: plain tuples, without the ORM's per-row loading overhead
+_PAYMENT_COLUMNS = (
+    _payments.c.id,
+    _payments.c.razorpay_payment_id,
+    _payments.c.razorpay_order_id,
+    _payments.c.invoice_no,
+    _payments.c.amount_paise,
+    _payments.c.status,
+    _payments.c.created_at,
+)
+
+# a collection member's key, up to the start of its value
+_MEMBER = re.compile(r'("(?:[^"\\]|\\.)*")\s*:\s*')
+
+# (line or item number, parsed row or None, parse error or None)
+ExportRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+class ReconciliationError(Exception):
+    pass
+
+
+def detect_export_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> Optional[str]:
+    name = (filename or "").lower()
+    kind = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in kind:
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")) or "ndjson" in kind or "jsonl" in kind:
+        return "jsonl"
+    if name.endswith(".json") or "json" in kind:
+        return "json"
+    return None
+
+
+def _iter_csv(stream: IO[bytes]) -> Iterator[ExportRow]:
+    reader = csv.reader(iter_text_lines(stream))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    if not {"id", "entity_id", "payment_id", "order_id"} & set(columns):
+        raise ReconciliationError("CSV header needs a payment_id, entity_id, id or order_id column")
+    for values in reader:
+        if values and any(values):
+            yield reader.line_num, dict(zip(columns, values)), None
+
+
+def _iter_jsonl(stream: IO[bytes]) -> Iterator[ExportRow]:
+    for line_no, line in enumerate(iter_text_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, None, "Invalid JSON"
+            continue
+        yield line_no, row, None if isinstance(row, dict) else "Expected a JSON object"
+
+
+def _iter_json(stream: IO[bytes]) -> Iterator[ExportRow]:
+    """Items of a JSON array, or of the ``items`` array in a Razorpay collection, decoded one at a time.
+
+    Other members of a collection object are decoded and skipped whole. A value
+    that ends exactly at the end of a chunk is retried with the next one, since
+    a number or literal may continue there.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter_text_chunks(stream)
+    buffer, pos, item, state = "", 0, 0, "start"  # start -> members (of a collection) -> items
+    while True:
+        text = next(chunks, None)
+        eof = text is None
+        buffer, pos = buffer[pos:] + (text or ""), 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in (" \t\r\n" if state == "start" else " \t\r\n,"):
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if state == "start":
+                if buffer[pos] not in "[{":
+                    raise ReconciliationError("JSON export must be an array or an object with an items array")
+                state = "items" if buffer[pos] == "[" else "members"
+                pos += 1
+                continue
+            if state == "items" and buffer[pos] == "]":
+                return
+            if state == "members":
+                if buffer[pos] == "}":
+                    raise ReconciliationError("JSON export has no items array")
+                member = _MEMBER.match(buffer, pos)
+                if member is None or member.end() == len(buffer):
+                    break  # the key or its value starts in the next chunk
+                if json.loads(member.group(1)) == "items":
+                    if buffer[member.end()] != "[":
+                        raise ReconciliationError("JSON export items must be an array")
+                    pos, state = member.end() + 1, "items"
+                    continue
+            try:
+                value, end = decoder.raw_decode(buffer, member.end() if state == "members" else pos)
+            except ValueError:
+                break  # the value continues in the next chunk
+            if end == len(buffer) and not eof:
+                break
+            pos = end
+            if state == "items":
+                item += 1
+                yield item, value, None if isinstance(value, dict) else "Expected a JSON object"
+        if eof:
+            break
+    if state != "start" or buffer[pos:].strip():
+        raise ReconciliationError(f"JSON export is truncated or invalid after item {item}")
+
+
+def iter_export_rows(stream: IO[bytes], fmt: str) -> Iterator[ExportRow]:
+    if fmt == "csv":
+        return _iter_csv(stream)
+    if fmt == "jsonl":
+        return _iter_jsonl(stream)
+    if fmt == "json":
+        return _iter_json(stream)
+    raise ReconciliationError(f"format must be one of: {', '.join(RECONCILE_FORMATS)}")
+
+
+def _amount(value, unit: str) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    amount = Decimal(str(value).replace(",", ""))
+    return int((amount * 100 if unit == "rupees" else amount).to_integral_value())
+
+
+def _gateway_row(row: dict, unit: str) -> Optional[dict]:
+    """Normalize one export row; None for non-payment entries (refunds, adjustments)."""
+    kind = (row.get("type") or row.get("entity") or "payment").strip().lower()
+    if kind != "payment":
+        return None
+    payment_id = row.get("payment_id") or row.get("entity_id") or row.get("id") or None
+    order_id = row.get("order_id") or None
+    if not (payment_id or order_id):
+        raise ValueError("row has no payment or order id")
+    status = str(row.get("status") or "captured").strip().lower()
+    return {
+        "payment_id": payment_id,
+        "order_id": order_id,
+        "amount": _amount(row.get("amount"), unit),
+        "status": _GATEWAY_STATUS.get(status, status),
+    }
+
+
+class _Matches:
+    """Which payments the export mentioned, as a bitmap over ``Payment.id``."""
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.first_seen: Optional[datetime] = None
+        self.last_seen: Optional[datetime] = None
+
+    def add(self, payment_id: int, created_at: datetime) -> bool:
+        """Mark a payment; returns False if it was already marked."""
+        index, bit = divmod(payment_id, 8)
+        if index >= len(self.bits):
+            self.bits.extend(bytes(index - len(self.bits) + 1 + len(self.bits) // 2))
+        if self.bits[index] & (1 << bit):
+            return False
+        self.bits[index] |= 1 << bit
+        if self.first_seen is None or created_at < self.first_seen:
+            self.first_seen = created_at
+        if self.last_seen is None or created_at > self.last_seen:
+            self.last_seen = created_at
+        return True
+
+    def __contains__(self, payment_id: int) -> bool:
+        index, bit = divmod(payment_id, 8)
+        return index < len(self.bits) and bool(self.bits[index] & (1 << bit))
+
+
+def _lookup(column, values: List[str]) -> Dict[str, tuple]:
+    rows = {}
+    for start in range(0, len(values), 500):
+        chunk = values[start : start + 500]
+        for row in db.session.execute(db.select(*_PAYMENT_COLUMNS).where(column.in_(chunk))):
+            rows[row[1] if column is _payments.c.razorpay_payment_id else row[2]] = row
+    return rows
+
+
+def _mismatch(kind: str, line=None, gateway: Optional[dict] = None, payment: Optional[tuple] = None) -> dict:
+    gateway = gateway or {}
+    return {
+        "type": kind,
+        "line": line,
+        "razorpayPaymentId": gateway.get("payment_id") or (payment[1] if payment else None),
+        "razorpayOrderId": gateway.get("order_id") or (payment[2] if payment else None),
+        "paymentId": payment[0] if payment else None,
+        "invoiceNo": payment[3] if payment else None,
+        "ourAmount": payment[4] if payment else None,
+        "gatewayAmount": gateway.get("amount"),
+        "ourStatus": payment[5] if payment else None,
+        "gatewayStatus": gateway.get("status"),
+    }
+
+
+class Reconciler:
+    """Hash-join an export against ``payments`` one batch of rows at a time.
+
+    Only the current batch and a bitmap of matched payment ids are held in
+    memory, so a million-line export costs a few megabytes. Payments are
+    matched by ``razorpay_payment_id`` and, failing that, ``razorpay_order_id``.
+    """
+
+    def __init__(self, amount_unit: str, batch_size: int = DEFAULT_BATCH_SIZE, since=None, until=None):
+        if amount_unit not in AMOUNT_UNITS:
+            raise ReconciliationError(f"amount unit must be one of: {', '.join(AMOUNT_UNITS)}")
+        self.amount_unit = amount_unit
+        self.batch_size = max(batch_size, 1)
+        self.since, self.until = since, until
+        self.matches = _Matches()
+        self.summary = dict.fromkeys(("rows", "matched", "skipped", "invalid") + MISMATCH_TYPES, 0)
+
+    def _emit(self, mismatch: dict) -> dict:
+        self.summary[mismatch["type"]] += 1
+        return mismatch
+
+    def _join(self, batch: List[Tuple[int, dict]]) -> Iterator[dict]:
+        by_payment = _lookup(_payments.c.razorpay_payment_id, [row["payment_id"] for _, row in batch if row["payment_id"]])
+        unmatched = [row["order_id"] for _, row in batch if row["order_id"] and row["payment_id"] not in by_payment]
+        by_order = _lookup(_payments.c.razorpay_order_id, unmatched) if unmatched else {}
+        for line, row in batch:
+            payment = by_payment.get(row["payment_id"]) or by_order.get(row["order_id"])
+            if payment is None:
+                yield self._emit(_mismatch("missing_in_db", line, row))
+                continue
+            if not self.matches.add(payment[0], payment[6]):
+                yield self._emit(_mismatch("duplicate_in_export", line, row, payment))
+                continue
+            self.summary["matched"] += 1
+            if row["amount"] is not None and row["amount"] != payment[4]:
+                yield self._emit(_mismatch("amount_mismatch", line, row, payment))
+            if row["status"] != payment[5]:
+                yield self._emit(_mismatch("status_drift", line, row, payment))
+
+    def _unseen_captures(self) -> Iterator[dict]:
+        """Captured payments inside the export's window that it never mentioned."""
+        since = self.since or self.matches.first_seen
+        if self.until:
+            until = self.until
+        elif self.matches.last_seen:
+            until = self.matches.last_seen + timedelta(microseconds=1)
+        else:
+            until = datetime.utcnow() if self.since else None
+        if since is None or until is None:
+            return
+        query = (
+            db.select(*_PAYMENT_COLUMNS)
+            .where(_payments.c.status == "captured", _payments.c.created_at >= since, _payments.c.created_at < until)
+            .order_by(_payments.c.created_at.asc(), _payments.c.id.asc())
+            .execution_options(yield_per=self.batch_size)
+        )
+        for payment in db.session.execute(query):
+            if payment[0] not in self.matches:
+                yield self._emit(_mismatch("missing_in_export", payment=payment))
+
+    def run(self, rows: Iterator[ExportRow]) -> Iterator[dict]:
+        batch: List[Tuple[int, dict]] = []
+        for line, row, error in rows:
+            self.summary["rows"] += 1
+            if error is None:
+                try:
+                    normalized = _gateway_row(row, self.amount_unit)
+                except (ValueError, InvalidOperation, AttributeError) as exc:
+                    error = str(exc) if isinstance(exc, ValueError) else "amount is not a number"
+            if error is not None:
+                self.summary["invalid"] += 1
+                yield {"type": "invalid", "line": line, "error": error}
+                continue
+            if normalized is None:
+                self.summary["skipped"] += 1
+                continue
+            batch.append((line, normalized))
+            if len(batch) >= self.batch_size:
+                yield from self._join(batch)
+                batch = []
+        if batch:
+            yield from self._join(batch)
+        yield from self._unseen_captures()
+        db.session.commit()  # end the read transaction
+
+
+def reconcile(
+    stream: IO[bytes],
+    fmt: str,
+    amount_unit: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[dict]:
+    """Stream mismatches between a Razorpay export and ``payments``, then ``{"type": "summary", ...}``.
+
+    Amounts are read as rupees for CSV (the dashboard export) and as paise for
+    JSON (API dumps) unless ``amount_unit`` says otherwise. Captured payments
+    from ``since`` up to (not including) ``until`` that the export never
+    mentions are reported last; without a window, the span of the matched
+    payments is used.
+    """
+    if fmt not in RECONCILE_FORMATS:
+        raise ReconciliationError(f"format must be one of: {', '.join(RECONCILE_FORMATS)}")
+    reconciler = Reconciler(amount_unit or ("rupees" if fmt == "csv" else "paise"), batch_size or DEFAULT_BATCH_SIZE, since, until)
+    yield from reconciler.run(iter_export_rows(stream, fmt))
+    yield {"type": "summary", **reconciler.summary}
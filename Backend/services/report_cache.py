@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import Invoice, Payment, Student
+
+_INVALIDATE_FLAG = "invalidate_report_cache"
+
+
+class MemoryBackend:
+    """Process-local LRU with per-entry expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared backend for any client speaking the Redis ``get``/``setex``/``incr`` commands.
+
+    Invalidation bumps a generation counter instead of scanning keys, so every
+    worker sees the clear at once and stale entries simply age out.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "edupay:reports:"):
+        self.client = client
+        self.prefix = prefix
+
+    def _generation(self) -> str:
+        value = self.client.get(f"{self.prefix}generation")
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value or "0"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{self._generation()}:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self._key(key))
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        self.client.setex(self._key(key), ttl, value)
+
+    def clear(self) -> None:
+        self.client.incr(f"{self.prefix}generation")
+
+
+class ReportCache:
+    def __init__(self, backend, ttl: int = 300):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        cached = self.backend.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return json.loads(cached)
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        self.backend.set(key, json.dumps(value), self.ttl)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _build_backend(config):
+    backend = (config.get("REPORT_CACHE_BACKEND") or "memory").lower()
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("REPORT_CACHE_BACKEND=redis requires the 'redis' package") from exc
+        return RedisBackend(redis.Redis.from_url(config["REPORT_CACHE_URL"]))
+    return MemoryBackend(config.get("REPORT_CACHE_MAX_ENTRIES", 128))
+
+
+def init_report_cache(app, backend=None) -> ReportCache:
+    cache = ReportCache(backend or _build_backend(app.config), app.config.get("REPORT_CACHE_TTL", 300))
+    app.extensions["report_cache"] = cache
+    return cache
+
+
+def get_report_cache() -> ReportCache:
+    return current_app.extensions["report_cache"]
+
+
+def report_cache_key(name: str, *parts) -> str:
+    normalized = [part.isoformat()[:10] if hasattr(part, "isoformat") else str(part or "*") for part in parts]
+    return ":".join([name, *normalized])
+
+
+def invalidate_reports() -> None:
+    if has_app_context() and "report_cache" in current_app.extensions:
+        get_report_cache().invalidate()
+
+
+def _affects_reports(session: Session) -> bool:
+    for obj in session.new:
+        if isinstance(obj, (Student, Invoice, Payment)):
+            return True
+    for obj in session.deleted:
+        if isinstance(obj, (Student, Invoice, Payment)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, Payment) and inspect(obj).attrs.status.history.has_changes():
+            return True
+        if isinstance(obj, Invoice) and inspect(obj).attrs.amount_paise.history.has_changes():
+            return True
+    return False
+
+
+@event.listens_for(Session, "before_flush")
+def _track_report_changes(session, flush_context, instances):
+    if _affects_reports(session):
+        session.info[_INVALIDATE_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_INVALIDATE_FLAG, False):
+        invalidate_reports()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidation(session):
+    session.info.pop(_INVALIDATE_FLAG, None)
@@ -0,0 +1,189 @@
+import csv
+from datetime import timedelta
+from html import escape
+from typing import Iterable, Iterator, Optional
+
+from flask import current_app
+from weasyprint import HTML
+
+from extensions import db
+from models import Invoice, Payment, Student
+from services.balances import iter_defaulter_details, iter_defaulters, list_defaulters
+from services.report_cache import get_report_cache, report_cache_key
+from services.report_renderer import UnencodableTextError, render_report
+from services.report_series import collection_series
+from services.rollups import collection_totals
+
+PAYMENT_DETAIL_HEADER = [
+    "InvoiceNo",
+    "Regno",
+    "StudentName",
+    "Course",
+    "Amount",
+    "Currency",
+    "RazorpayOrderId",
+    "RazorpayPaymentId",
+    "CreatedAt",
+]
+
+
+class _LineBuffer:
+    """File-like sink that hands back whatever ``csv.writer`` writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def _iter_csv(rows: Iterable[Iterable], batch_size: int) -> Iterator[str]:
+    writer = csv.writer(_LineBuffer())
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _summary_rows(start, end, batch_size, granularity):
+    total_collected, by_course = collection_totals(start, end)
+    yield ["Section", "Key", "Value"]
+    yield ["Summary", "TotalCollected", total_collected / 100]
+    yield ["Course", "Name", "Amount"]
+    for item in by_course:
+        yield ["Course", item["course"], item["amount"] / 100]
+    yield ["Period", "Start", "Amount"]
+    for point in collection_series(granularity, start, end)["series"]:
+        yield ["Period", point["period"], point["amount"] / 100]
+    yield ["Defaulter", "StudentId", "Amount"]
+    for student_id, amount in iter_defaulters(batch_size):
+        yield ["Defaulter", student_id, amount / 100]
+
+
+def captured_payments_query(start=None, end=None):
+    query = (
+        db.session.query(
+            Invoice.invoice_no,
+            Student.regno,
+            Student.name,
+            Student.course,
+            Payment.amount_paise,
+            Payment.currency,
+            Payment.razorpay_order_id,
+            Payment.razorpay_payment_id,
+            Payment.created_at,
+        )
+        .join(Invoice, Invoice.id == Payment.invoice_id)
+        .join(Student, Student.id == Payment.student_id)
+        .filter(Payment.status == "captured")
+    )
+    if start:
+        query = query.filter(Payment.created_at >= start)
+    if end:
+        query = query.filter(Payment.created_at < end + timedelta(days=1))
+    return query.order_by(Payment.created_at.asc(), Payment.id.asc())
+
+
+def _payment_rows(start, end, batch_size):
+    yield PAYMENT_DETAIL_HEADER
+    for invoice_no, regno, name, course, amount, currency, order_id, payment_id, created_at in (
+        captured_payments_query(start, end).yield_per(batch_size)
+    ):
+        yield [
+            invoice_no,
+            regno,
+            name,
+            course,
+            amount / 100,
+            currency,
+            order_id or "",
+            payment_id or "",
+            created_at.isoformat(),
+        ]
+
+
+def iter_summary_csv(start=None, end=None, batch_size: int = 1000, granularity: str = "daily") -> Iterator[str]:
+    return _iter_csv(_summary_rows(start, end, batch_size, granularity), batch_size)
+
+
+def iter_payments_csv(start=None, end=None, batch_size: int = 1000) -> Iterator[str]:
+    """One CSV row per captured payment, fetched from the database ``batch_size`` rows at a time."""
+    return _iter_csv(_payment_rows(start, end, batch_size), batch_size)
+
+
+def summary_data(start=None, end=None) -> dict:
+    def compute():
+        total_collected, by_course = collection_totals(start, end)
+        return {
+            "totalCollected": total_collected,
+            "byCourse": by_course,
+            "defaulters": list_defaulters(),
+        }
+
+    return get_report_cache().get_or_compute(report_cache_key("summary", start, end), compute)
+
+
+def _render_weasyprint(file_path, title, total_collected, by_course, series, defaulters) -> None:
+    html = f"""
+    <html><head><meta charset='utf-8'>
+    <style>body {{ font-family: Arial, sans-serif; padding: 24px; }} h1 {{ text-align:center; }}
+    table {{ width:100%; border-collapse: collapse; margin-top: 16px; }}
+    th, td {{ border:1px solid #ddd; padding:8px; text-align:left; }}
+    </style></head>
+    <body>
+    <h1>{escape(title)}</h1>
+    <h3>Total Collected: ₹{(total_collected/100):,.2f}</h3>
+    <h3>By Course</h3>
+    <table><tr><th>Course</th><th>Amount (INR)</th></tr>
+    {''.join([f"<tr><td>{escape(item['course'])}</td><td>{(item['amount']/100):,.2f}</td></tr>" for item in by_course])}
+    </table>
+    <h3>Collections by Period</h3>
+    <table><tr><th>Period</th><th>Payments</th><th>Amount (INR)</th></tr>
+    {''.join([f"<tr><td>{p['period']}</td><td>{p['count']}</td><td>{(p['amount']/100):,.2f}</td></tr>" for p in series])}
+    </table>
+    <h3>Defaulters</h3>
+    <table><tr><th>Student ID</th><th>Regno</th><th>Name</th><th>Course</th><th>Outstanding (INR)</th></tr>
+    {''.join([
+        f"<tr><td>{sid}</td><td>{escape(regno)}</td><td>{escape(name)}</td><td>{escape(course)}</td>"
+        f"<td>{(amount/100):,.2f}</td></tr>"
+        for sid, regno, name, course, amount in defaulters
+    ])}
+    </table>
+    </body></html>
+    """
+    HTML(string=html).write_pdf(file_path)
+
+
+def render_report_pdf(report_type: str, start, end, file_path: str, engine: Optional[str] = None) -> None:
+    """Render the summary report PDF with the configured engine (``REPORT_PDF_ENGINE``).
+
+    The ReportLab engine paginates every table and streams defaulters from the
+    database, and hands over to WeasyPrint when a name is outside cp1252;
+    WeasyPrint lays out the whole document in memory and falls back to
+    ReportLab if it fails.
+    """
+    config = current_app.config
+    engine = (engine or config.get("REPORT_PDF_ENGINE") or "reportlab").lower()
+    batch_size = config.get("REPORT_EXPORT_BATCH_SIZE", 1000)
+    total_collected, by_course = collection_totals(start, end)
+    series = collection_series(report_type, start, end)["series"]
+    title = f"Basaveshwar Engineering College (BEC) {report_type.capitalize()} Report"
+
+    if engine == "weasyprint":
+        try:
+            defaulters = list(iter_defaulter_details(batch_size))
+            _render_weasyprint(file_path, title, total_collected, by_course, series, defaulters)
+            return
+        except Exception:
+            current_app.logger.warning("WeasyPrint report render failed, using ReportLab", exc_info=True)
+        render_report(file_path, title, total_collected, by_course, series, iter_defaulter_details(batch_size))
+        return
+
+    try:
+        render_report(file_path, title, total_collected, by_course, series, iter_defaulter_details(batch_size))
+    except UnencodableTextError:
+        # Helvetica only covers cp1252; WeasyPrint can use the system's fonts for other scripts.
+        current_app.logger.warning("Report text is outside cp1252, rendering it with WeasyPrint", exc_info=True)
+        defaulters = list(iter_defaulter_details(batch_size))
+        _render_weasyprint(file_path, title, total_collected, by_course, series, defaulters)
@@ -0,0 +1,235 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from extensions import db
+from models import CollectionRollup, Invoice, Payment, ReportJob, Student
+from services import workers
+from services.report_export import render_report_pdf
+from services.report_series import GRANULARITIES, ReportSeriesError, check_series_span
+
+REPORT_TYPES = GRANULARITIES
+
+
+class ReportJobError(Exception):
+    pass
+
+
+def reports_dir() -> Path:
+    path = Path(current_app.config.get("REPORTS_DIR") or Path(current_app.instance_path) / "reports")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def data_version() -> str:
+    """Fingerprint of every table a report reads, taken in a single statement."""
+    columns = []
+    for model in (Payment, Invoice, Student, CollectionRollup):
+        columns.append(select(func.count(model.id)).scalar_subquery())
+        columns.append(select(func.max(model.updated_at)).scalar_subquery())
+    row = db.session.execute(select(*columns)).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:16]
+
+
+def artifact_key(report_type: str, start, end, version: str) -> str:
+    parts = [
+        report_type,
+        start.isoformat()[:10] if start else "*",
+        end.isoformat()[:10] if end else "*",
+        current_app.config.get("REPORT_PDF_ENGINE") or "reportlab",
+        version,
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:40]
+
+
+def _artifact_path(report_type: str, key: str) -> Path:
+    return reports_dir() / f"BEC_{report_type}_report_{key}.pdf"
+
+
+def _validate_type(report_type: str, start=None, end=None) -> str:
+    report_type = (report_type or "daily").lower()
+    if report_type not in REPORT_TYPES:
+        raise ReportJobError(f"type must be one of: {', '.join(REPORT_TYPES)}")
+    try:
+        check_series_span(report_type, start, end)
+    except ReportSeriesError as exc:
+        raise ReportJobError(str(exc)) from exc
+    return report_type
+
+
+def build_artifact(
+    report_type: str, start, end, key: str, progress: Optional[Callable[[int], None]] = None
+) -> Path:
+    """Render the report into its content-addressed path unless an identical one already exists."""
+    path = _artifact_path(report_type, key)
+    if path.exists():
+        os.utime(path)
+        return path
+
+    if progress:
+        progress(20)
+    tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    try:
+        render_report_pdf(report_type, start, end, str(tmp_path))
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    if progress:
+        progress(90)
+    evict_artifacts(keep=path)
+    return path
+
+
+def ensure_report_artifact(report_type: str, start=None, end=None) -> Path:
+    report_type = _validate_type(report_type, start, end)
+    return build_artifact(report_type, start, end, artifact_key(report_type, start, end, data_version()))
+
+
+def _stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get("REPORT_JOB_STALE_SECONDS", 300))
+
+
+def _abandoned():
+    """Jobs no worker has touched for REPORT_JOB_STALE_SECONDS: lost from the queue or left by a dead worker."""
+    return db.and_(ReportJob.status.in_(["queued", "running"]), ReportJob.updated_at < _stale_before())
+
+
+def dispatch_report_jobs(job_ids: List[str]) -> None:
+    app = current_app._get_current_object()
+    for job_id in job_ids:
+        workers.submit(app, "reports", app.config.get("REPORT_WORKERS", 2), run_report_job, job_id)
+
+
+def _redispatch(job_ids: List[str]) -> None:
+    # requeue and touch the rows, so the next identical request does not dispatch them again
+    ReportJob.query.filter(ReportJob.job_id.in_(job_ids), _abandoned()).update(
+        {"status": "queued", "updated_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    dispatch_report_jobs(job_ids)
+
+
+def enqueue_report_job(report_type: str, start=None, end=None) -> ReportJob:
+    report_type = _validate_type(report_type, start, end)
+    key = artifact_key(report_type, start, end, data_version())
+
+    in_flight = (
+        ReportJob.query.filter(ReportJob.artifact_key == key, ReportJob.status.in_(["queued", "running"]))
+        .order_by(ReportJob.id.asc())
+        .first()
+    )
+    if in_flight:
+        if in_flight.updated_at < _stale_before():
+            _redispatch([in_flight.job_id])
+            db.session.refresh(in_flight)
+        return in_flight
+
+    job = ReportJob(
+        job_id=uuid4().hex,
+        report_type=report_type,
+        start_date=start.date() if start else None,
+        end_date=end.date() if end else None,
+        artifact_key=key,
+        status="queued",
+        progress=0,
+    )
+    path = _artifact_path(report_type, key)
+    if path.exists():
+        os.utime(path)
+        job.status = "done"
+        job.progress = 100
+        job.artifact_path = str(path)
+    db.session.add(job)
+    db.session.commit()
+
+    if job.status == "queued":
+        dispatch_report_jobs([job.job_id])
+    return job
+
+
+def _claim(job_id: str) -> bool:
+    """Atomically move a job to "running"; a running job may be reclaimed once it looks abandoned."""
+    claimable = db.or_(ReportJob.status == "queued", _abandoned())
+    claimed = ReportJob.query.filter(ReportJob.job_id == job_id, claimable).update(
+        {"status": "running", "progress": 10, "updated_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def run_report_job(job_id: str) -> None:
+    if not _claim(job_id):
+        return
+    job = ReportJob.query.filter_by(job_id=job_id).first()
+
+    def progress(value: int) -> None:
+        job.progress = value
+        db.session.commit()
+
+    try:
+        path = build_artifact(job.report_type, job.start_date, job.end_date, job.artifact_key, progress)
+    except Exception as exc:
+        current_app.logger.exception("Report job %s failed", job_id)
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(exc)
+    else:
+        job.status = "done"
+        job.progress = 100
+        job.artifact_path = str(path)
+    db.session.commit()
+
+
+def resume_report_jobs(limit: Optional[int] = None) -> int:
+    """Re-dispatch queued jobs and running jobs abandoned by a dead worker. Returns the count."""
+    query = db.session.query(ReportJob.job_id).filter(
+        db.or_(ReportJob.status == "queued", _abandoned())
+    ).order_by(ReportJob.id.asc())
+    if limit:
+        query = query.limit(limit)
+    job_ids = [job_id for (job_id,) in query]
+    dispatch_report_jobs(job_ids)
+    return len(job_ids)
+
+
+def get_report_job(job_id: str) -> Optional[ReportJob]:
+    return ReportJob.query.filter_by(job_id=job_id).first()
+
+
+def evict_artifacts(
+    max_age: Optional[int] = None, max_bytes: Optional[int] = None, keep: Optional[Path] = None
+) -> int:
+    """Delete artifacts older than ``max_age`` seconds, then the least recently used beyond ``max_bytes``."""
+    config = current_app.config
+    max_age = config.get("REPORT_ARTIFACT_MAX_AGE") if max_age is None else max_age
+    max_bytes = config.get("REPORT_ARTIFACT_MAX_BYTES") if max_bytes is None else max_bytes
+
+    artifacts = []
+    for path in reports_dir().glob("*.pdf"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        artifacts.append((stat.st_mtime, stat.st_size, path))
+    artifacts.sort()
+
+    removed = 0
+    now = time.time()
+    total = sum(size for _, size, _ in artifacts)
+    for mtime, size, path in artifacts:
+        expired = max_age is not None and now - mtime > max_age
+        over_budget = max_bytes is not None and total > max_bytes
+        if path == keep or not (expired or over_budget):
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,278 @@
+import sys
+import zlib
+from array import array
+from typing import Iterable, List, Sequence, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+MARGIN = 48
+ROW_HEIGHT = 14
+FONT = "Helvetica"
+BOLD_FONT = "Helvetica-Bold"
+FONT_SIZE = 9
+
+# (header, width in points, right aligned)
+Column = Tuple[str, float, bool]
+
+# objects 1-4 are written last but numbered first; pages take numbers from 5 up
+_CATALOG, _PAGES, _FIRST_PAGE_OBJECT = 1, 2, 5
+_FONTS = {FONT: (3, b"F1"), BOLD_FONT: (4, b"F2")}
+
+
+def _fit(text: str, width: float, font: str = FONT, size: int = FONT_SIZE) -> Tuple[str, float]:
+    """Truncate ``text`` to ``width`` points; returns the text and its rendered width."""
+    text_width = stringWidth(text, font, size)
+    if text_width <= width:
+        return text, text_width
+    while text and stringWidth(text + "...", font, size) > width:
+        text = text[:-1]
+    text += "..."
+    return text, stringWidth(text, font, size)
+
+
+class UnencodableTextError(ValueError):
+    """Text the built-in PDF fonts cannot show; they only cover cp1252 (Western European) characters."""
+
+
+def _pdf_string(text: str) -> bytes:
+    try:
+        data = text.encode("cp1252")
+    except UnicodeEncodeError as exc:
+        raise UnencodableTextError(f"Cannot render {text!r} with the built-in PDF fonts") from exc
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class PdfStreamWriter:
+    """Writes a PDF one page at a time, using the standard Helvetica fonts.
+
+    ReportLab's canvas keeps every finished page in memory until ``save``, so
+    a 50k-row report would grow with its row count. This writer compresses each
+    page and writes it to the file as soon as the page ends. After that it
+    keeps only the page's object offsets, a few bytes per page.
+
+    Use it as a context manager: the file is always closed, and it is only
+    completed with an xref and trailer if the block finished without an error.
+    """
+
+    def __init__(self, file_path: str, pagesize=A4):
+        self.width, self.height = pagesize
+        self._file = open(file_path, "wb")
+        self._offsets = array("Q", [0] * _FIRST_PAGE_OBJECT)
+        self._pages = array("L")
+        self._ops: List[bytes] = []
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self) -> "PdfStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def _object(self, number: int, body: bytes) -> None:
+        if number >= len(self._offsets):
+            self._offsets.extend([0] * (number - len(self._offsets) + 1))
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+
+    def text(self, x: float, y: float, text: str, font: str = FONT, size: float = FONT_SIZE) -> None:
+        self.texts([(x, text)], y, font, size)
+
+    def texts(self, cells: Iterable[Tuple[float, str]], y: float, font: str = FONT, size: float = FONT_SIZE) -> None:
+        """Draw several strings on one baseline inside a single text object."""
+        ops = [b"BT /%s %g Tf" % (_FONTS[font][1], size)]
+        for x, text in cells:
+            ops.append(b"1 0 0 1 %.2f %.2f Tm %s Tj" % (x, y, _pdf_string(text)))
+        ops.append(b"ET")
+        self._ops.append(b" ".join(ops))
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.25) -> None:
+        self._ops.append(b"%g w %.2f %.2f m %.2f %.2f l S" % (width, x1, y1, x2, y2))
+
+    def end_page(self) -> None:
+        content = zlib.compress(b"\n".join(self._ops))
+        self._ops = []
+        number = len(self._offsets)
+        self._object(number, b"<< /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        fonts = b" ".join(b"/%s %d 0 R" % (name, ref) for ref, name in _FONTS.values())
+        self._object(
+            number + 1,
+            b"<<\n/Contents %d 0 R /MediaBox [0 0 %g %g] /Parent %d 0 R /Resources << /Font << %s >> >> /Type /Page\n>>"
+            % (number, self.width, self.height, _PAGES, fonts),
+        )
+        self._pages.append(number + 1)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        try:
+            self._finish()
+        finally:
+            self._file.close()
+
+    def _finish(self) -> None:
+        if self._ops or not self._pages:
+            self.end_page()
+        for font, (number, _) in _FONTS.items():
+            encoding = b"/Encoding /WinAnsiEncoding"
+            self._object(number, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s %s >>" % (font.encode(), encoding))
+        kids = b" ".join(b"%d 0 R" % number for number in self._pages)
+        self._object(_PAGES, b"<< /Type /Pages /Count %d /Kids [%s] >>" % (len(self._pages), kids))
+        self._object(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+        xref = self._file.tell()
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self._offsets))
+        for offset in self._offsets[1:]:
+            self._file.write(b"%010d 00000 n \n" % offset)
+        self._file.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self._offsets), _CATALOG, xref)
+        )
+
+
+class PagedReport:
+    """Draws headings and tables page by page, starting new pages as rows overflow.
+
+    Rows are consumed from iterables one at a time and each finished page is
+    flushed to the file, so callers can feed database cursors and memory stays
+    flat however many rows the report has. Use it in a ``with`` block so the
+    file is closed even when drawing fails.
+    """
+
+    def __init__(self, file_path: str, title: str):
+        self.title = title
+        self.pdf = PdfStreamWriter(file_path, A4)
+        self.width, self.height = A4
+        self.page = 1
+        self.y = self.height - MARGIN
+        try:
+            self._draw_title()
+        except BaseException:
+            self.pdf.__exit__(*sys.exc_info())
+            raise
+
+    def __enter__(self) -> "PagedReport":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self._draw_footer()
+        finally:
+            self.pdf.__exit__(exc_type, exc, tb)
+
+    def _draw_title(self) -> None:
+        x = (self.width - stringWidth(self.title, BOLD_FONT, 15)) / 2
+        self.pdf.text(x, self.y - 8, self.title, BOLD_FONT, 15)
+        self.y -= 36
+
+    def _draw_footer(self) -> None:
+        text = f"Page {self.page}"
+        self.pdf.text(self.width - MARGIN - stringWidth(text, FONT, 8), MARGIN / 2, text, FONT, 8)
+
+    def new_page(self) -> None:
+        self._draw_footer()
+        self.pdf.end_page()
+        self.page += 1
+        self.y = self.height - MARGIN
+
+    def _ensure_space(self, needed: float) -> bool:
+        if self.y - needed < MARGIN:
+            self.new_page()
+            return True
+        return False
+
+    def heading(self, text: str) -> None:
+        self._ensure_space(ROW_HEIGHT * 3)
+        self.y -= 6
+        self.pdf.text(MARGIN, self.y, text, BOLD_FONT, 12)
+        self.y -= ROW_HEIGHT + 4
+
+    def line(self, text: str, size: int = 11) -> None:
+        self._ensure_space(ROW_HEIGHT)
+        self.pdf.text(MARGIN, self.y, text, FONT, size)
+        self.y -= ROW_HEIGHT + 2
+
+    def _draw_row(self, values: Sequence, columns: List[Column], font: str) -> None:
+        # one text object per row keeps the per-cell overhead of the PDF operators low
+        cells = []
+        x = MARGIN
+        for value, (_, width, right) in zip(values, columns):
+            text, text_width = _fit(str(value), width - 6, font)
+            cells.append((x + width - 4 - text_width if right else x + 2, text))
+            x += width
+        self.pdf.texts(cells, self.y, font)
+        self.pdf.line(MARGIN, self.y - 4, x, self.y - 4)
+        self.y -= ROW_HEIGHT
+
+    def table(self, columns: List[Column], rows: Iterable[Sequence], empty_text: str = "No rows") -> int:
+        """Draw ``rows`` under a header that repeats on every page. Returns the number of rows drawn."""
+        header = [name for name, _, _ in columns]
+        self._ensure_space(ROW_HEIGHT * 2)
+        self._draw_row(header, columns, BOLD_FONT)
+        count = 0
+        for row in rows:
+            if self._ensure_space(ROW_HEIGHT):
+                self._draw_row(header, columns, BOLD_FONT)
+            self._draw_row(row, columns, FONT)
+            count += 1
+        if not count:
+            self.line(empty_text, size=FONT_SIZE)
+        self.y -= 8
+        return count
+
+
+
+def _rupees(paise: int) -> str:
+    return f"{paise / 100:,.2f}"
+
+
+def render_report(
+    file_path: str,
+    title: str,
+    total_collected: int,
+    by_course: Iterable[dict],
+    series: Iterable[dict],
+    defaulters: Iterable[Sequence],
+) -> None:
+    """Render the collection report.
+
+    ``defaulters`` yields ``(student_id, regno, name, course, outstanding_paise)``
+    tuples and may be a streaming query. Raises ``UnencodableTextError`` for
+    text outside cp1252; the partial file is closed but left for the caller to remove.
+    """
+    with PagedReport(file_path, title) as report:
+        _draw_report(report, total_collected, by_course, series, defaulters)
+
+
+def _draw_report(report, total_collected, by_course, series, defaulters) -> None:
+    report.line(f"Total Collected: INR {_rupees(total_collected)}", size=12)
+
+    report.heading("By Course")
+    report.table(
+        [("Course", 340, False), ("Amount (INR)", 159, True)],
+        ((item["course"], _rupees(item["amount"])) for item in by_course),
+    )
+
+    report.heading("Collections by Period")
+    report.table(
+        [("Period", 200, False), ("Payments", 140, True), ("Amount (INR)", 159, True)],
+        ((point["period"], point["count"], _rupees(point["amount"])) for point in series),
+    )
+
+    report.heading("Defaulters")
+    report.table(
+        [
+            ("Student ID", 60, True),
+            ("Regno", 90, False),
+            ("Name", 150, False),
+            ("Course", 110, False),
+            ("Outstanding (INR)", 89, True),
+        ],
+        (
+            (student_id, regno, name, course, _rupees(amount))
+            for student_id, regno, name, course, amount in defaulters
+        ),
+        empty_text="No outstanding balances",
+    )
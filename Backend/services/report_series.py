@@ -0,0 +1,168 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from flask import current_app
+from sqlalchemy import func
+
+from extensions import db
+from models import CollectionRollup
+from services.report_cache import get_report_cache, report_cache_key
+from services.rollups import as_day, filter_day_range
+
+GRANULARITIES = ("daily", "weekly", "monthly", "yearly")
+
+
+class ReportSeriesError(Exception):
+    pass
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == "weekly":
+        return day - timedelta(days=day.weekday())
+    if granularity == "monthly":
+        return day.replace(day=1)
+    if granularity == "yearly":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _next_bucket(bucket: date, granularity: str) -> date:
+    if granularity == "weekly":
+        return bucket + timedelta(days=7)
+    if granularity == "monthly":
+        return date(bucket.year + bucket.month // 12, bucket.month % 12 + 1, 1)
+    if granularity == "yearly":
+        return date(bucket.year + 1, 1, 1)
+    return bucket + timedelta(days=1)
+
+
+def _periods(first: date, last: date, granularity: str) -> Iterator[date]:
+    bucket = bucket_start(first, granularity)
+    while bucket <= last:
+        yield bucket
+        bucket = _next_bucket(bucket, granularity)
+
+
+def count_periods(first: date, last: date, granularity: str) -> int:
+    """How many buckets ``first``..``last`` spans, without building them."""
+    if last < first:
+        return 0
+    if granularity == "weekly":
+        return (bucket_start(last, granularity) - bucket_start(first, granularity)).days // 7 + 1
+    if granularity == "monthly":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    if granularity == "yearly":
+        return last.year - first.year + 1
+    return (last - first).days + 1
+
+
+def check_series_span(granularity: str, first, last) -> None:
+    """Refuse ranges with more than ``REPORT_SERIES_MAX_POINTS`` buckets, since every one is zero-filled."""
+    if first is None or last is None:
+        return
+    limit = current_app.config.get("REPORT_SERIES_MAX_POINTS", 3660)
+    count = count_periods(as_day(first), as_day(last), granularity)
+    if count > limit:
+        raise ReportSeriesError(
+            f"{as_day(first)} to {as_day(last)} has {count} {granularity} periods, more than {limit}; "
+            "use a coarser granularity or a shorter range"
+        )
+
+
+def _bucket_expression(granularity: str, dialect: str):
+    """SQL expression truncating ``CollectionRollup.day`` to the bucket start, or None if unsupported."""
+    day = CollectionRollup.day
+    if dialect == "sqlite":
+        return {
+            "daily": func.date(day),
+            "weekly": func.date(day, "-6 days", "weekday 1"),
+            "monthly": func.strftime("%Y-%m-01", day),
+            "yearly": func.strftime("%Y-01-01", day),
+        }[granularity]
+    if dialect == "postgresql":
+        unit = {"daily": "day", "weekly": "week", "monthly": "month", "yearly": "year"}[granularity]
+        return func.date_trunc(unit, day)
+    return None
+
+
+def _grouped_rows(granularity: str, start, end, by_course: bool):
+    """Yield ``(bucket, course, amount, count)`` summed over the rollup rows in range."""
+    bucket = _bucket_expression(granularity, db.session.get_bind().dialect.name)
+    if bucket is None:
+        query = db.session.query(
+            CollectionRollup.day,
+            CollectionRollup.course,
+            CollectionRollup.amount_paise,
+            CollectionRollup.payment_count,
+        )
+        for day, course, amount, count in filter_day_range(query, start, end):
+            yield bucket_start(as_day(day), granularity), course if by_course else None, amount, count
+        return
+
+    columns = [bucket, func.sum(CollectionRollup.amount_paise), func.sum(CollectionRollup.payment_count)]
+    group_by = [bucket]
+    if by_course:
+        columns.insert(1, CollectionRollup.course)
+        group_by.append(CollectionRollup.course)
+    query = filter_day_range(db.session.query(*columns), start, end).group_by(*group_by)
+    for row in query:
+        if by_course:
+            bucket_day, course, amount, count = row
+        else:
+            (bucket_day, amount, count), course = row, None
+        yield as_day(bucket_day), course, amount, count
+
+
+def _series(points: Dict[date, List[int]], first: Optional[date], last: Optional[date], granularity: str):
+    if first is None or last is None:
+        return []
+    series = []
+    for period in _periods(first, last, granularity):
+        amount, count = points.get(period, (0, 0))
+        series.append({"period": period.isoformat(), "amount": amount, "count": count})
+    return series
+
+
+def collection_series(granularity: str, start=None, end=None, by_course: bool = False) -> dict:
+    """Captured collections bucketed by day/week/month/year, optionally split per course.
+
+    Buckets are computed over the daily rollup table, so the cost depends on the
+    number of days and courses in range rather than on the number of payments.
+    Missing periods between the first and last bucket are filled with zeros, so
+    ranges over ``REPORT_SERIES_MAX_POINTS`` buckets raise ``ReportSeriesError``.
+    """
+    granularity = (granularity or "daily").lower()
+    if granularity not in GRANULARITIES:
+        raise ReportSeriesError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    check_series_span(granularity, start, end)
+
+    def compute():
+        totals: Dict[date, List[int]] = defaultdict(lambda: [0, 0])
+        per_course: Dict[str, Dict[date, List[int]]] = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for bucket_day, course, amount, count in _grouped_rows(granularity, start, end, by_course):
+            totals[bucket_day][0] += amount
+            totals[bucket_day][1] += count
+            if by_course:
+                per_course[course or "Unknown"][bucket_day][0] += amount
+                per_course[course or "Unknown"][bucket_day][1] += count
+
+        first = as_day(start) if start else (min(totals) if totals else None)
+        last = as_day(end) if end else (max(totals) if totals else None)
+        # an open-ended range takes its bounds from the data, so check it again
+        check_series_span(granularity, first, last)
+        data = {
+            "granularity": granularity,
+            "from": first.isoformat() if first else None,
+            "to": last.isoformat() if last else None,
+            "series": _series(totals, first, last, granularity),
+        }
+        if by_course:
+            data["byCourse"] = [
+                {"course": course, "series": _series(points, first, last, granularity)}
+                for course, points in sorted(per_course.items())
+            ]
+        return data
+
+    key = report_cache_key("series", granularity, "course" if by_course else "total", start, end)
+    return get_report_cache().get_or_compute(key, compute)
@@ -0,0 +1,140 @@
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import Date, cast, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+from models import CollectionRollup, Payment, Student
+from services.report_cache import invalidate_reports
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def as_day(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def record_capture(payment: Payment, student: Optional[Student] = None) -> None:
+    """Add a newly captured payment to its daily rollup row.
+
+    Runs inside the caller's transaction so the rollup commits (or rolls back)
+    together with the payment status change.
+    """
+    _apply_delta(payment, student, 1)
+
+
+def record_reversal(payment: Payment, student: Optional[Student] = None) -> None:
+    """Remove a previously captured payment from its rollup row."""
+    _apply_delta(payment, student, -1)
+
+
+def _apply_delta(payment: Payment, student: Optional[Student], sign: int) -> None:
+    student = student or payment.student
+    day = as_day(payment.created_at or datetime.utcnow())
+    course = student.course or "Unknown"
+    currency = payment.currency or "INR"
+    now = datetime.utcnow()
+
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        table = CollectionRollup.__table__
+        stmt = insert(table).values(
+            day=day,
+            course=course,
+            currency=currency,
+            amount_paise=sign * payment.amount_paise,
+            payment_count=sign,
+            created_at=now,
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.course, table.c.currency],
+            set_={
+                "amount_paise": table.c.amount_paise + stmt.excluded.amount_paise,
+                "payment_count": table.c.payment_count + stmt.excluded.payment_count,
+                "updated_at": now,
+            },
+        )
+        db.session.execute(stmt)
+        return
+
+    rollup = (
+        CollectionRollup.query.filter_by(day=day, course=course, currency=currency)
+        .with_for_update()
+        .first()
+    )
+    if rollup is None:
+        rollup = CollectionRollup(day=day, course=course, currency=currency, amount_paise=0, payment_count=0)
+        db.session.add(rollup)
+    rollup.amount_paise += sign * payment.amount_paise
+    rollup.payment_count += sign
+
+
+def _payment_day_expression():
+    if db.session.get_bind().dialect.name == "sqlite":
+        return func.date(Payment.created_at)
+    return cast(Payment.created_at, Date)
+
+
+def rebuild_rollups() -> int:
+    """Recompute every rollup row from the captured payments. Returns the row count."""
+    day = _payment_day_expression()
+    grouped = (
+        db.session.query(
+            day,
+            func.coalesce(Student.course, "Unknown"),
+            func.coalesce(Payment.currency, "INR"),
+            func.sum(Payment.amount_paise),
+            func.count(Payment.id),
+        )
+        .join(Student, Student.id == Payment.student_id)
+        .filter(Payment.status == "captured")
+        .group_by(day, Student.course, Payment.currency)
+    )
+    now = datetime.utcnow()
+    rows = [
+        {
+            "day": as_day(bucket),
+            "course": course,
+            "currency": currency,
+            "amount_paise": amount,
+            "payment_count": count,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for bucket, course, currency, amount, count in grouped
+    ]
+    db.session.query(CollectionRollup).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(CollectionRollup.__table__.insert(), rows)
+    db.session.commit()
+    invalidate_reports()
+    return len(rows)
+
+
+def filter_day_range(query, start, end):
+    if start:
+        query = query.filter(CollectionRollup.day >= as_day(start))
+    if end:
+        query = query.filter(CollectionRollup.day <= as_day(end))
+    return query
+
+
+def collection_totals(start=None, end=None):
+    """Total collected and per-course breakdown (paise) for an inclusive day range."""
+    total = filter_day_range(
+        db.session.query(func.coalesce(func.sum(CollectionRollup.amount_paise), 0)), start, end
+    ).scalar()
+    by_course = filter_day_range(
+        db.session.query(CollectionRollup.course, func.coalesce(func.sum(CollectionRollup.amount_paise), 0)),
+        start,
+        end,
+    ).group_by(CollectionRollup.course)
+    return total or 0, [{"course": course or "Unknown", "amount": amount} for course, amount in by_course]
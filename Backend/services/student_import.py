@@ -0,0 +1,198 @@
+import csv
+import json
+import re
+from datetime import datetime
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Student
+from services.report_cache import invalidate_reports
+from utils import iter_text_lines
+
+STUDENT_FIELDS = ("name", "regno", "course", "phone", "email")
+IMPORT_FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# (line number in the upload, parsed row or None, parse error or None)
+SourceRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+class StudentImportError(Exception):
+    pass
+
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> Optional[str]:
+    name = (filename or "").lower()
+    kind = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in kind:
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")) or "ndjson" in kind or "jsonl" in kind:
+        return "jsonl"
+    return None
+
+
+def _iter_csv(stream: IO[bytes]) -> Iterator[SourceRow]:
+    reader = csv.reader(iter_text_lines(stream))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    missing = [field for field in STUDENT_FIELDS if field not in columns]
+    if missing:
+        raise StudentImportError(f"CSV header is missing columns: {', '.join(missing)}")
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        if len(values) > len(columns):
+            yield reader.line_num, None, "Row has more values than the header"
+            continue
+        yield reader.line_num, dict(zip(columns, values)), None
+
+
+def _iter_jsonl(stream: IO[bytes]) -> Iterator[SourceRow]:
+    for line_no, line in enumerate(iter_text_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Expected a JSON object"
+            continue
+        yield line_no, row, None
+
+
+def iter_source_rows(stream: IO[bytes], fmt: str) -> Iterator[SourceRow]:
+    if fmt == "csv":
+        return _iter_csv(stream)
+    if fmt == "jsonl":
+        return _iter_jsonl(stream)
+    raise StudentImportError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+
+
+def _validate(row: dict) -> Tuple[Dict[str, str], List[str]]:
+    record, errors = {}, []
+    for field in STUDENT_FIELDS:
+        value = row.get(field)
+        value = "" if value is None else str(value).strip()
+        if not value:
+            errors.append(f"{field} is required")
+            continue
+        max_length = Student.__table__.c[field].type.length
+        if max_length and len(value) > max_length:
+            errors.append(f"{field} must be at most {max_length} characters")
+        record[field] = value
+    if record.get("email") and not _EMAIL.match(record["email"]):
+        errors.append("email is invalid")
+    return record, errors
+
+
+def _existing(column, values) -> set:
+    if not values:
+        return set()
+    return {value for (value,) in db.session.query(column).filter(column.in_(values))}
+
+
+class _Importer:
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.seen_regnos: set = set()
+        self.seen_emails: set = set()
+        self.total = 0
+        self.inserted = 0
+        self.errors: List[dict] = []
+
+    def _error(self, line: int, row: Optional[dict], messages: List[str]) -> None:
+        regno = (row or {}).get("regno")
+        self.errors.append({"row": line, "regno": str(regno).strip() if regno else None, "errors": messages})
+
+    def _insert(self, pending: List[Tuple[int, dict]]) -> None:
+        if not pending:
+            return
+        now = datetime.utcnow()
+        records = [dict(record, created_at=now, updated_at=now) for _, record in pending]
+        try:
+            db.session.execute(Student.__table__.insert(), records)
+            db.session.commit()
+            self.inserted += len(records)
+            return
+        except IntegrityError:
+            db.session.rollback()
+        # another writer raced us on a unique key; find the offending rows one at a time
+        for (line, record), values in zip(pending, records):
+            try:
+                db.session.execute(Student.__table__.insert(), values)
+                db.session.commit()
+                self.inserted += 1
+            except IntegrityError:
+                db.session.rollback()
+                self._error(line, record, ["regno or email already exists"])
+
+    def flush(self, chunk: List[Tuple[int, dict]]) -> None:
+        taken_regnos = _existing(Student.regno, [record["regno"] for _, record in chunk])
+        taken_emails = _existing(Student.email, [record["email"] for _, record in chunk])
+        pending = []
+        for line, record in chunk:
+            errors = []
+            if record["regno"] in taken_regnos:
+                errors.append("regno already exists")
+            if record["email"] in taken_emails:
+                errors.append("email already exists")
+            if errors:
+                self._error(line, record, errors)
+            else:
+                pending.append((line, record))
+        self._insert(pending)
+
+    def run(self, rows: Iterable[SourceRow]) -> None:
+        chunk: List[Tuple[int, dict]] = []
+        for line, row, parse_error in rows:
+            self.total += 1
+            if parse_error:
+                self._error(line, row, [parse_error])
+                continue
+            record, errors = _validate(row)
+            if record.get("regno") in self.seen_regnos:
+                errors.append("duplicate regno in upload")
+            if record.get("email") in self.seen_emails:
+                errors.append("duplicate email in upload")
+            if errors:
+                self._error(line, row, errors)
+                continue
+            self.seen_regnos.add(record["regno"])
+            self.seen_emails.add(record["email"])
+            chunk.append((line, record))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+
+    def report(self) -> dict:
+        return {"total": self.total, "inserted": self.inserted, "failed": len(self.errors), "errors": self.errors}
+
+
+def import_students(stream: IO[bytes], fmt: str, chunk_size: Optional[int] = None) -> dict:
+    """Validate and insert students from a CSV or JSONL byte stream.
+
+    Rows are parsed as they are read and inserted with one executemany per
+    chunk. Duplicate regnos and emails are checked per chunk against the table
+    and across the whole upload. Invalid rows are reported by line number and
+    do not stop the import.
+    """
+    chunk_size = min(max(chunk_size or DEFAULT_CHUNK_SIZE, 1), MAX_CHUNK_SIZE)
+    importer = _Importer(chunk_size)
+    try:
+        importer.run(iter_source_rows(stream, fmt))
+    finally:
+        # Core inserts skip the ORM flush hooks that normally invalidate cached reports
+        if importer.inserted:
+            invalidate_reports()
+    return importer.report()
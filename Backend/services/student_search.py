@@ -0,0 +1,136 @@
+import re
+import weakref
+from typing import List
+
+from sqlalchemy import DDL, case, event, or_, text
+
+from extensions import db
+from models import Student
+
+# External-content FTS5 index over the searchable student columns, kept in sync by
+# triggers so ORM writes, bulk inserts and raw SQL all update it.
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5("
+    "regno, name, email, content='students', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN "
+    "INSERT INTO students_fts(rowid, regno, name, email) VALUES (new.id, new.regno, new.name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN "
+    "INSERT INTO students_fts(students_fts, rowid, regno, name, email) "
+    "VALUES ('delete', old.id, old.regno, old.name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF regno, name, email ON students BEGIN "
+    "INSERT INTO students_fts(students_fts, rowid, regno, name, email) "
+    "VALUES ('delete', old.id, old.regno, old.name, old.email); "
+    "INSERT INTO students_fts(rowid, regno, name, email) VALUES (new.id, new.regno, new.name, new.email); END",
+]
+
+# bm25 column weights for (regno, name, email): identifiers matter most
+_RANK = "bm25(students_fts, 10.0, 4.0, 1.0)"
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# Shorter terms fall outside the index's 2- and 3-character prefix tables and match most rows.
+MIN_TERM_LENGTH = 2
+
+# engine -> whether students_fts exists; refreshed when the students table is created or dropped
+_fts_available = weakref.WeakKeyDictionary()
+
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Student.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+@event.listens_for(Student.__table__, "after_create")
+@event.listens_for(Student.__table__, "after_drop")
+def _forget_fts_index(target, connection, **kw):
+    _fts_available.pop(connection.engine, None)
+
+
+def _has_fts_index() -> bool:
+    bind = db.session.get_bind()
+    if bind.dialect.name != "sqlite":
+        return False
+    available = _fts_available.get(bind)
+    if available is None:
+        available = (
+            db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'")
+            ).first()
+            is not None
+        )
+        _fts_available[bind] = available
+    return available
+
+
+def _fts_query(terms: List[str]) -> str:
+    return " AND ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _search_fts(query: str, terms: List[str], limit: int):
+    # Ranking and LIMIT stay inside the FTS5 query so only the top rows are joined to students.
+    # Every match is scored before the LIMIT; an exact regno is added even if it ranks lower.
+    matches = (
+        text(
+            "SELECT student_id, min(score) AS score FROM ("
+            f"SELECT * FROM (SELECT rowid AS student_id, {_RANK} AS score FROM students_fts "
+            "WHERE students_fts MATCH :match ORDER BY score LIMIT :limit) "
+            "UNION ALL SELECT id, NULL FROM students WHERE regno = :query"
+            ") GROUP BY student_id ORDER BY score LIMIT :limit"
+        )
+        .bindparams(match=_fts_query(terms), query=query, limit=limit)
+        .columns(student_id=db.Integer, score=db.Float)
+        .subquery()
+    )
+    exact = case((Student.regno == query, 0), else_=1)
+    return (
+        Student.query
+        .join(matches, matches.c.student_id == Student.id)
+        .order_by(exact, matches.c.score, Student.name, Student.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def _search_like(query: str, terms: List[str], limit: int):
+    prefix = f"{query}%"
+    filters = []
+    for term in terms:
+        filters.append(
+            or_(
+                Student.regno.ilike(f"{term}%"),
+                Student.name.ilike(f"{term}%"),
+                Student.name.ilike(f"% {term}%"),
+                Student.email.ilike(f"{term}%"),
+            )
+        )
+    rank = case(
+        (Student.regno == query, 0),
+        (Student.regno.ilike(prefix), 1),
+        (Student.name.ilike(prefix), 2),
+        (Student.email.ilike(prefix), 3),
+        else_=4,
+    )
+    return (
+        Student.query
+        .filter(*filters)
+        .order_by(rank, Student.name, Student.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def search_students(query: str, limit: int = 20) -> List[dict]:
+    """Prefix search over regno, name and email, best matches first.
+
+    Uses the SQLite FTS5 index when present and a LIKE scan otherwise. Terms
+    shorter than ``MIN_TERM_LENGTH`` are ignored.
+    """
+    query = (query or "").strip()
+    terms = [term for term in _TOKEN.findall(query) if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        return []
+    search = _search_fts if _has_fts_index() else _search_like
+    return [student.to_dict() for student in search(query, terms, limit)]
+
+
+def rebuild_search_index() -> None:
+    _fts_available.pop(db.session.get_bind(), None)
+    if _has_fts_index():
+        db.session.execute(text("INSERT INTO students_fts(students_fts) VALUES ('rebuild')"))
+        db.session.commit()
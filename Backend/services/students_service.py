@@ -0,0 +1,109 @@
+import hashlib
+from typing import List, Optional
+
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Invoice, Payment, Student
+from utils import decode_cursor, encode_cursor
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BATCH_IDS = 500
+
+
+class StudentServiceError(Exception):
+    pass
+
+
+def list_students_page(limit: Optional[int] = None, after: Optional[str] = None, course: Optional[str] = None):
+    """Return ``(students, next_cursor)`` ordered by ``(name, id)``.
+
+    Uses keyset pagination: the cursor carries the last ``(name, id)`` seen, so
+    every page is an index range scan no matter how deep the client has paged.
+    """
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    query = Student.query
+    if course:
+        query = query.filter(Student.course == course)
+    if after:
+        try:
+            last_name, last_id = decode_cursor(after, 2)
+        except ValueError as exc:
+            raise StudentServiceError(str(exc)) from exc
+        if not isinstance(last_name, str) or isinstance(last_id, bool) or not isinstance(last_id, int):
+            raise StudentServiceError("Invalid cursor")
+        query = query.filter(
+            db.or_(Student.name > last_name, db.and_(Student.name == last_name, Student.id > last_id))
+        )
+    rows = query.order_by(Student.name.asc(), Student.id.asc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.name, last.id)
+    return [student.to_dict() for student in rows], next_cursor
+
+
+def student_detail_etag(student_id: int) -> Optional[str]:
+    """ETag for the student detail view, or None if the student does not exist.
+
+    Derived from the latest ``updated_at`` and row counts of the student's
+    invoices and payments (counts catch deletions), read in one statement
+    without loading any ORM objects.
+    """
+
+    def latest(model):
+        return select(func.max(model.updated_at)).where(model.student_id == student_id).scalar_subquery()
+
+    def count(model):
+        return select(func.count(model.id)).where(model.student_id == student_id).scalar_subquery()
+
+    row = db.session.execute(
+        select(Student.updated_at, latest(Invoice), count(Invoice), latest(Payment), count(Payment)).where(
+            Student.id == student_id
+        )
+    ).first()
+    if row is None:
+        return None
+    version = "|".join(str(value) for value in (student_id, *row))
+    return hashlib.sha1(version.encode()).hexdigest()[:20]
+
+
+def get_student_detail(student_id: int) -> Optional[dict]:
+    """Student and its payments (newest first) in a single statement."""
+    rows = (
+        db.session.query(Student, Payment)
+        .outerjoin(Payment, Payment.student_id == Student.id)
+        .filter(Student.id == student_id)
+        .order_by(Payment.created_at.desc(), Payment.id.desc())
+        .all()
+    )
+    if not rows:
+        return None
+    data = rows[0][0].to_dict()
+    data["payments"] = [payment.to_dict() for _, payment in rows if payment is not None]
+    return data
+
+
+def parse_student_ids(raw: str) -> List[int]:
+    try:
+        ids = sorted({int(part) for part in raw.split(",") if part.strip()})
+    except ValueError as exc:
+        raise StudentServiceError("ids must be a comma separated list of integers") from exc
+    if len(ids) > MAX_BATCH_IDS:
+        raise StudentServiceError(f"At most {MAX_BATCH_IDS} ids per request")
+    return ids
+
+
+def students_by_ids(student_ids: List[int]) -> List[dict]:
+    """Slim ``{id, name, regno, course}`` records for the given ids in one query; unknown ids are skipped."""
+    if not student_ids:
+        return []
+    rows = (
+        db.session.query(Student.id, Student.name, Student.regno, Student.course)
+        .filter(Student.id.in_(student_ids))
+        .order_by(Student.id.asc())
+    )
+    return [{"id": pk, "name": name, "regno": regno, "course": course} for pk, name, regno, course in rows]
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import WebhookEvent
+from services import workers
+from services.payments_service import PaymentServiceError, apply_webhook_event, verify_webhook_signature
+from services.receipt_jobs import dispatch_receipts
+
+MAX_ATTEMPTS = 3
+
+_INSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+_drain_lock = threading.Lock()
+
+
+def event_key(raw_body: bytes, header_event_id: Optional[str]) -> str:
+    """Razorpay's ``X-Razorpay-Event-Id``, or a digest of the body when a sender omits it."""
+    if header_event_id:
+        return header_event_id[:80]
+    return "sha256:" + hashlib.sha256(raw_body).hexdigest()
+
+
+def receive_webhook(raw_body: bytes, header_signature: Optional[str], header_event_id: Optional[str] = None) -> dict:
+    """Verify and store one delivery, then leave the state change to the drain worker.
+
+    A replayed event id is acknowledged without being stored twice, so
+    Razorpay's retries never apply an event more than once.
+    """
+    if not verify_webhook_signature(raw_body, header_signature or ""):
+        raise PaymentServiceError("Invalid webhook signature")
+    try:
+        event = json.loads(raw_body.decode("utf-8"))
+    except ValueError as exc:
+        raise PaymentServiceError("Invalid webhook payload") from exc
+    if not isinstance(event, dict):
+        raise PaymentServiceError("Invalid webhook payload")
+
+    event_id = event_key(raw_body, header_event_id)
+    stored = _store_event(event_id, event.get("event"), raw_body.decode("utf-8"))
+    schedule_drain()
+    return {"eventId": event_id, "duplicate": not stored}
+
+
+def _store_event(event_id: str, event_type: Optional[str], payload: str) -> bool:
+    """Insert the raw event unless its id is already in the inbox; returns whether it was new."""
+    now = datetime.utcnow()
+    values = {
+        "event_id": event_id,
+        "event_type": event_type,
+        "payload": payload,
+        "status": "pending",
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    insert = _INSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        table = WebhookEvent.__table__
+        result = db.session.execute(
+            insert(table).values(**values).on_conflict_do_nothing(index_elements=[table.c.event_id])
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    db.session.add(WebhookEvent(**values))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def schedule_drain() -> None:
+    """Queue a drain on the ``webhooks`` pool unless one is already waiting to start."""
+    app = current_app._get_current_object()
+    state = app.extensions.setdefault("webhook_drain", {"scheduled": False})
+    with _drain_lock:
+        if state["scheduled"]:
+            return
+        state["scheduled"] = True
+    workers.submit(app, "webhooks", app.config.get("WEBHOOK_WORKERS", 1), _drain_task, state)
+
+
+def _drain_task(state: dict) -> int:
+    # Cleared before reading, so an event committed after this point schedules a fresh drain.
+    with _drain_lock:
+        state["scheduled"] = False
+    return drain_webhook_events()
+
+
+def _stale_before() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get("WEBHOOK_STALE_SECONDS", 300))
+
+
+def _claim_batch(batch_size: int) -> List[WebhookEvent]:
+    """Mark up to ``batch_size`` events as ours with one conditional UPDATE and load them.
+
+    The claim token tells concurrent drainers apart; a "processing" event left
+    behind by a dead worker is claimable again once it looks abandoned.
+    """
+    claimable = db.or_(
+        WebhookEvent.status == "pending",
+        db.and_(WebhookEvent.status == "processing", WebhookEvent.updated_at < _stale_before()),
+    )
+    candidates = (
+        db.select(WebhookEvent.id).where(claimable).order_by(WebhookEvent.id.asc()).limit(batch_size)
+    )
+    token = uuid4().hex
+    WebhookEvent.query.filter(WebhookEvent.id.in_(candidates.scalar_subquery()), claimable).update(
+        {
+            "status": "processing",
+            "claim_token": token,
+            "attempts": WebhookEvent.attempts + 1,
+            "updated_at": datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return WebhookEvent.query.filter_by(claim_token=token).order_by(WebhookEvent.id.asc()).all()
+
+
+def _apply(event: WebhookEvent):
+    job = apply_webhook_event(json.loads(event.payload))
+    event.status = "processed"
+    event.error = None
+    event.processed_at = datetime.utcnow()
+    return job
+
+
+def _process_batch(events: List[WebhookEvent]) -> None:
+    """Apply a claimed batch in one transaction, falling back to one event per commit if any fails."""
+    try:
+        jobs = [_apply(event) for event in events]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        jobs = []
+        for event in events:
+            try:
+                job = _apply(event)
+                db.session.commit()
+                jobs.append(job)
+            except Exception as exc:
+                current_app.logger.exception("Webhook event %s failed", event.event_id)
+                db.session.rollback()
+                event.status = "pending" if event.attempts < MAX_ATTEMPTS else "failed"
+                event.error = str(exc)
+                db.session.commit()
+    job_ids = [job.id for job in jobs if job is not None]
+    if job_ids:
+        dispatch_receipts(job_ids)
+
+
+def drain_webhook_events(batch_size: Optional[int] = None) -> int:
+    """Apply pending inbox events in id order until none are left; returns how many were claimed."""
+    batch_size = batch_size or current_app.config.get("WEBHOOK_BATCH_SIZE", 200)
+    drained = 0
+    while True:
+        events = _claim_batch(batch_size)
+        if not events:
+            return drained
+        _process_batch(events)
+        drained += len(events)
+
+
+def retry_failed_events() -> int:
+    """Put events that exhausted their attempts back in the queue; returns the count."""
+    count = WebhookEvent.query.filter_by(status="failed").update(
+        {"status": "pending", "attempts": 0, "updated_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    return count
@@ -0,0 +1,42 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from extensions import db
+
+_lock = threading.Lock()
+
+
+def _run_in_context(app, fn, args, kwargs):
+    with app.app_context():
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db.session.remove()
+
+
+def submit(app, pool: str, max_workers: int, fn, *args, **kwargs) -> Future:
+    """Run ``fn`` inside an application context on the named worker pool.
+
+    ``max_workers=0`` runs the job inline on the calling thread, which keeps
+    tests and single-process CLI runs deterministic.
+    """
+    if max_workers <= 0:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    pools = app.extensions.setdefault("worker_pools", {})
+    with _lock:
+        executor = pools.get(pool)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"edupay-{pool}")
+            pools[pool] = executor
+    return executor.submit(_run_in_context, app, fn, args, kwargs)
+
+
+def shutdown(app, wait: bool = True) -> None:
+    for executor in app.extensions.pop("worker_pools", {}).values():
+        executor.shutdown(wait=wait)
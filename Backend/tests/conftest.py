@@ -1,14 +1,18 @@
 import pytest
+from sqlalchemy import event
 
 from app import create_app
 from config import TestConfig
 from extensions import db
+from fake_razorpay import FakeRazorpay
 from models import Student, User
 
 
 @pytest.fixture
-def app():
+def app(tmp_path):
     app = create_app(TestConfig)
+    app.config["RECEIPTS_DIR"] = str(tmp_path / "receipts")
+    app.config["REPORTS_DIR"] = str(tmp_path / "reports")
     with app.app_context():
         db.create_all()
 
@@ -37,6 +41,15 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture
+def fake_razorpay(app):
+    """Point the app's Razorpay client at a local fake gateway instead of mock mode."""
+    server = FakeRazorpay().start()
+    app.config.update(RAZORPAY_KEY_ID="rzp_test_fake", RAZORPAY_BASE_URL=server.url, RAZORPAY_RETRY_BACKOFF=0.01)
+    yield server
+    server.stop()
+
+
 @pytest.fixture
 def auth_headers(client):
     resp = client.post(
@@ -46,3 +59,14 @@ def auth_headers(client):
     token = resp.json["data"]["token"]
     return {"Authorization": f"Bearer {token}"}
 
+
+@pytest.fixture
+def query_counter(app):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", _record)
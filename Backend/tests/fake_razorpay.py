@@ -0,0 +1,129 @@
+"""A stand-in for the Razorpay Orders API on 127.0.0.1, for offline tests and load runs."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+
+class FakeRazorpay:
+    """Serves ``POST /v1/orders`` and ``GET /v1/orders/<id>`` over keep-alive HTTP/1.1.
+
+    ``latency`` delays every response; ``fail_next`` and ``stall_next`` make the
+    next few requests answer 5xx or hang, to exercise timeouts and retries.
+    ``connections`` counts accepted TCP connections, so tests can check reuse.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.orders = {}
+        self.requests = 0
+        self.connections = 0
+        self._failures = []
+        self._stalls = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeRazorpay":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def fail_next(self, count: int = 1, status: int = 503) -> None:
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def stall_next(self, count: int = 1, seconds: float = 1.0) -> None:
+        with self._lock:
+            self._stalls.extend([seconds] * count)
+
+    def _next_fault(self):
+        with self._lock:
+            self.requests += 1
+            stall = self._stalls.pop(0) if self._stalls else 0
+            failure = self._failures.pop(0) if self._failures else None
+        return stall, failure
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def _handle(self, make_body):
+                stall, failure = fake._next_fault()
+                time.sleep(fake.latency + stall)
+                if not self.headers.get("Authorization", "").startswith("Basic "):
+                    return self._reply(401, {"error": {"code": "BAD_REQUEST_ERROR", "description": "Authentication failed"}})
+                if failure:
+                    return self._reply(failure, {"error": {"code": "SERVER_ERROR", "description": "Gateway unavailable"}})
+                status, body = make_body()
+                self._reply(status, body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+
+                def create():
+                    if not payload.get("amount"):
+                        return 400, {"error": {"code": "BAD_REQUEST_ERROR", "description": "amount is required"}}
+                    order = {
+                        "id": f"order_{uuid4().hex[:14]}",
+                        "entity": "order",
+                        "amount": payload["amount"],
+                        "currency": payload.get("currency", "INR"),
+                        "receipt": payload.get("receipt"),
+                        "status": "created",
+                        "created_at": int(time.time()),
+                    }
+                    with fake._lock:
+                        fake.orders[order["id"]] = order
+                    return 200, order
+
+                if self.path.rstrip("/") == "/v1/orders":
+                    return self._handle(create)
+                self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "Not found"}})
+
+            def do_GET(self):
+                order_id = self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+
+                def fetch():
+                    order = fake.orders.get(order_id)
+                    if order is None:
+                        return 400, {"error": {"code": "BAD_REQUEST_ERROR", "description": "The id provided does not exist"}}
+                    return 200, order
+
+                self._handle(fetch)
+
+        return Handler
@@ -0,0 +1,107 @@
+from extensions import db
+from models import Invoice, Student
+from services.fee_structures import get_fee_structure_cache
+
+
+def _add_components(client, auth_headers):
+    components = [
+        {"name": "Tuition Fee", "amount": 4500000, "category": "academic", "course": "MBA", "semester": 1},
+        {"name": "Library Fee", "amount": 300000, "category": "academic"},
+        {"name": "Hostel Fee", "amount": 2500000, "category": "hostel", "course": "MBA", "mandatory": False},
+        {"name": "Lab Fee", "amount": 800000, "category": "academic", "course": "B.E", "semester": 1},
+    ]
+    ids = []
+    for component in components:
+        resp = client.post("/api/fees", json=component, headers=auth_headers)
+        assert resp.status_code == 201, resp.json
+        ids.append(resp.json["data"]["id"])
+    return ids
+
+
+def test_fee_structure_is_cached_and_invalidated_on_change(app, client, auth_headers):
+    tuition, library, hostel, _ = _add_components(client, auth_headers)
+    assert client.post("/api/fees", json={"name": "Late Fee", "amount": "5"}, headers=auth_headers).status_code == 400
+
+    resp = client.get("/api/fees/structure?course=MBA&semester=1")
+    structure = resp.json["data"]
+    assert [c["name"] for c in structure["components"]] == ["Library Fee", "Tuition Fee", "Hostel Fee"]
+    assert structure["mandatoryTotal"] == 4800000
+    assert client.get("/api/fees/structure?course=MBA&semester=2").json["data"]["mandatoryTotal"] == 300000
+    client.get("/api/fees/structure?course=MBA&semester=1")
+    cache = get_fee_structure_cache()
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    resp = client.patch(f"/api/fees/{tuition}", json={"amount": 4600000}, headers=auth_headers)
+    assert resp.status_code == 200
+    assert cache.stats()["entries"] == 0
+    assert client.get("/api/fees/structure?course=MBA&semester=1").json["data"]["mandatoryTotal"] == 4900000
+
+    assert client.delete(f"/api/fees/{library}", headers=auth_headers).status_code == 200
+    assert client.get("/api/fees/structure?course=MBA&semester=1").json["data"]["mandatoryTotal"] == 4600000
+    assert [c["id"] for c in client.get("/api/fees?course=MBA").json["data"]] == [hostel, tuition]
+    assert client.get("/api/fees/structure?course=MBA&semester=zero").status_code == 400
+
+
+def test_create_order_builds_invoice_from_fee_structure(app, client, auth_headers):
+    tuition, library, hostel, lab = _add_components(client, auth_headers)
+    # amount and items from the client are ignored once a semester is given
+    payload = {"studentId": 1, "semester": 1, "feeIds": [hostel], "amount": 1, "items": [{"label": "x", "amount": 1}]}
+    resp = client.post("/api/payments/create-order", json=payload, headers=auth_headers)
+    assert resp.status_code == 201
+    assert resp.json["data"]["amount"] == 7300000
+    invoice = db.session.get(Invoice, resp.json["data"]["invoiceId"])
+    assert invoice.amount_paise == 7300000
+    assert [(item["componentId"], item["amount"]) for item in invoice.items] == [
+        (library, 300000),
+        (tuition, 4500000),
+        (hostel, 2500000),
+    ]
+    assert db.session.get(Student, 1).invoiced_paise == 7300000
+
+    resp = client.post("/api/payments/create-order", json={"studentId": 1, "semester": 1, "feeIds": [lab]}, headers=auth_headers)
+    assert resp.status_code == 400
+    assert "do not apply to MBA semester 1" in resp.json["error"]
+
+
+def test_only_admins_can_price_an_order(app, client, auth_headers):
+    from flask_jwt_extended import create_access_token
+
+    _add_components(client, auth_headers)
+    student_headers = {"Authorization": f"Bearer {create_access_token(identity={'id': 1, 'role': 'student'})}"}
+    for headers in ({}, student_headers):
+        resp = client.post("/api/payments/create-order", json={"studentId": 1, "amount": 1}, headers=headers)
+        assert resp.status_code == 403
+        resp = client.post("/api/payments/create-order", json={"studentId": 1, "semester": 1}, headers=headers)
+        assert (resp.status_code, resp.json["data"]["amount"]) == (201, 4800000)
+    assert client.post("/api/payments/create-order", json={"studentId": 1, "amount": 1}, headers=auth_headers).status_code == 201
+
+    app.config["ALLOW_CLIENT_AMOUNT_ORDERS"] = True
+    assert client.post("/api/payments/create-order", json={"studentId": 1, "amount": 1}).status_code == 201
+    assert Invoice.query.count() == 4
+
+
+def test_bulk_orders_use_per_course_fee_structures(app, client, auth_headers):
+    _add_components(client, auth_headers)
+    students = [
+        Student(name=name, regno=regno, course=course, phone="9000000000", email=f"{regno}@test.com")
+        for name, regno, course in [("A", "FEE1", "B.E"), ("B", "FEE2", "B.E"), ("C", "FEE3", "MCA")]
+    ]
+    db.session.add_all(students)
+    db.session.commit()
+    ids = [1] + [student.id for student in students]
+
+    resp = client.post("/api/payments/bulk-orders", json={"studentIds": ids, "semester": 1}, headers=auth_headers)
+    report = resp.json["data"]
+    assert (report["total"], report["created"], report["failed"]) == (4, 4, 0)
+    invoiced = {s.id: s.invoiced_paise for s in Student.query.filter(Student.id.in_(ids))}
+    # MCA has only the all-courses library fee
+    assert invoiced == {1: 4800000, ids[1]: 1100000, ids[2]: 1100000, ids[3]: 300000}
+
+    resp = client.post("/api/payments/bulk-orders", json={"course": "B.E", "semester": 2, "feeIds": [999]}, headers=auth_headers)
+    assert resp.status_code == 400
+    resp = client.post("/api/payments/bulk-orders", json={"course": "B.E", "semester": 1, "amount": 10}, headers=auth_headers)
+    assert resp.json["error"] == "Provide either amount or semester"
+
+    result = app.test_cli_runner().invoke(args=["payments", "bulk-orders", "--course", "B.E", "--semester", "1"])
+    assert result.exit_code == 0, result.output
+    assert db.session.get(Student, ids[1]).invoiced_paise == 2200000
@@ -1,8 +1,17 @@
 import hashlib
 import hmac
+import io
 import json
+from datetime import datetime, timedelta
 from uuid import uuid4
 
+import pytest
+
+from extensions import db
+from models import Invoice, Payment
+from services.reconciliation import MISMATCH_FIELDS, ReconciliationError, iter_export_rows
+from utils import encode_cursor
+
 
 def _create_order(client, auth_headers):
     payload = {
@@ -75,3 +84,721 @@ def test_webhook_handler_updates_payment(client, auth_headers):
     assert resp.status_code == 200
     assert resp.json["success"] is True
 
+
+def test_list_payments_keyset_pagination(client, auth_headers):
+    created = datetime(2025, 1, 1, 9, 30)
+    invoice = Invoice(invoice_no="INV-LIST", student_id=1, amount_paise=100)
+    db.session.add(invoice)
+    for i in range(12):
+        db.session.add(
+            Payment(
+                student_id=1,
+                invoice=invoice,
+                invoice_no="INV-LIST",
+                amount_paise=100 + i,
+                status="captured" if i % 2 else "created",
+                razorpay_order_id=f"order_list_{i}",
+                # pairs share a timestamp so the id tie-breaker matters
+                created_at=created.replace(minute=i // 2),
+            )
+        )
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/payments?limit=5" + (f"&after={cursor}" if cursor else "")
+        resp = client.get(url, headers=auth_headers)
+        assert resp.status_code == 200
+        seen.extend(resp.json["data"])
+        cursor = resp.json["nextCursor"]
+        if not cursor:
+            break
+
+    expected = Payment.query.order_by(Payment.created_at.desc(), Payment.id.desc()).all()
+    assert seen == [payment.to_dict() for payment in expected]
+    assert client.get("/api/payments", headers=auth_headers).json["data"] == seen
+
+    resp = client.get("/api/payments?status=captured&limit=4", headers=auth_headers)
+    assert [row["status"] for row in resp.json["data"]] == ["captured"] * 4
+    assert client.get("/api/payments?after=bogus", headers=auth_headers).status_code == 400
+    created_at = expected[0].created_at.isoformat()
+    for forged in (encode_cursor(created_at, "abc"), encode_cursor(created_at, True), encode_cursor(created_at, [1])):
+        assert client.get(f"/api/payments?after={forged}", headers=auth_headers).status_code == 400
+
+
+def test_list_payments_expand_student_and_batch_lookup(client, auth_headers, query_counter):
+    _create_order(client, auth_headers)
+    _create_order(client, auth_headers)
+
+    query_counter.clear()
+    resp = client.get("/api/payments?expand=student", headers=auth_headers)
+    assert len(query_counter) == 1
+    rows = resp.json["data"]
+    assert len(rows) == 2
+    assert {(row["studentName"], row["regno"], row["course"]) for row in rows} == {("Test Student", "REG123", "MBA")}
+    assert "studentName" not in client.get("/api/payments", headers=auth_headers).json["data"][0]
+
+    page = client.get("/api/payments?expand=student&limit=1", headers=auth_headers).json
+    assert page["data"][0]["studentName"] == "Test Student" and page["nextCursor"]
+
+    query_counter.clear()
+    resp = client.get("/api/students?ids=1,999,1", headers=auth_headers)
+    assert len(query_counter) == 1
+    assert resp.json["data"] == [{"id": 1, "name": "Test Student", "regno": "REG123", "course": "MBA"}]
+    assert client.get("/api/students?ids=1,x", headers=auth_headers).status_code == 400
+
+
+def _verify(client, order):
+    order_id, payment_id = order["orderId"], f"pay_{order['orderId'][-8:]}"
+    secret = client.application.config["RAZORPAY_KEY_SECRET"]
+    signature = hmac.new(secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+    return client.post(
+        "/api/payments/verify",
+        json={
+            "razorpay_order_id": order_id,
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": signature,
+            "invoiceId": order["invoiceId"],
+        },
+    )
+
+
+def test_receipt_job_survives_lost_dispatch(app, client, auth_headers, monkeypatch):
+    from services import payments_service
+
+    # simulate the process dying before a worker picked the job up
+    monkeypatch.setattr(payments_service, "dispatch_receipts", lambda job_ids: None)
+    order = _create_order(client, auth_headers)
+    resp = _verify(client, order)
+    assert resp.json["data"]["receiptStatus"] == "pending"
+
+    receipt_url = f"/api/payments/{order['invoiceId']}/receipt"
+    resp = client.get(receipt_url, headers=auth_headers)
+    assert resp.status_code == 202
+    assert resp.headers["Retry-After"]
+
+    result = app.test_cli_runner().invoke(args=["receipts", "resume"])
+    assert "Dispatched 1 receipt job(s)" in result.output
+    resp = client.get(receipt_url, headers=auth_headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/pdf"
+    assert Payment.query.filter_by(invoice_id=order["invoiceId"]).one().receipt_status == "ready"
+
+
+def test_receipt_job_retries_then_fails(client, auth_headers, monkeypatch):
+    from models import ReceiptJob
+    from services import receipt_jobs
+
+    calls = []
+
+    def broken(*args):
+        calls.append(args)
+        raise RuntimeError("renderer unavailable")
+
+    monkeypatch.setattr(receipt_jobs, "generate_receipt", broken)
+    order = _create_order(client, auth_headers)
+    receipt_url = f"/api/payments/{order['invoiceId']}/receipt"
+    assert _verify(client, order).json["data"]["receiptStatus"] == "pending"
+    job = ReceiptJob.query.one()
+    delays = []
+    for attempt in range(1, receipt_jobs.MAX_ATTEMPTS):
+        # a failed render waits out its backoff instead of being re-dispatched at once
+        assert (job.status, job.attempts, len(calls)) == ("queued", attempt, attempt)
+        delays.append(job.not_before - job.updated_at)
+        assert client.get(receipt_url, headers=auth_headers).status_code == 202
+        assert receipt_jobs.resume_receipt_jobs() == 0
+        assert len(calls) == attempt
+        job.not_before = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert client.get(receipt_url, headers=auth_headers).status_code == 202  # nudges the due retry
+        db.session.refresh(job)
+    assert [round(delay.total_seconds()) for delay in delays] == [30, 60]
+    assert len(calls) == receipt_jobs.MAX_ATTEMPTS
+    assert (job.status, job.attempts, job.error) == ("failed", 3, "renderer unavailable")
+    assert client.get(receipt_url, headers=auth_headers).status_code == 500
+
+
+def test_receipt_renderer_engines_and_cached_template(tmp_path):
+    from services import receipt_generator
+
+    context = {
+        "title": receipt_generator.RECEIPT_TITLE,
+        "invoice_no": "INV-<1>",
+        "student_name": "Asha & Co",
+        "regno": "REG1",
+        "course": "MBA",
+        "payment_id": "pay_1",
+        "order_id": "order_1",
+        "issued_on": "01 Jun 2025, 10:00 UTC",
+        "amount": "2500.00",
+    }
+    html = receipt_generator.render_receipt_html(context)
+    assert "Asha &amp; Co" in html and "INV-&lt;1&gt;" in html
+    receipt_generator.render_receipt_html(context)
+    assert receipt_generator._template.cache_info().misses == 1
+
+    for engine in receipt_generator.RECEIPT_ENGINES:
+        path = tmp_path / f"{engine}.pdf"
+        used = receipt_generator.render_receipt(context, str(path), engine)
+        assert used in receipt_generator.RECEIPT_ENGINES
+        assert path.read_bytes().startswith(b"%PDF")
+    assert receipt_generator.render_receipt(context, str(tmp_path / "rl.pdf"), "reportlab") == "reportlab"
+
+
+def test_regenerate_receipts_cli(app, client, auth_headers, tmp_path):
+    from pathlib import Path
+
+    from services import receipt_batch
+
+    orders = [_create_order(client, auth_headers) for _ in range(3)]
+    for order in orders[:2]:
+        _verify(client, order)
+    digests = {}
+    for payment in Payment.query.filter_by(status="captured"):
+        digests[payment.id] = payment.receipt_sha256
+        Path(payment.receipt_path).unlink()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["receipts", "regenerate", "--batch-size", "1"])
+    assert result.exit_code == 0, result.output
+    assert "2/2 receipts (0 failed" in result.output
+    assert "Regenerated 2 receipt(s), 0 failed." in result.output
+    for payment in Payment.query.filter_by(status="captured"):
+        assert Path(payment.receipt_path).read_bytes().startswith(b"%PDF")
+        assert payment.receipt_status == "ready"
+    assert not list((Path(app.config["RECEIPTS_DIR"]) / ".staging").iterdir())
+
+    # the same payments again, rendered one batch at a time on a two-process pool
+    for payment in Payment.query.filter_by(status="captured"):
+        Path(payment.receipt_path).unlink()
+        payment.receipt_status = "pending"
+    db.session.commit()
+    result = runner.invoke(args=["receipts", "regenerate", "--workers", "2", "--batch-size", "1"])
+    assert result.exit_code == 0, result.output
+    assert "Regenerated 2 receipt(s), 0 failed." in result.output
+    db.session.expire_all()
+    for payment in Payment.query.filter_by(status="captured"):
+        assert Path(payment.receipt_path).read_bytes().startswith(b"%PDF")
+        assert payment.receipt_path.endswith(f"{payment.receipt_sha256}.pdf")
+        assert payment.receipt_status == "ready"
+    # "Issued On" is the capture time, so a re-render is byte-identical and reuses its stored file
+    assert {payment.id: payment.receipt_sha256 for payment in Payment.query.filter_by(status="captured")} == digests
+    Payment.query.filter_by(status="captured").update({"captured_at": datetime(2025, 1, 2, 3, 4)})
+    db.session.commit()
+    contexts = [context for batch in receipt_batch._iter_batches(None, 10) for _, context in batch]
+    assert [context["issued_on"] for context in contexts] == ["02 Jan 2025, 03:04 UTC"] * 2
+
+    result = runner.invoke(args=["receipts", "regenerate", "--since", "2100-01-01", "--workers", "2"])
+    assert "Regenerated 0 receipt(s)" in result.output
+
+
+def test_stored_receipt_serving(app, client, auth_headers):
+    order = _create_order(client, auth_headers)
+    _verify(client, order)
+    payment = Payment.query.filter_by(invoice_id=order["invoiceId"]).one()
+    digest = payment.receipt_sha256
+    assert payment.receipt_path.endswith(f"/{digest[:2]}/{digest[2:4]}/{digest}.pdf")
+    assert payment.to_dict()["receiptUrl"] == f"/api/payments/{order['invoiceId']}/receipt?v={digest}"
+
+    url = f"/api/payments/{order['invoiceId']}/receipt"
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == f'"{digest}"'
+    assert resp.headers["Cache-Control"] == "private, no-cache"
+
+    assert client.get(url, headers={"If-None-Match": f'"{digest}"'}).status_code == 304
+    resp = client.get(f"{url}?v={digest}")
+    assert "immutable" in resp.headers["Cache-Control"]
+
+    resp = client.get(url, headers={"Range": "bytes=0-3"})
+    assert resp.status_code == 206
+    assert resp.data == b"%PDF"
+
+    app.config.update(RECEIPT_SENDFILE="x-accel-redirect", RECEIPT_ACCEL_PREFIX="/protected/receipts/")
+    resp = client.get(url)
+    assert resp.headers["X-Accel-Redirect"] == f"/protected/receipts/{digest[:2]}/{digest[2:4]}/{digest}.pdf"
+    assert resp.data == b""
+    app.config["RECEIPT_SENDFILE"] = "x-sendfile"
+    assert client.get(url).headers["X-Sendfile"] == payment.receipt_path
+
+
+def test_receipt_store_deduplicates_identical_files(tmp_path):
+    from services.receipt_store import ReceiptStore
+
+    store = ReceiptStore(tmp_path)
+    paths = set()
+    for _ in range(2):
+        staged = store.staging_path()
+        staged.write_bytes(b"%PDF-1.4 same bytes")
+        path, digest = store.put(staged)
+        assert not staged.exists()
+        paths.add(path)
+    assert len(paths) == 1
+    assert store.path_for(digest).read_bytes() == b"%PDF-1.4 same bytes"
+
+
+def test_receipts_gc_removes_unreferenced_files(app, client, auth_headers):
+    import os
+    from pathlib import Path
+
+    from services.receipt_store import ReceiptStore
+
+    _verify(client, _create_order(client, auth_headers))
+    payment = Payment.query.filter_by(status="captured").one()
+    store = ReceiptStore(app.config["RECEIPTS_DIR"])
+    paths = {}
+    for name in ("stale", "fresh"):
+        staged = store.staging_path()
+        staged.write_bytes(f"%PDF-1.4 {name} render".encode())
+        paths[name] = Path(store.put(staged)[0])
+    abandoned = store.staging_path()
+    abandoned.write_bytes(b"%PDF-1.4 partial")
+    for path in (Path(payment.receipt_path), paths["stale"], abandoned):
+        os.utime(path, (0, 0))
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["receipts", "gc", "--min-age", "60", "--dry-run"])
+    assert "Would remove 2 unreferenced receipt file(s), kept 2." in result.output
+    assert paths["stale"].exists()
+
+    result = runner.invoke(args=["receipts", "gc", "--min-age", "60"])
+    assert result.exit_code == 0, result.output
+    assert "Removed 2 unreferenced receipt file(s), kept 2." in result.output
+    assert not paths["stale"].exists() and not abandoned.exists()
+    assert paths["fresh"].exists()  # too recent: its payment row may not be committed yet
+    assert client.get(f"/api/payments/{payment.invoice_id}/receipt").status_code == 200
+
+
+def _post_event(client, event_type, order_id, payment_id, event_id=None):
+    raw = json.dumps(
+        {"event": event_type, "payload": {"payment": {"entity": {"id": payment_id, "order_id": order_id}}}}
+    ).encode()
+    secret = client.application.config["RAZORPAY_WEBHOOK_SECRET"]
+    headers = {"X-Razorpay-Signature": hmac.new(secret.encode(), raw, hashlib.sha256).hexdigest()}
+    if event_id:
+        headers["X-Razorpay-Event-Id"] = event_id
+    return client.post("/api/payments/webhook", data=raw, headers=headers, content_type="application/json")
+
+
+def test_webhook_inbox_deduplicates_replays(client, auth_headers):
+    from models import Student, WebhookEvent
+
+    order = _create_order(client, auth_headers)
+    first = _post_event(client, "payment.captured", order["orderId"], "pay_replay", "evt_replay_1")
+    replay = _post_event(client, "payment.captured", order["orderId"], "pay_replay", "evt_replay_1")
+    assert first.status_code == replay.status_code == 200
+    assert first.json["data"] == {"eventId": "evt_replay_1", "duplicate": False}
+    assert replay.json["data"]["duplicate"] is True
+
+    # a redelivery under a new event id is stored but changes nothing
+    assert _post_event(client, "payment.captured", order["orderId"], "pay_replay", "evt_replay_2").status_code == 200
+    assert [e.status for e in WebhookEvent.query.order_by(WebhookEvent.id)] == ["processed", "processed"]
+    assert db.session.get(Student, 1).paid_paise == 250000
+
+    bad = client.post(
+        "/api/payments/webhook", data=b"{}", headers={"X-Razorpay-Signature": "nope"}, content_type="application/json"
+    )
+    assert bad.status_code == 400
+    assert WebhookEvent.query.count() == 2
+
+
+def test_capture_and_reversal_apply_once_when_the_status_was_read_stale(client, auth_headers):
+    from models import CollectionRollup, Student
+    from services.payments_service import _mark_captured, apply_webhook_event
+
+    order = _create_order(client, auth_headers)
+    payment = Payment.query.filter_by(razorpay_order_id=order["orderId"]).one()
+    assert payment.status == "created"
+
+    # another worker captures (and accounts for) the payment after this session loaded it
+    Payment.query.filter_by(id=payment.id).update({"status": "captured"}, synchronize_session=False)
+    _mark_captured(payment, "pay_race")
+    db.session.commit()
+    assert db.session.get(Student, 1).paid_paise == 0
+    assert CollectionRollup.query.count() == 0
+
+    failed = {"event": "payment.failed", "payload": {"payment": {"entity": {"order_id": order["orderId"]}}}}
+    payment = Payment.query.filter_by(razorpay_order_id=order["orderId"]).one()
+    Payment.query.filter_by(id=payment.id).update({"status": "failed"}, synchronize_session=False)
+    apply_webhook_event(failed)  # loaded as captured, but another worker already reversed it
+    db.session.commit()
+    assert payment.status == "failed"
+    assert db.session.get(Student, 1).paid_paise == 0
+
+
+def test_webhook_inbox_load(app, client, auth_headers, monkeypatch):
+    from models import CollectionRollup, Student, WebhookEvent
+    from services import webhook_inbox
+
+    # leave events in the inbox so the drain sees real batches
+    monkeypatch.setattr(webhook_inbox, "schedule_drain", lambda: None)
+    real_apply = webhook_inbox.apply_webhook_event
+    orders = [_create_order(client, auth_headers)["orderId"] for _ in range(100)]
+    poison = orders[-1]
+
+    def apply(event):
+        if event["payload"]["payment"]["entity"]["order_id"] == poison:
+            raise RuntimeError("cannot apply")
+        return real_apply(event)
+
+    monkeypatch.setattr(webhook_inbox, "apply_webhook_event", apply)
+
+    posted = 0
+    for round_no in range(5):
+        for i, order_id in enumerate(orders):
+            event_type = "payment.failed" if i % 10 == 0 and round_no == 4 else "payment.captured"
+            for _ in range(4):  # every delivery is replayed three times
+                resp = _post_event(client, event_type, order_id, f"pay_{i}", f"evt_{round_no}_{i}")
+                assert resp.status_code == 200
+                posted += 1
+    assert posted == 2000
+    assert WebhookEvent.query.count() == 500
+    assert WebhookEvent.query.filter_by(status="pending").count() == 500
+
+    result = app.test_cli_runner().invoke(args=["webhooks", "drain", "--batch-size", "64"])
+    assert result.exit_code == 0, result.output
+
+    statuses = dict(db.session.query(WebhookEvent.status, db.func.count()).group_by(WebhookEvent.status).all())
+    assert statuses == {"processed": 495, "failed": 5}
+    assert {e.attempts for e in WebhookEvent.query.filter_by(status="failed")} == {webhook_inbox.MAX_ATTEMPTS}
+
+    captured = Payment.query.filter_by(status="captured").count()
+    assert captured == 89  # 100 orders, minus 10 later failed, minus the poisoned one
+    assert Payment.query.filter_by(status="failed").count() == 10
+    assert db.session.get(Student, 1).paid_paise == captured * 250000
+    assert db.session.query(db.func.sum(CollectionRollup.amount_paise)).scalar() == captured * 250000
+
+
+def test_create_order_reuses_pooled_gateway_connection(client, auth_headers, fake_razorpay):
+    orders = [_create_order(client, auth_headers) for _ in range(5)]
+    assert {order["orderId"] for order in orders} == set(fake_razorpay.orders)
+    assert fake_razorpay.connections == 1
+
+    metrics = client.get("/api/payments/gateway-metrics", headers=auth_headers).json["data"]
+    assert metrics["POST /v1/orders"]["calls"] == 5
+    assert metrics["POST /v1/orders"]["errors"] == 0
+    assert metrics["POST /v1/orders"]["p50Ms"] is not None
+
+
+def test_gateway_timeouts_and_idempotent_retries(app, client, auth_headers, fake_razorpay):
+    from services.razorpay_gateway import gateway_metrics, get_razorpay_client
+
+    app.config["RAZORPAY_READ_TIMEOUT"] = 0.2
+    fake_razorpay.stall_next(1, seconds=0.5)
+    resp = client.post("/api/payments/create-order", json={"studentId": 1, "amount": 100}, headers=auth_headers)
+    # a timed-out POST may have created the order, so it is not resent
+    assert resp.status_code == 502
+    assert fake_razorpay.requests == 1
+    assert Invoice.query.count() == 0
+
+    order = _create_order(client, auth_headers)
+    fake_razorpay.fail_next(2, status=503)
+    assert get_razorpay_client(app).order.fetch(order["orderId"])["id"] == order["orderId"]
+    assert gateway_metrics(app).snapshot()["GET /v1/orders/{id}"]["retries"] == 2
+
+
+def _add_course_students(count, course="B.E"):
+    from models import Student
+
+    students = [
+        Student(name=f"Bulk {i}", regno=f"BULK{i:04d}", course=course, phone="9000000000", email=f"bulk{i}@test.com")
+        for i in range(count)
+    ]
+    db.session.add_all(students)
+    db.session.commit()
+    return [student.id for student in students]
+
+
+def test_bulk_orders_for_course(app, client, auth_headers, fake_razorpay):
+    from models import Student
+
+    student_ids = _add_course_students(40)
+    app.config["BULK_ORDER_BATCH_SIZE"] = 16
+    fake_razorpay.fail_next(2, status=503)
+    resp = client.post(
+        "/api/payments/bulk-orders?concurrency=4",
+        json={"course": "B.E", "amount": 1200, "items": [{"label": "Exam Fee", "amount": 120000}], "invoicePrefix": "SEM2"},
+        headers=auth_headers,
+    )
+    assert resp.status_code == 201
+    report = resp.json["data"]
+    assert (report["total"], report["created"], report["failed"]) == (40, 38, 2)
+    assert [r["studentId"] for r in report["results"]] == student_ids
+    failed = [r for r in report["results"] if r["status"] == "failed"]
+    assert {r["error"] for r in failed} == {"Payment gateway unavailable, please retry"}
+    assert all(r["invoiceId"] is None for r in failed)
+
+    created = [r for r in report["results"] if r["status"] == "created"]
+    assert {r["orderId"] for r in created} <= set(fake_razorpay.orders)
+    payments = Payment.query.filter(Payment.student_id.in_(student_ids)).all()
+    assert sorted((p.invoice_id, p.razorpay_order_id) for p in payments) == sorted(
+        (r["invoiceId"], r["orderId"]) for r in created
+    )
+    assert all(r["invoiceNo"].startswith("SEM2-") for r in created)
+    assert db.session.get(Invoice, created[0]["invoiceId"]).items == [{"label": "Exam Fee", "amount": 120000}]
+    invoiced = {s.id: s.invoiced_paise for s in Student.query.filter(Student.id.in_(student_ids))}
+    assert invoiced == {r["studentId"]: 120000 if r["status"] == "created" else 0 for r in report["results"]}
+
+
+def test_bulk_orders_for_student_ids_and_cli(app, client, auth_headers):
+    student_ids = _add_course_students(3, course="MCA")
+    resp = client.post(
+        "/api/payments/bulk-orders", json={"studentIds": [student_ids[0], 999, student_ids[0]], "amount": 10}, headers=auth_headers
+    )
+    report = resp.json["data"]
+    assert (report["total"], report["created"]) == (2, 1)
+    assert report["results"][0] == {"studentId": 999, "status": "failed", "error": "Student not found"}
+    assert client.post("/api/payments/bulk-orders", json={"amount": 10}, headers=auth_headers).status_code == 400
+
+    result = app.test_cli_runner().invoke(
+        args=["payments", "bulk-orders", "--course", "MCA", "--amount", "99.50", "--item", "Lab: Fee:9950"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "Created 3 of 3 orders (0 failed)." in result.output
+    invoice = Invoice.query.filter_by(student_id=student_ids[2]).one()
+    assert (invoice.amount_paise, invoice.items) == (9950, [{"label": "Lab: Fee", "amount": 9950}])
+
+
+def test_create_order_idempotency_key(app, client, auth_headers, fake_razorpay):
+    from models import Student
+
+    body = {"studentId": 1, "amount": 2500, "items": [{"label": "Semester Fee", "amount": 250000}]}
+    first = client.post("/api/payments/create-order", json=body, headers={**auth_headers, "Idempotency-Key": "pay-click-1"})
+    again = client.post("/api/payments/create-order", json=body, headers={**auth_headers, "Idempotency-Key": "pay-click-1"})
+    assert first.status_code == again.status_code == 201
+    assert again.json == first.json
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert len(fake_razorpay.orders) == Invoice.query.count() == 1
+    assert db.session.get(Student, 1).invoiced_paise == 250000
+
+    other = client.post("/api/payments/create-order", json={**body, "amount": 10}, headers={**auth_headers, "Idempotency-Key": "pay-click-1"})
+    assert other.status_code == 422
+
+    # validation failures are stored and replayed too
+    missing = {"studentId": 999, "amount": 10}
+    assert client.post("/api/payments/create-order", json=missing, headers={**auth_headers, "Idempotency-Key": "bad-1"}).status_code == 400
+    replay = client.post("/api/payments/create-order", json=missing, headers={**auth_headers, "Idempotency-Key": "bad-1"})
+    assert (replay.status_code, replay.headers["Idempotent-Replayed"]) == (400, "true")
+
+    # a gateway failure releases the key so the retry goes through
+    fake_razorpay.fail_next(1, status=503)
+    assert client.post("/api/payments/create-order", json=body, headers={**auth_headers, "Idempotency-Key": "pay-click-2"}).status_code == 502
+    retry = client.post("/api/payments/create-order", json=body, headers={**auth_headers, "Idempotency-Key": "pay-click-2"})
+    assert retry.status_code == 201
+    assert "Idempotent-Replayed" not in retry.headers
+    assert len(fake_razorpay.orders) == Invoice.query.count() == 2
+
+
+def test_concurrent_idempotent_duplicates_wait_for_first(tmp_path):
+    import threading
+
+    from app import create_app
+    from config import TestConfig
+    from fake_razorpay import FakeRazorpay
+    from models import Student
+
+    server = FakeRazorpay(latency=0.3).start()
+
+    class ConcurrentConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'concurrent.db'}"
+        RAZORPAY_KEY_ID = "rzp_test_fake"
+        RAZORPAY_BASE_URL = server.url
+        ALLOW_CLIENT_AMOUNT_ORDERS = True
+
+    app = create_app(ConcurrentConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.text("PRAGMA journal_mode=WAL"))
+        db.session.add(Student(name="Racer", regno="RACE1", course="MBA", phone="9", email="race@test.com"))
+        db.session.commit()
+
+    responses = []
+
+    def pay():
+        resp = app.test_client().post(
+            "/api/payments/create-order", json={"studentId": 1, "amount": 2500}, headers={"Idempotency-Key": "double-click"}
+        )
+        responses.append(resp)
+
+    try:
+        threads = [threading.Thread(target=pay) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.stop()
+
+    assert [resp.status_code for resp in responses] == [201] * 5
+    assert len({resp.json["data"]["orderId"] for resp in responses}) == 1
+    assert sum("Idempotent-Replayed" in resp.headers for resp in responses) == 4
+    assert len(server.orders) == 1
+    with app.app_context():
+        assert Invoice.query.count() == 1
+
+
+def _add_payments(specs):
+    """Create one invoice and payment per ``(payment_id, order_id, amount_paise, status, created_at)``."""
+    student_id = _add_course_students(1, course="RECON")[0]
+    payments = []
+    for payment_id, order_id, amount, status, created_at in specs:
+        invoice = Invoice(invoice_no=f"INV-{order_id}", student_id=student_id, amount_paise=amount, items=[])
+        db.session.add(invoice)
+        db.session.flush()
+        payments.append(
+            Payment(
+                student_id=student_id,
+                invoice_id=invoice.id,
+                invoice_no=invoice.invoice_no,
+                amount_paise=amount,
+                razorpay_order_id=order_id,
+                razorpay_payment_id=payment_id,
+                status=status,
+                created_at=created_at,
+            )
+        )
+    db.session.add_all(payments)
+    db.session.commit()
+    return payments
+
+
+def test_reconcile_export_reports_mismatches(app, client, auth_headers):
+    day = datetime(2025, 6, 1, 10, 0)
+    _add_payments(
+        [
+            ("pay_ok", "order_ok", 250000, "captured", day),
+            ("pay_amount", "order_amount", 100000, "captured", day.replace(hour=11)),
+            ("pay_drift", "order_drift", 50000, "created", day.replace(hour=12)),
+            (None, "order_late", 70000, "created", day.replace(hour=13)),
+            ("pay_unseen", "order_unseen", 90000, "captured", day.replace(hour=14)),
+            ("pay_after", "order_after", 90000, "captured", datetime(2025, 6, 3)),
+        ]
+    )
+    export = (
+        "﻿entity_id,type,order_id,amount,fee,settled_at\n"
+        "pay_ok,payment,order_ok,2500.00,59.00,2025-06-02\n"
+        "pay_amount,payment,order_amount,999.00,23.58,2025-06-02\n"
+        "pay_drift,payment,order_drift,500,11.80,2025-06-02\n"
+        "pay_new,payment,order_late,700,16.52,2025-06-02\n"
+        "rfnd_1,refund,order_ok,-2500.00,0,2025-06-02\n"
+        "pay_ghost,payment,order_ghost,10,0.24,2025-06-02\n"
+        "pay_ok,payment,order_ok,2500.00,59.00,2025-06-02\n"
+        "pay_bad,payment,order_bad,ten,0,2025-06-02\n"
+        "pay_after,payment,order_after,900,21.24,2025-06-04\n"
+    )
+    app.config["RECONCILE_BATCH_SIZE"] = 3
+    resp = client.post(
+        "/api/payments/reconcile?from=2025-06-01&to=2025-06-01",
+        data={"file": (io.BytesIO(export.encode()), "settlements.csv")},
+        headers=auth_headers,
+    )
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.data.decode().splitlines()]
+    by_type = {}
+    for row in rows[:-1]:
+        by_type.setdefault(row["type"], []).append(row.get("razorpayPaymentId") or row.get("line"))
+    assert by_type == {
+        "amount_mismatch": ["pay_amount"],
+        "status_drift": ["pay_drift", "pay_new"],
+        "missing_in_db": ["pay_ghost"],
+        "duplicate_in_export": ["pay_ok"],
+        "invalid": [9],
+        "missing_in_export": ["pay_unseen"],
+    }
+    amount = next(row for row in rows if row["type"] == "amount_mismatch")
+    assert (amount["ourAmount"], amount["gatewayAmount"], amount["invoiceNo"]) == (100000, 99900, "INV-order_amount")
+    assert rows[-1] == {
+        "type": "summary",
+        "rows": 9,
+        "matched": 5,
+        "skipped": 1,
+        "invalid": 1,
+        "missing_in_db": 1,
+        "missing_in_export": 1,
+        "duplicate_in_export": 1,
+        "amount_mismatch": 1,
+        "status_drift": 2,
+    }
+
+    bad = client.post("/api/payments/reconcile?format=csv", data=b"name,amount\nx,1\n", headers=auth_headers)
+    assert bad.status_code == 400
+    assert client.post("/api/payments/reconcile", data=b"[]", headers=auth_headers).status_code == 400
+
+
+def test_reconcile_json_export_and_cli(app, tmp_path):
+    _add_payments(
+        [
+            ("pay_a", "order_a", 120000, "captured", datetime(2025, 7, 1)),
+            ("pay_b", "order_b", 80000, "failed", datetime(2025, 7, 2)),
+        ]
+    )
+    items = [
+        {"id": "pay_a", "entity": "payment", "order_id": "order_a", "amount": 120000, "status": "captured"},
+        {"id": "pay_b", "entity": "payment", "order_id": "order_b", "amount": 80000, "status": "captured"},
+    ]
+    export = tmp_path / "payments.json"
+    # a pretty-printed collection, streamed item by item across read boundaries
+    export.write_text(json.dumps({"entity": "collection", "count": 2, "items": items}, indent=2))
+    result = app.test_cli_runner().invoke(args=["payments", "reconcile", str(export), "--output-format", "jsonl"])
+    assert result.exit_code == 1, result.output
+    drift = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(row["type"], row["ourStatus"], row["gatewayStatus"]) for row in drift] == [
+        ("status_drift", "failed", "captured")
+    ]
+    assert "Reconciled 2 rows: 2 matched, 1 mismatch(es)" in result.stderr
+
+    export.write_text(json.dumps(items[:1]))
+    result = app.test_cli_runner().invoke(args=["payments", "reconcile", str(export)])
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines() == [",".join(MISMATCH_FIELDS)]
+
+    export.write_text(json.dumps(items)[:-20])
+    result = app.test_cli_runner().invoke(args=["payments", "reconcile", str(export)])
+    assert result.exit_code == 1
+    assert "truncated or invalid after item 1" in result.output
+
+
+def test_reconcile_jsonl_input_over_cli_and_api(app, client, auth_headers, tmp_path):
+    _add_payments([("pay_l", "order_l", 50000, "captured", datetime(2025, 8, 1))])
+    lines = [
+        json.dumps({"id": "pay_l", "entity": "payment", "order_id": "order_l", "amount": 50000, "status": "captured"}),
+        "",
+        "{not json",
+        json.dumps({"id": "pay_x", "entity": "payment", "order_id": "order_x", "amount": 100}),
+    ]
+    export = tmp_path / "payments.jsonl"
+    export.write_text("\n".join(lines) + "\n")
+    result = app.test_cli_runner().invoke(args=["payments", "reconcile", str(export), "--output-format", "jsonl"])
+    assert result.exit_code == 1, result.output
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [(row["type"], row["line"], row["razorpayPaymentId"]) for row in rows] == [("missing_in_db", 4, "pay_x")]
+    assert "line 3: Invalid JSON" in result.stderr
+
+    resp = client.post(
+        "/api/payments/reconcile", data=export.read_bytes(), content_type="application/x-ndjson", headers=auth_headers
+    )
+    assert resp.status_code == 200
+    summary = json.loads(resp.data.decode().splitlines()[-1])
+    assert (summary["rows"], summary["matched"], summary["invalid"], summary["missing_in_db"]) == (3, 1, 1, 1)
+
+
+class _Trickle(io.BytesIO):
+    """A stream that returns at most three bytes per read, whatever size is asked for."""
+
+    def read(self, size=-1):
+        return super().read(3)
+
+
+def test_json_export_items_are_found_across_chunk_boundaries():
+    items = [{"id": "pay_a", "amount": 12345}, {"id": "pay_b", "amount": 1}]
+    collection = {"entity": "collection", "notes": ["x"], "meta": {"items": [1]}, "items": items}
+    rows = list(iter_export_rows(_Trickle(json.dumps(collection).encode()), "json"))
+    assert rows == [(1, items[0], None), (2, items[1], None)]
+
+    # a number split across reads is decoded whole
+    rows = list(iter_export_rows(_Trickle(b"[12345, 678]"), "json"))
+    assert [row for _, row, _ in rows] == [12345, 678]
+
+    with pytest.raises(ReconciliationError, match="no items array"):
+        list(iter_export_rows(_Trickle(b'{"entity": "collection", "count": 0}'), "json"))
@@ -0,0 +1,89 @@
+import hashlib
+import hmac
+import json
+import re
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+
+# "SCAN payments" is a full table scan; "SCAN payments USING [COVERING] INDEX ..." walks an index instead.
+_FULL_SCAN = re.compile(r"^SCAN (payments|invoices)(?! USING)")
+
+
+@pytest.fixture
+def captured_selects(app):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and re.search(r"\b(payments|invoices)\b", statement):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", _record)
+
+
+def _full_scans(statements):
+    scans = []
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            details = [row[-1] for row in plan]
+            if any(_FULL_SCAN.match(detail) for detail in details):
+                scans.append((statement, details))
+    return scans
+
+
+def _create_order(client, auth_headers, invoice_no):
+    resp = client.post(
+        "/api/payments/create-order",
+        json={"studentId": 1, "amount": 1200, "meta": {"invoiceNo": invoice_no}},
+        headers=auth_headers,
+    )
+    return resp.json["data"]
+
+
+def test_payment_hot_paths_use_indexes(client, auth_headers, captured_selects):
+    order = _create_order(client, auth_headers, "INV-PLAN-1")
+    secret = client.application.config["RAZORPAY_KEY_SECRET"]
+    signature = hmac.new(secret.encode(), f"{order['orderId']}|pay_plan_1".encode(), hashlib.sha256).hexdigest()
+    client.post(
+        "/api/payments/verify",
+        json={
+            "razorpay_order_id": order["orderId"],
+            "razorpay_payment_id": "pay_plan_1",
+            "razorpay_signature": signature,
+            "invoiceId": order["invoiceId"],
+        },
+    )
+
+    second = _create_order(client, auth_headers, "INV-PLAN-2")
+    body = json.dumps(
+        {"event": "payment.captured", "payload": {"payment": {"entity": {"id": "pay_plan_2", "order_id": second["orderId"]}}}}
+    ).encode()
+    webhook_secret = client.application.config["RAZORPAY_WEBHOOK_SECRET"]
+    client.post(
+        "/api/payments/webhook",
+        data=body,
+        headers={"X-Razorpay-Signature": hmac.new(webhook_secret.encode(), body, hashlib.sha256).hexdigest()},
+        content_type="application/json",
+    )
+
+    client.get(f"/api/payments/{order['invoiceId']}/receipt", headers=auth_headers)
+    client.get("/api/payments?studentId=1", headers=auth_headers)
+    client.get("/api/payments?status=captured&from=2020-01-01&to=2100-01-01", headers=auth_headers)
+    client.get("/api/payments?studentId=1&status=captured", headers=auth_headers)
+    page = client.get("/api/payments?limit=1", headers=auth_headers).json
+    client.get(f"/api/payments?limit=1&after={page['nextCursor']}", headers=auth_headers)
+    client.get("/api/students/1", headers=auth_headers)
+    client.get("/api/reports/export?format=csv&detail=payments&from=2020-01-01&to=2100-01-01", headers=auth_headers)
+
+    assert len(captured_selects) >= 8
+    assert _full_scans(captured_selects) == []
+
+
+def test_full_scan_detection(app):
+    scans = _full_scans([("SELECT * FROM payments WHERE currency = ?", ("INR",))])
+    assert len(scans) == 1
@@ -0,0 +1,459 @@
+import csv
+import hashlib
+import hmac
+import io
+import os
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from extensions import db
+from models import CollectionRollup, Invoice, Payment, ReportJob, Student
+from services import report_export, report_renderer, report_series
+from services.balances import record_invoice, record_payment
+from services.report_cache import MemoryBackend, RedisBackend, ReportCache
+from services.report_jobs import evict_artifacts
+from services.report_renderer import UnencodableTextError, render_report
+
+
+def _add_students(count, start=0):
+    for i in range(start, start + count):
+        student = Student(
+            name=f"Student {i}",
+            regno=f"BULK{i:05d}",
+            course="BCA" if i % 2 else "MCA",
+            phone="7777777777",
+            email=f"bulk{i}@test.com",
+        )
+        db.session.add(student)
+        db.session.flush()
+        invoice = Invoice(
+            invoice_no=f"INV-BULK-{i:05d}",
+            student_id=student.id,
+            amount_paise=100000,
+            currency="INR",
+        )
+        payment = Payment(
+            student_id=student.id,
+            invoice=invoice,
+            invoice_no=invoice.invoice_no,
+            amount_paise=40000,
+            currency="INR",
+            status="captured" if i % 3 else "created",
+        )
+        db.session.add_all([invoice, payment])
+        record_invoice(invoice)
+        if payment.status == "captured":
+            record_payment(payment)
+    db.session.commit()
+
+
+def test_reports_defaulters_use_set_based_balances(client, auth_headers):
+    _add_students(6)
+    resp = client.get("/api/reports", headers=auth_headers)
+    assert resp.status_code == 200
+    defaulters = {d["studentId"]: d["amount"] for d in resp.json["data"]["defaulters"]}
+    for student in Student.query.filter(Student.regno.like("BULK%")):
+        index = int(student.regno[4:])
+        expected = 60000 if index % 3 else 100000
+        assert defaulters[student.id] == expected
+        assert student.outstanding_amount() == expected
+
+
+def test_reports_query_count_is_constant(client, auth_headers, query_counter):
+    _add_students(5)
+    query_counter.clear()
+    client.get("/api/reports", headers=auth_headers)
+    small = len(query_counter)
+
+    _add_students(50, start=5)
+    query_counter.clear()
+    client.get("/api/reports", headers=auth_headers)
+    assert len(query_counter) == small
+
+    query_counter.clear()
+    client.get("/api/students", headers=auth_headers)
+    assert len(query_counter) == 1
+
+
+def _capture_via_verify(client, auth_headers, amount):
+    order = client.post(
+        "/api/payments/create-order",
+        json={"studentId": 1, "amount": amount, "currency": "INR", "items": []},
+        headers=auth_headers,
+    ).json["data"]
+    payment_id = f"pay_{order['invoiceId']}"
+    secret = client.application.config["RAZORPAY_KEY_SECRET"]
+    signature = hmac.new(
+        secret.encode(), f"{order['orderId']}|{payment_id}".encode(), hashlib.sha256
+    ).hexdigest()
+    payload = {
+        "razorpay_order_id": order["orderId"],
+        "razorpay_payment_id": payment_id,
+        "razorpay_signature": signature,
+        "invoiceId": order["invoiceId"],
+    }
+    assert client.post("/api/payments/verify", json=payload).status_code == 200
+    return payload
+
+
+def test_captured_payments_update_rollups_once(client, auth_headers):
+    payload = _capture_via_verify(client, auth_headers, 1500)
+    _capture_via_verify(client, auth_headers, 500)
+    # replaying a verification must not double count
+    client.post("/api/payments/verify", json=payload)
+
+    rollups = CollectionRollup.query.all()
+    assert len(rollups) == 1
+    assert rollups[0].course == "MBA"
+    assert rollups[0].amount_paise == 200000
+    assert rollups[0].payment_count == 2
+
+    data = client.get("/api/reports", headers=auth_headers).json["data"]
+    assert data["totalCollected"] == 200000
+    assert data["byCourse"] == [{"course": "MBA", "amount": 200000}]
+
+    today = datetime.utcnow().date().isoformat()
+    data = client.get(f"/api/reports?from={today}&to={today}", headers=auth_headers).json["data"]
+    assert data["totalCollected"] == 200000
+    data = client.get("/api/reports?to=2000-01-01", headers=auth_headers).json["data"]
+    assert data["totalCollected"] == 0
+
+
+def test_rollups_rebuild_command_backfills(app, client, auth_headers):
+    _add_students(6)
+    assert CollectionRollup.query.count() == 0
+
+    result = app.test_cli_runner().invoke(args=["rollups", "rebuild"])
+    assert result.exit_code == 0
+
+    by_course = {r.course: r.amount_paise for r in CollectionRollup.query}
+    assert by_course == {"BCA": 80000, "MCA": 80000}
+    data = client.get("/api/reports", headers=auth_headers).json["data"]
+    assert data["totalCollected"] == 160000
+
+
+def test_report_cache_hits_and_invalidation(client, auth_headers):
+    cache = client.application.extensions["report_cache"]
+    client.get("/api/reports", headers=auth_headers)
+    client.get("/api/reports", headers=auth_headers)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    _capture_via_verify(client, auth_headers, 700)
+    data = client.get("/api/reports", headers=auth_headers).json["data"]
+    assert data["totalCollected"] == 70000
+    assert cache.misses == 2
+
+    client.post(
+        "/api/students",
+        json={"name": "New", "regno": "REG999", "course": "MBA", "phone": "1", "email": "new@test.com"},
+        headers=auth_headers,
+    )
+    client.get("/api/reports", headers=auth_headers)
+    stats = client.get("/api/reports/cache", headers=auth_headers).json["data"]
+    assert stats["misses"] == 3
+    assert stats["backend"] == "memory"
+
+
+def test_memory_backend_evicts_lru_and_expired_entries():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", "1", ttl=60)
+    backend.set("b", "2", ttl=60)
+    backend.get("a")
+    backend.set("c", "3", ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+    backend.set("d", "4", ttl=0)
+    assert backend.get("d") is None
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value.encode()
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b"0")) + 1).encode()
+
+
+def test_redis_backend_shares_entries_between_caches():
+    server = _FakeRedis()
+    first, second = ReportCache(RedisBackend(server)), ReportCache(RedisBackend(server))
+    assert first.get_or_compute("k", lambda: {"v": 1}) == {"v": 1}
+    assert second.get_or_compute("k", lambda: {"v": 2}) == {"v": 1}
+    second.invalidate()
+    assert first.get_or_compute("k", lambda: {"v": 3}) == {"v": 3}
+
+
+def test_csv_summary_export_streams_rows(client, auth_headers):
+    _add_students(4)
+    client.application.test_cli_runner().invoke(args=["rollups", "rebuild"])
+    resp = client.get("/api/reports/export?type=daily&format=csv", headers=auth_headers)
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows[0] == ["Section", "Key", "Value"]
+    assert rows[1] == ["Summary", "TotalCollected", "800.0"]
+    assert [r for r in rows if r[0] == "Defaulter"][1:] == [
+        ["Defaulter", str(s.id), str(s.outstanding_amount() / 100)]
+        for s in Student.query.order_by(Student.id)
+        if s.outstanding_amount() > 0
+    ]
+
+
+def test_csv_payment_detail_export(client, auth_headers):
+    _add_students(6)
+    client.application.config["REPORT_EXPORT_BATCH_SIZE"] = 2
+    resp = client.get("/api/reports/export?format=csv&detail=payments", headers=auth_headers)
+    assert resp.status_code == 200
+    assert "BEC_daily_payments.csv" in resp.headers["Content-Disposition"]
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows[0][:4] == ["InvoiceNo", "Regno", "StudentName", "Course"]
+    assert [row[0] for row in rows[1:]] == [
+        "INV-BULK-00001",
+        "INV-BULK-00002",
+        "INV-BULK-00004",
+        "INV-BULK-00005",
+    ]
+    assert rows[1][1:6] == ["BULK00001", "Student 1", "BCA", "400.0", "INR"]
+
+    resp = client.get("/api/reports/export?format=csv&detail=payments&to=2000-01-01", headers=auth_headers)
+    assert len(resp.get_data(as_text=True).splitlines()) == 1
+
+
+def test_pdf_export_reuses_artifact_until_data_changes(client, auth_headers):
+    reports_dir = Path(client.application.config["REPORTS_DIR"])
+    first = client.get("/api/reports/export?type=monthly&format=pdf", headers=auth_headers)
+    assert first.status_code == 200
+    assert first.data.startswith(b"%PDF")
+    client.get("/api/reports/export?type=monthly&format=pdf", headers=auth_headers)
+    assert len(list(reports_dir.glob("*.pdf"))) == 1
+
+    _capture_via_verify(client, auth_headers, 300)
+    client.get("/api/reports/export?type=monthly&format=pdf", headers=auth_headers)
+    assert len(list(reports_dir.glob("*.pdf"))) == 2
+
+    resp = client.get("/api/reports/export?type=hourly&format=pdf", headers=auth_headers)
+    assert resp.status_code == 400
+
+
+def test_report_job_lifecycle(client, auth_headers):
+    resp = client.post("/api/reports/jobs", json={"type": "yearly", "from": "2024-01-01"}, headers=auth_headers)
+    # REPORT_WORKERS=0 in tests, so the job has already run by the time the POST returns
+    assert resp.status_code in (200, 202)
+    job_id = resp.json["data"]["jobId"]
+
+    status = client.get(f"/api/reports/jobs/{job_id}", headers=auth_headers).json["data"]
+    assert status["status"] == "done"
+    assert status["progress"] == 100
+
+    download = client.get(status["downloadUrl"], headers=auth_headers)
+    assert download.status_code == 200
+    assert download.data.startswith(b"%PDF")
+
+    again = client.post("/api/reports/jobs", json={"type": "yearly", "from": "2024-01-01"}, headers=auth_headers)
+    assert again.status_code == 200
+    assert again.json["data"]["status"] == "done"
+    assert client.get("/api/reports/jobs/missing", headers=auth_headers).status_code == 404
+
+
+def test_orphaned_report_job_is_reclaimed_and_resumed(app, client, auth_headers, monkeypatch):
+    from services import report_jobs
+
+    # a worker that never runs the job, as if the process died right after queueing it
+    monkeypatch.setattr(report_jobs, "dispatch_report_jobs", lambda job_ids: None)
+    job_id = client.post("/api/reports/jobs", json={"type": "monthly"}, headers=auth_headers).json["data"]["jobId"]
+    monkeypatch.undo()
+    assert client.post("/api/reports/jobs", json={"type": "monthly"}, headers=auth_headers).json["data"]["status"] == "queued"
+
+    stale = datetime.utcnow() - timedelta(seconds=app.config["REPORT_JOB_STALE_SECONDS"] + 1)
+    ReportJob.query.filter_by(job_id=job_id).update({"status": "running", "updated_at": stale})
+    db.session.commit()
+    again = client.post("/api/reports/jobs", json={"type": "monthly"}, headers=auth_headers).json["data"]
+    assert (again["jobId"], again["status"]) == (job_id, "done")
+
+    monkeypatch.setattr(report_jobs, "dispatch_report_jobs", lambda job_ids: None)
+    queued = client.post("/api/reports/jobs", json={"type": "daily"}, headers=auth_headers).json["data"]["jobId"]
+    monkeypatch.undo()
+    result = app.test_cli_runner().invoke(args=["reports", "resume"])
+    assert "Dispatched 1 report job(s)." in result.output
+    assert client.get(f"/api/reports/jobs/{queued}", headers=auth_headers).json["data"]["status"] == "done"
+
+
+def test_evict_artifacts_by_age_and_size(app):
+    reports_dir = Path(app.config["REPORTS_DIR"])
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    for index, age in enumerate([10_000, 300, 200, 100]):
+        path = reports_dir / f"artifact_{index}.pdf"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now - age, now - age))
+
+    assert evict_artifacts(max_age=5_000, max_bytes=250) == 2
+    assert sorted(p.name for p in reports_dir.glob("*.pdf")) == ["artifact_2.pdf", "artifact_3.pdf"]
+
+
+def _add_rollup(day, course, amount, count=1):
+    db.session.add(
+        CollectionRollup(day=day, course=course, currency="INR", amount_paise=amount, payment_count=count)
+    )
+
+
+def test_series_buckets_by_granularity_and_course(client, auth_headers):
+    _add_rollup(date(2024, 12, 30), "MBA", 100)  # Monday
+    _add_rollup(date(2025, 1, 5), "MBA", 200)  # Sunday, same ISO week
+    _add_rollup(date(2025, 1, 6), "BBA", 400)
+    _add_rollup(date(2025, 3, 1), "MBA", 800, count=2)
+    db.session.commit()
+
+    def series(query):
+        resp = client.get(f"/api/reports/series?{query}", headers=auth_headers)
+        assert resp.status_code == 200
+        return resp.json["data"]
+
+    weekly = series("granularity=weekly&to=2025-01-12")["series"]
+    assert weekly == [
+        {"period": "2024-12-30", "amount": 300, "count": 2},
+        {"period": "2025-01-06", "amount": 400, "count": 1},
+    ]
+
+    monthly = series("granularity=monthly&from=2024-12-01&to=2025-03-31")["series"]
+    assert [(p["period"], p["amount"]) for p in monthly] == [
+        ("2024-12-01", 100),
+        ("2025-01-01", 600),
+        ("2025-02-01", 0),
+        ("2025-03-01", 800),
+    ]
+
+    yearly = series("type=yearly&byCourse=1")
+    assert [(p["period"], p["amount"]) for p in yearly["series"]] == [("2024-01-01", 100), ("2025-01-01", 1400)]
+    courses = {entry["course"]: [p["amount"] for p in entry["series"]] for entry in yearly["byCourse"]}
+    assert courses == {"BBA": [0, 400], "MBA": [100, 1000]}
+
+    daily = series("from=2025-01-05&to=2025-01-07")["series"]
+    assert [p["amount"] for p in daily] == [200, 400, 0]
+
+    assert client.get("/api/reports/series?granularity=hourly", headers=auth_headers).status_code == 400
+
+
+def test_series_rejects_ranges_over_the_bucket_cap(app, client, auth_headers):
+    counts = [report_series.count_periods(date(2024, 1, 3), date(2024, 3, 4), g) for g in report_series.GRANULARITIES]
+    assert counts == [62, 10, 3, 1]
+    app.config["REPORT_SERIES_MAX_POINTS"] = 100
+    decades = "from=1990-01-01&to=2025-12-31"
+    resp = client.get(f"/api/reports/series?granularity=daily&{decades}", headers=auth_headers)
+    assert resp.status_code == 400
+    assert "13149 daily periods" in resp.json["error"]
+    for query in (f"type=daily&format=csv&{decades}", f"type=weekly&format=pdf&{decades}"):
+        assert client.get(f"/api/reports/export?{query}", headers=auth_headers).status_code == 400
+    resp = client.get(f"/api/reports/series?granularity=yearly&{decades}", headers=auth_headers)
+    assert len(resp.json["data"]["series"]) == 36
+
+    # an open-ended range is checked against the span of the data it finds
+    for day in (date(1990, 1, 1), date(2025, 1, 1)):
+        db.session.add(CollectionRollup(day=day, course="MBA", currency="INR", amount_paise=100, payment_count=1))
+    db.session.commit()
+    assert client.get("/api/reports/series?granularity=daily", headers=auth_headers).status_code == 400
+    assert client.get("/api/reports/series?granularity=monthly", headers=auth_headers).status_code == 400
+    assert client.get("/api/reports/series?granularity=yearly", headers=auth_headers).status_code == 200
+
+
+def test_series_python_fallback_matches_sql(app, monkeypatch):
+    _add_rollup(date(2023, 6, 15), "MBA", 100)
+    _add_rollup(date(2024, 2, 29), "BBA", 250)
+    _add_rollup(date(2024, 3, 4), "MBA", 50)
+    db.session.commit()
+
+    for granularity in ("daily", "weekly", "monthly", "yearly"):
+        sql = sorted(report_series._grouped_rows(granularity, None, None, True))
+        with monkeypatch.context() as patched:
+            patched.setattr(report_series, "_bucket_expression", lambda *args: None)
+            fallback = sorted(report_series._grouped_rows(granularity, None, None, True))
+        assert sql == fallback
+
+
+def test_summary_csv_includes_period_rows(client, auth_headers):
+    _add_rollup(date(2025, 1, 15), "MBA", 1000)
+    _add_rollup(date(2025, 2, 15), "MBA", 500)
+    db.session.commit()
+    resp = client.get("/api/reports/export?type=monthly&format=csv", headers=auth_headers)
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert [r for r in rows if r[0] == "Period"] == [
+        ["Period", "Start", "Amount"],
+        ["Period", "2025-01-01", "10.0"],
+        ["Period", "2025-02-01", "5.0"],
+    ]
+
+
+def test_reportlab_renderer_paginates_streamed_rows(tmp_path):
+    produced = []
+
+    def defaulters():
+        for index in range(500):
+            produced.append(index)
+            yield index, f"REG{index:05d}", f"Student {index}", "MBA", 150000
+
+    path = tmp_path / "report.pdf"
+    render_report(str(path), "Report", 0, [{"course": "MBA", "amount": 0}], [], defaulters())
+    data = path.read_bytes()
+    assert data.startswith(b"%PDF")
+    assert len(produced) == 500
+    assert data.count(b"/Type /Page\n") > 5
+    # every xref entry points at the object it numbers
+    xref = int(data.rsplit(b"startxref\n", 1)[1].split()[0])
+    entries = data[xref:].split(b"\n")[3:]
+    offsets = [int(entry[:10]) for entry in entries[: int(data[xref:].split()[2]) - 1]]
+    assert all(data[offset:].startswith(b"%d 0 obj" % number) for number, offset in enumerate(offsets, start=1))
+    assert b"/Count %d " % data.count(b"/Type /Page\n") in data
+
+
+def test_reportlab_renderer_refuses_unencodable_text_and_closes_the_file(tmp_path, monkeypatch):
+    writers = []
+
+    class RecordingWriter(report_renderer.PdfStreamWriter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            writers.append(self)
+
+    monkeypatch.setattr(report_renderer, "PdfStreamWriter", RecordingWriter)
+    defaulters = [(1, "REG00001", "Student 1", "MBA", 100), (2, "REG00002", "\u0938\u0941\u0930\u0947\u0936", "MBA", 100)]
+    with pytest.raises(UnencodableTextError):
+        render_report(str(tmp_path / "report.pdf"), "Report", 0, [], [], defaulters)
+    assert writers and writers[0]._file.closed
+    with pytest.raises(UnencodableTextError):
+        render_report(str(tmp_path / "title.pdf"), "Report \u20b9\u0938", 0, [], [], [])
+    assert writers[1]._file.closed
+
+
+def test_pdf_export_uses_weasyprint_for_unencodable_names(client, auth_headers, monkeypatch):
+    _add_students(2)
+    Student.query.filter_by(regno="BULK00001").one().name = "\u0938\u0941\u0930\u0947\u0936"
+    db.session.commit()
+    rendered = []
+
+    def fake_weasyprint(file_path, title, total_collected, by_course, series, defaulters):
+        rendered.append([name for _, _, name, _, _ in defaulters])
+        Path(file_path).write_bytes(b"%PDF-1.4 weasyprint")
+
+    monkeypatch.setattr(report_export, "_render_weasyprint", fake_weasyprint)
+    client.application.config["REPORT_PDF_ENGINE"] = "reportlab"
+    resp = client.get("/api/reports/export?type=yearly&format=pdf", headers=auth_headers)
+    assert resp.status_code == 200
+    assert resp.data == b"%PDF-1.4 weasyprint"
+    assert "\u0938\u0941\u0930\u0947\u0936" in rendered[0]
+
+
+def test_pdf_export_includes_defaulter_tables_with_either_engine(client, auth_headers):
+    _add_students(120)
+    for engine in ("reportlab", "weasyprint"):
+        client.application.config["REPORT_PDF_ENGINE"] = engine
+        resp = client.get("/api/reports/export?type=yearly&format=pdf", headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.data.count(b"/Type /Page\n") > 1
@@ -1,3 +1,11 @@
+import io
+
+from extensions import db
+from models import Invoice, Payment, Student
+from services.balances import record_invoice, record_payment
+from utils import encode_cursor
+
+
 def test_list_students(client, auth_headers):
     resp = client.get("/api/students", headers=auth_headers)
     assert resp.status_code == 200
@@ -18,3 +26,232 @@ def test_create_student(client, auth_headers):
     assert resp.status_code == 201
     assert resp.json["data"]["name"] == payload["name"]
 
+
+def _seed_students(count):
+    for i in range(count):
+        student = Student(
+            name=f"Page Student {i % 5}",
+            regno=f"PAGE{i:04d}",
+            course="BCA" if i % 2 else "MCA",
+            phone="7777777777",
+            email=f"page{i}@test.com",
+        )
+        db.session.add(student)
+        db.session.flush()
+        invoice = Invoice(invoice_no=f"INV-PAGE-{i:04d}", student_id=student.id, amount_paise=1000 * (i + 1))
+        db.session.add(invoice)
+        record_invoice(invoice)
+    db.session.commit()
+
+
+def test_list_students_keyset_pagination(client, auth_headers):
+    _seed_students(23)
+    seen, cursor = [], None
+    while True:
+        url = "/api/students?limit=5" + (f"&after={cursor}" if cursor else "")
+        resp = client.get(url, headers=auth_headers)
+        assert resp.status_code == 200
+        seen.extend(resp.json["data"])
+        cursor = resp.json["nextCursor"]
+        if not cursor:
+            break
+
+    expected = Student.query.order_by(Student.name, Student.id).all()
+    assert [row["id"] for row in seen] == [student.id for student in expected]
+    by_regno = {row["regno"]: row["outstanding"] for row in seen}
+    assert by_regno["PAGE0007"] == 80.0
+    assert by_regno["REG123"] == 0
+
+
+def test_list_students_page_filters_course_in_one_query(client, auth_headers, query_counter):
+    _seed_students(10)
+    query_counter.clear()
+    resp = client.get("/api/students?limit=3&course=BCA", headers=auth_headers)
+    assert len(query_counter) == 1
+    assert [row["course"] for row in resp.json["data"]] == ["BCA"] * 3
+    assert resp.json["nextCursor"]
+
+    assert client.get("/api/students?after=not-a-cursor", headers=auth_headers).status_code == 400
+    for forged in (encode_cursor("x", "abc"), encode_cursor(["x"], 1), encode_cursor("x", True)):
+        assert client.get(f"/api/students?after={forged}", headers=auth_headers).status_code == 400
+
+
+def _search(client, auth_headers, q):
+    resp = client.get(f"/api/students/search?q={q}", headers=auth_headers)
+    assert resp.status_code == 200
+    return [row["regno"] for row in resp.json["data"]]
+
+
+def test_search_students_by_prefix(client, auth_headers):
+    _seed_students(12)
+    db.session.add(
+        Student(name="Asha Rao", regno="CS-2024-001", course="BCA", phone="1", email="asha.rao@college.edu")
+    )
+    db.session.commit()
+
+    assert _search(client, auth_headers, "CS-2024")[0] == "CS-2024-001"
+    assert _search(client, auth_headers, "ash") == ["CS-2024-001"]
+    assert _search(client, auth_headers, "asha.r") == ["CS-2024-001"]
+    assert sorted(_search(client, auth_headers, "PAGE000")) == [f"PAGE{i:04d}" for i in range(10)]
+    assert _search(client, auth_headers, "REG123") == ["REG123"]
+    assert _search(client, auth_headers, "  ") == []
+
+
+def test_search_index_follows_updates_and_deletes(client, auth_headers):
+    student = Student.query.filter_by(regno="REG123").one()
+    student.name = "Renamed Person"
+    db.session.commit()
+    assert _search(client, auth_headers, "renamed") == ["REG123"]
+
+    db.session.delete(student)
+    db.session.commit()
+    assert _search(client, auth_headers, "renamed") == []
+
+
+def test_search_like_fallback_matches_fts(client, auth_headers, monkeypatch):
+    from services import student_search
+
+    _seed_students(6)
+    fts = _search(client, auth_headers, "page")
+    monkeypatch.setattr(student_search, "_has_fts_index", lambda: False)
+    assert sorted(_search(client, auth_headers, "page")) == sorted(fts)
+    assert _search(client, auth_headers, "student@test") == ["REG123"]
+
+
+def test_search_ranks_every_match_before_limiting(client, auth_headers, query_counter):
+    _seed_students(25)
+    # the newest row is the best match, well past the first 20 matches in rowid order
+    db.session.add(Student(name="Page Page", regno="PAGEBEST", course="BCA", phone="1", email="page@best.com"))
+    db.session.add(Student(name="Short Regno", regno="PAGE", course="BCA", phone="1", email="short@test.com"))
+    db.session.commit()
+
+    results = _search(client, auth_headers, "page")
+    assert results[0] == "PAGEBEST"
+    assert len(results) == 20
+    assert _search(client, auth_headers, "PAGE")[:2] == ["PAGE", "PAGEBEST"]  # an exact regno leads
+    assert _search(client, auth_headers, "p") == []
+    assert _search(client, auth_headers, "page0024") == ["PAGE0024"]
+    assert sum("sqlite_master" in statement for statement in query_counter) <= 1
+
+
+def test_bulk_import_csv_reports_row_errors(client, auth_headers):
+    csv_body = (
+        "name,regno,course,phone,email\n"
+        "Bulk One,BULK001,BCA,7000000001,bulk1@test.com\n"
+        "Bulk Two,BULK002,BCA,7000000002,bulk2@test.com\n"
+        "Existing Regno,REG123,BCA,7000000003,bulk3@test.com\n"
+        "Repeat Regno,BULK001,BCA,7000000004,bulk4@test.com\n"
+        "No Phone,BULK005,BCA,,bulk5@test.com\n"
+        "Bad Email,BULK006,BCA,7000000006,not-an-email\n"
+        "Bulk Seven,BULK007,MCA,7000000007,bulk7@test.com\n"
+    )
+    resp = client.post(
+        "/api/students/bulk?chunkSize=2",
+        data={"file": (io.BytesIO(csv_body.encode()), "students.csv")},
+        content_type="multipart/form-data",
+        headers=auth_headers,
+    )
+    assert resp.status_code == 201
+    report = resp.json["data"]
+    assert (report["total"], report["inserted"], report["failed"]) == (7, 3, 4)
+    errors = {error["row"]: error["errors"] for error in report["errors"]}
+    assert errors == {
+        4: ["regno already exists"],
+        5: ["duplicate regno in upload"],
+        6: ["phone is required"],
+        7: ["email is invalid"],
+    }
+    regnos = {student.regno for student in Student.query.filter(Student.regno.like("BULK%"))}
+    assert regnos == {"BULK001", "BULK002", "BULK007"}
+
+
+def test_bulk_import_jsonl_body_and_cli(app, client, auth_headers, tmp_path):
+    body = "\n".join(
+        [
+            '{"name": "Json One", "regno": "JSON001", "course": "MBA", "phone": "1", "email": "json1@test.com"}',
+            "{not json",
+            '{"name": "Json Two", "regno": "JSON002", "course": "MBA", "phone": "2", "email": "student@test.com"}',
+        ]
+    )
+    resp = client.post("/api/students/bulk", data=body, content_type="application/x-ndjson", headers=auth_headers)
+    report = resp.json["data"]
+    assert report["inserted"] == 1
+    assert [(error["row"], error["errors"]) for error in report["errors"]] == [
+        (2, ["Invalid JSON"]),
+        (3, ["email already exists"]),
+    ]
+
+    resp = client.post("/api/students/bulk", data="name\nx\n", content_type="text/csv", headers=auth_headers)
+    assert resp.status_code == 400
+
+    path = tmp_path / "students.csv"
+    path.write_text("Name,RegNo,Course,Phone,Email\nCli Student,CLI001,BBA,3,cli@test.com\n")
+    result = app.test_cli_runner().invoke(args=["students", "import", str(path), "--chunk-size", "1"])
+    assert result.exit_code == 0, result.output
+    assert "Imported 1 of 1 rows" in result.output
+    assert Student.query.filter_by(regno="CLI001").count() == 1
+
+
+def test_student_detail_two_statements_and_conditional_get(client, auth_headers, query_counter):
+    order = client.post(
+        "/api/payments/create-order",
+        json={"studentId": 1, "amount": 1500, "meta": {"invoiceNo": "INV-DETAIL-1"}},
+        headers=auth_headers,
+    ).json["data"]
+
+    query_counter.clear()
+    resp = client.get("/api/students/1", headers=auth_headers)
+    assert resp.status_code == 200
+    assert len(query_counter) == 2
+    data = resp.json["data"]
+    assert data["outstanding"] == 1500.0
+    assert [payment["razorpayOrderId"] for payment in data["payments"]] == [order["orderId"]]
+    etag = resp.headers["ETag"]
+
+    query_counter.clear()
+    resp = client.get("/api/students/1", headers={**auth_headers, "If-None-Match": etag})
+    assert resp.status_code == 304
+    assert len(query_counter) == 1
+    assert resp.headers["ETag"] == etag
+
+    payment = Payment.query.filter_by(razorpay_order_id=order["orderId"]).one()
+    payment.status = "captured"
+    record_payment(payment)
+    db.session.commit()
+    resp = client.get("/api/students/1", headers={**auth_headers, "If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert resp.json["data"]["outstanding"] == 0
+
+    assert client.get("/api/students/999", headers=auth_headers).status_code == 404
+
+
+def test_balance_ledger_verify_and_rebuild(app, client, auth_headers, query_counter):
+    _seed_students(3)
+    client.post(
+        "/api/payments/create-order",
+        json={"studentId": 1, "amount": 500, "meta": {"invoiceNo": "INV-LEDGER-1"}},
+        headers=auth_headers,
+    )
+    student = db.session.get(Student, 1)
+    assert (student.invoiced_paise, student.paid_paise) == (50000, 0)
+
+    query_counter.clear()
+    resp = client.get("/api/students?limit=10", headers=auth_headers)
+    assert resp.json["data"][0]["outstanding"] is not None
+    assert not any("invoices" in statement or "payments" in statement for statement in query_counter)
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["balances", "verify"])
+    assert result.exit_code == 0, result.output
+
+    db.session.query(Student).filter(Student.regno == "PAGE0001").update({"invoiced_paise": 1})
+    db.session.commit()
+    result = runner.invoke(args=["balances", "verify"])
+    assert result.exit_code == 1
+    assert "1 student balance(s) drifted" in result.output
+
+    result = runner.invoke(args=["balances", "rebuild"])
+    assert "Repaired 1 student balance(s)" in result.output
+    assert Student.query.filter_by(regno="PAGE0001").one().invoiced_paise == 2000
+    assert runner.invoke(args=["balances", "verify"]).exit_code == 0
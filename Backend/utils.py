@@ -1,11 +1,56 @@
+import base64
+import codecs
+import json
+from typing import IO, Iterator
+
 from flask import jsonify
 
 
-def json_response(success=True, data=None, error=None, status=200):
+def json_response(success=True, data=None, error=None, status=200, meta=None):
     payload = {"success": success}
     if success:
         payload["data"] = data
+        payload.update(meta or {})
     else:
         payload["error"] = error or "Unknown error"
     return jsonify(payload), status
 
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Decode a cursor made by ``encode_cursor``; raises ValueError if it is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def iter_text_chunks(stream: IO[bytes], size: int = 64 * 1024) -> Iterator[str]:
+    """Decode a UTF-8 byte stream piece by piece without reading it into memory."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    for chunk in iter(lambda: stream.read(size), b""):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_text_lines(stream: IO[bytes]) -> Iterator[str]:
+    """Decode a byte stream line by line without reading it into memory."""
+    pending = ""
+    for text in iter_text_chunks(stream):
+        pending += text
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
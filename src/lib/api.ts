@@ -305,6 +305,25 @@ export const feeStructureApi = {
     await new Promise(resolve => setTimeout(resolve, 500));
     return mockFeeStructure;
   },
+
+  // What a student of `course` owes for `semester`, as the backend will invoice it.
+  getStructure: async (course: string, semester: number): Promise<FeeStructure[]> => {
+    try {
+      const params = new URLSearchParams({ course, semester: String(semester) });
+      const json = await backendFetch(`/fees/structure?${params}`);
+      if (json?.success && Array.isArray(json?.data?.components)) {
+        return json.data.components.map((c: any) => ({
+          id: String(c.id),
+          component: c.name,
+          amount: c.amount / 100,
+          mandatory: Boolean(c.mandatory),
+        }));
+      }
+    } catch (e) {
+      console.warn("backend fee structure failed", e);
+    }
+    return feeStructureApi.getAll();
+  },
   
   create: async (fee: Omit<FeeStructure, 'id'>): Promise<FeeStructure> => {
     await new Promise(resolve => setTimeout(resolve, 500));
@@ -334,7 +353,7 @@ export const feeStructureApi = {
 export const paymentsApi = {
   getAll: async (): Promise<Payment[]> => {
     try {
-      const json = await backendFetch("/payments");
+      const json = await backendFetch("/payments?expand=student");
       if (json?.success && Array.isArray(json.data)) {
         const rows = json.data as Array<{
           id: number;
@@ -344,31 +363,36 @@ export const paymentsApi = {
           currency: string;
           status: string;
           razorpayPaymentId?: string | null;
+          receiptUrl?: string | null;
           createdAt?: string;
           updatedAt?: string;
+          studentName?: string;
         }>;
-        const uniqueStudentIds = Array.from(new Set(rows.map(r => r.studentId).filter(Boolean)));
+        // Older backends ignore ?expand=student; fall back to one batched lookup.
+        const missingIds = Array.from(new Set(rows.filter(r => !r.studentName).map(r => r.studentId).filter(Boolean)));
         const studentsMap: Record<number, string> = {};
-        await Promise.all(uniqueStudentIds.map(async (sid) => {
+        if (missingIds.length) {
           try {
-            const sres = await backendFetch(`/students/${sid}`);
-            if (sres?.success && sres.data?.name) {
-              studentsMap[sid] = sres.data.name as string;
+            const sres = await backendFetch(`/students?ids=${missingIds.join(",")}`);
+            if (sres?.success && Array.isArray(sres.data)) {
+              for (const s of sres.data as Array<{ id: number; name: string }>) {
+                studentsMap[s.id] = s.name;
+              }
             }
           } catch {
             void 0;
           }
-        }));
+        }
         return rows.map(r => {
           const paid = ["captured", "success", "paid"].includes(String(r.status).toLowerCase());
           const amountRupees = Math.round(r.amount) / 100;
           const paymentDate = paid ? (r.updatedAt || r.createdAt || "") : "";
           const dueDate = r.createdAt || new Date().toISOString();
-          const receiptUrl = paid ? `/api/payments/${r.invoiceId}/receipt` : undefined;
+          const receiptUrl = paid ? (r.receiptUrl || `/api/payments/${r.invoiceId}/receipt`) : undefined;
           return {
             id: String(r.id),
             studentId: String(r.studentId),
-            studentName: studentsMap[r.studentId] || `Student #${r.studentId}`,
+            studentName: r.studentName || studentsMap[r.studentId] || `Student #${r.studentId}`,
             amount: amountRupees,
             status: paid ? "paid" : (String(r.status).toLowerCase() === "failed" ? "failed" : "pending"),
             paymentDate,
@@ -396,6 +420,7 @@ export const paymentsApi = {
           currency: string;
           status: string;
           razorpayPaymentId?: string | null;
+          receiptUrl?: string | null;
           createdAt?: string;
           updatedAt?: string;
           invoiceId: number;
@@ -405,7 +430,7 @@ export const paymentsApi = {
           const amountRupees = Math.round(r.amount) / 100;
           const paymentDate = paid ? (r.updatedAt || r.createdAt || "") : "";
           const dueDate = r.createdAt || new Date().toISOString();
-          const receiptUrl = paid ? `/api/payments/${r.invoiceId}/receipt` : undefined;
+          const receiptUrl = paid ? (r.receiptUrl || `/api/payments/${r.invoiceId}/receipt`) : undefined;
           return {
             id: String(r.id),
             studentId: String(r.studentId),
@@ -426,11 +451,19 @@ export const paymentsApi = {
     return mockPayments.filter(p => p.studentId === studentId);
   },
   
-  createOrder: async (amount: number, studentId: string): Promise<{ orderId: string; amount: number; keyId?: string }> => {
+  createOrder: async (
+    studentId: string,
+    semester: number,
+    feeIds: string[],
+    idempotencyKey: string,
+  ): Promise<{ orderId: string; amount?: number; keyId?: string }> => {
     try {
+      // the same key on a retried request returns the first order instead of creating another
       const json = await backendFetch("/payments/create-order", {
         method: "POST",
-        body: JSON.stringify({ studentId: Number(studentId), amount, currency: "INR", items: [], meta: {} }),
+        headers: { "Idempotency-Key": idempotencyKey },
+        // the backend prices the order from the fee structure; feeIds are the optional fees chosen
+        body: JSON.stringify({ studentId: Number(studentId), semester, feeIds: feeIds.map(Number), currency: "INR", meta: {} }),
       });
       if (json?.success && json?.data?.orderId) {
         lastInvoiceId = json.data.invoiceId ?? null;
@@ -440,7 +473,7 @@ export const paymentsApi = {
       console.warn("backend create-order failed", e);
     }
     await new Promise(resolve => setTimeout(resolve, 500));
-    return { orderId: "order_" + Math.random().toString(36).substr(2, 9), amount: Math.round(amount * 100) };
+    return { orderId: "order_" + Math.random().toString(36).substr(2, 9) };
   },
   
   verifyPayment: async (paymentId: string, orderId: string, signature: string): Promise<Payment> => {
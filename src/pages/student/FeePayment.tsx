@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { DollarSign, Loader2 } from 'lucide-react';
 import { DashboardLayout } from '@/components/layout/DashboardLayout';
@@ -6,13 +6,18 @@ import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Checkbox } from '@/components/ui/checkbox';
 import { Label } from '@/components/ui/label';
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Separator } from '@/components/ui/separator';
-import { feeStructureApi, paymentsApi, FeeStructure } from '@/lib/api';
+import { feeStructureApi, paymentsApi, studentsApi, FeeStructure } from '@/lib/api';
 import { useToast } from '@/hooks/use-toast';
+import { newIdempotencyKey } from '@/lib/utils';
 import { useAuth } from '@/contexts/AuthContext';
 import { ChatWidget } from '@/components/ChatWidget';
 
+const SEMESTERS = [1, 2, 3, 4, 5, 6, 7, 8];
+
 export const FeePayment = () => {
+  const [semester, setSemester] = useState(1);
   const [feeComponents, setFeeComponents] = useState<FeeStructure[]>([]);
   const [selectedFees, setSelectedFees] = useState<Set<string>>(new Set());
   const [isProcessing, setIsProcessing] = useState(false);
@@ -20,11 +25,17 @@ export const FeePayment = () => {
   const navigate = useNavigate();
   const { toast } = useToast();
   const { user } = useAuth();
+  // One Idempotency-Key per payment attempt: a double click or a retry after a dropped
+  // response reuses it and gets the same order back. A new selection starts a new attempt.
+  const paymentAttempt = useRef<{ selection: string; key: string } | null>(null);
+  const studentId = String(user?.id || '1');
 
   useEffect(() => {
     const fetchFees = async () => {
+      setLoading(true);
       try {
-        const data = await feeStructureApi.getAll();
+        const student = await studentsApi.getById(studentId).catch(() => null);
+        const data = await feeStructureApi.getStructure(student?.course || '', semester);
         setFeeComponents(data);
 
         // Pre-select mandatory fees
@@ -36,7 +47,7 @@ export const FeePayment = () => {
     };
 
     fetchFees();
-  }, []);
+  }, [studentId, semester]);
 
   const toggleFee = (feeId: string, isMandatory: boolean) => {
     if (isMandatory) return; // Can't uncheck mandatory fees
@@ -68,10 +79,16 @@ export const FeePayment = () => {
       }
 
       // 1) Create order on backend (expects backend to create Razorpay order and return it)
-      // paymentsApi.createOrder should call backend POST /api/payments/create-order
-      // and return the order object (preferably containing `id` and `amount` (paise))
-      const studentId = user?.id || '1';
-      const orderResp = await paymentsApi.createOrder(totalAmount, String(studentId));
+      // The backend prices it from the semester's fee structure: mandatory fees are always
+      // included, so only the optional ones the student ticked are sent.
+      const optionalFeeIds = feeComponents
+        .filter((fee) => !fee.mandatory && selectedFees.has(fee.id))
+        .map((fee) => fee.id);
+      const selection = `${semester}:${optionalFeeIds.join(',')}`;
+      if (paymentAttempt.current?.selection !== selection) {
+        paymentAttempt.current = { selection, key: newIdempotencyKey() };
+      }
+      const orderResp = await paymentsApi.createOrder(studentId, semester, optionalFeeIds, paymentAttempt.current.key);
 
       // Support shape variations: some helpers return { orderId } others return { id, amount }.
       const orderId = (orderResp && (orderResp.id || orderResp.orderId)) as string | undefined;
@@ -103,6 +120,7 @@ export const FeePayment = () => {
 
             // If paymentsApi.verifyPayment returns success indicator, handle accordingly:
             if (verifyRes && (verifyRes.success || verifyRes.status === 'paid')) {
+              paymentAttempt.current = null;
               toast({ title: 'Payment Successful', description: 'Your payment was successful.' });
               navigate('/student/payment-status', { state: { payment: verifyRes } });
             } else {
@@ -165,6 +183,19 @@ export const FeePayment = () => {
             <CardDescription>Select the fees you want to pay</CardDescription>
           </CardHeader>
           <CardContent className="space-y-4">
+            <div className="flex items-center space-x-4">
+              <Label>Semester</Label>
+              <Select value={String(semester)} onValueChange={(value) => setSemester(Number(value))}>
+                <SelectTrigger className="w-40">
+                  <SelectValue />
+                </SelectTrigger>
+                <SelectContent>
+                  {SEMESTERS.map((value) => (
+                    <SelectItem key={value} value={String(value)}>Semester {value}</SelectItem>
+                  ))}
+                </SelectContent>
+              </Select>
+            </div>
             {feeComponents.map((fee) => (
               <div key={fee.id} className="flex items-center justify-between p-4 border rounded-lg">
                 <div className="flex items-center space-x-4">